@@ -0,0 +1,30 @@
+import os
+import sys
+
+APP_NAME = 'VideoTools'
+
+
+def _base_dir(kind):
+    if sys.platform == 'win32':
+        root = os.environ.get('LOCALAPPDATA') or os.path.expanduser('~\\AppData\\Local')
+        return os.path.join(root, APP_NAME, 'Cache' if kind == 'cache' else 'Data')
+    if sys.platform == 'darwin':
+        folder = 'Caches' if kind == 'cache' else 'Application Support'
+        return os.path.join(os.path.expanduser('~/Library'), folder, APP_NAME)
+    if kind == 'cache':
+        root = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+    else:
+        root = os.environ.get('XDG_DATA_HOME') or os.path.expanduser('~/.local/share')
+    return os.path.join(root, APP_NAME.lower())
+
+
+def cache_dir(*parts):
+    path = os.path.join(_base_dir('cache'), *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def data_dir(*parts):
+    path = os.path.join(_base_dir('data'), *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
@@ -0,0 +1,184 @@
+import re
+import threading
+import time
+from datetime import datetime
+
+# A job that has not moved any bytes for this long gives its share to the others
+IDLE_AFTER = 1.0
+# How often shares and the time-of-day limit are looked at again while bytes flow
+RECHECK_INTERVAL = 0.5
+# Seconds of traffic the bucket may hold, so short pauses do not waste the link
+BURST_SECONDS = 1.0
+
+UNITS = {'': 1, 'k': 1024, 'm': 1024 ** 2, 'g': 1024 ** 3}
+
+
+class BandwidthError(ValueError):
+    pass
+
+
+def parse_rate(value):
+    """Bytes per second from a number or a string like '500K', '2.5M' or '1G' (0 or None: no limit)."""
+    if value is None or isinstance(value, (int, float)):
+        return float(value or 0)
+    match = re.fullmatch(r'\s*([\d.]+)\s*([kmg]?)(?:i?b(?:/s)?)?\s*', str(value).lower())
+    if not match:
+        raise BandwidthError(f"Invalid bandwidth limit '{value}'")
+    return float(match.group(1)) * UNITS[match.group(2)]
+
+
+def _minutes(text):
+    try:
+        hours, minutes = text.split(':')
+        return int(hours) * 60 + int(minutes)
+    except (AttributeError, ValueError):
+        raise BandwidthError(f"Invalid time '{text}', expected HH:MM")
+
+
+def parse_schedule(entries):
+    """[(start minute, end minute, bytes/s)] from [{'from': 'HH:MM', 'to': 'HH:MM', 'limit': ...}]."""
+    return [(_minutes(entry['from']), _minutes(entry['to']), parse_rate(entry['limit'])) for entry in entries or ()]
+
+
+class Lease:
+    """One download's seat at the scheduler; its progress hook pays for the bytes it receives."""
+
+    def __init__(self, scheduler, weight):
+        self.scheduler = scheduler
+        self.weight = weight
+        self.params = None
+        self.last_active = None
+        self._seen = {}
+
+    def attach(self, ydl):
+        # yt-dlp reads 'ratelimit' from these params before every block and fragment
+        self.params = ydl.params
+        self.scheduler.rebalance()
+
+    def hook(self, d):
+        if d.get('status') != 'downloading':
+            return
+        name = d.get('tmpfilename') or d.get('filename')
+        downloaded = d.get('downloaded_bytes') or 0
+        delta = downloaded - self._seen.get(name, 0)
+        self._seen[name] = downloaded
+        if delta > 0:
+            self.scheduler.consume(self, delta)
+
+    def close(self):
+        self.scheduler.release(self)
+
+
+class BandwidthScheduler:
+    """A global token bucket shared by every running download.
+
+    Each download holds a Lease with a weight. The cap is split between the
+    downloads that moved bytes in the last IDLE_AFTER seconds in proportion
+    to their weights. Each share is written into that download's yt-dlp
+    `ratelimit`, so yt-dlp paces itself smoothly. The bucket is what enforces
+    the cap: the progress hook blocks once the downloads get ahead of it.
+    A download going idle, finishing or starting hands its share around on
+    the next check, as does a change to the limit, the schedule or a weight;
+    none of them restart anything. `schedule` entries override the limit
+    between their start and end times, which may wrap past midnight.
+    """
+
+    def __init__(self, limit=0, schedule=(), clock=time.monotonic, now=datetime.now):
+        self.limit = parse_rate(limit)
+        self.schedule = list(schedule)
+        self.clock = clock
+        self.now = now
+        self._leases = []
+        self._rate = None
+        self._tokens = 0.0
+        self._filled = clock()
+        self._checked = None
+        self._lock = threading.Lock()
+
+    def set_limit(self, limit):
+        self.limit = parse_rate(limit)
+        self.rebalance()
+
+    def set_schedule(self, schedule):
+        self.schedule = list(schedule)
+        self.rebalance()
+
+    def set_weight(self, lease, weight):
+        lease.weight = weight
+        self.rebalance()
+
+    def current_limit(self):
+        now = self.now()
+        minute = now.hour * 60 + now.minute
+        for start, end, rate in self.schedule:
+            if start <= minute < end or (end < start and (minute >= start or minute < end)):
+                return rate
+        return self.limit
+
+    def lease(self, weight=1.0):
+        lease = Lease(self, max(float(weight), 0.01))
+        with self._lock:
+            self._leases.append(lease)
+        return lease
+
+    def release(self, lease):
+        with self._lock:
+            if lease in self._leases:
+                self._leases.remove(lease)
+        self.rebalance()
+
+    def rebalance(self):
+        with self._lock:
+            self._rebalance(self.clock())
+
+    def _rebalance(self, now):
+        # Called with the lock held
+        self._checked = now
+        rate = self.current_limit()
+        if rate != self._rate:
+            self._rate = rate
+            self._tokens = min(self._tokens, rate * BURST_SECONDS)
+        active = [lease for lease in self._leases
+                  if lease.last_active is not None and now - lease.last_active < IDLE_AFTER]
+        weights = sum(lease.weight for lease in active)
+        for lease in self._leases:
+            if lease.params is None:
+                continue
+            if not rate:
+                lease.params.pop('ratelimit', None)
+            elif lease in active:
+                lease.params['ratelimit'] = rate * lease.weight / weights
+            else:
+                # Idle or not started: the share it gets once it joins (and rebalances) on its first bytes
+                lease.params['ratelimit'] = rate * lease.weight / (weights + lease.weight)
+
+    def consume(self, lease, nbytes):
+        """Take nbytes from the bucket, sleeping until the cap allows them."""
+        with self._lock:
+            now = self.clock()
+            woke = lease.last_active is None or now - lease.last_active >= IDLE_AFTER
+            lease.last_active = now
+            if woke or self._checked is None or now - self._checked >= RECHECK_INTERVAL:
+                self._rebalance(now)
+            rate = self._rate
+            if not rate:
+                return
+            self._tokens = min(rate * BURST_SECONDS, self._tokens + (now - self._filled) * rate)
+            self._filled = now
+            # Bytes already received are paid for up front; the debt is slept off
+            self._tokens -= nbytes
+            wait = -self._tokens / rate if self._tokens < 0 else 0.0
+        if wait > 0:
+            time.sleep(wait)
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_bandwidth_scheduler():
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = BandwidthScheduler()
+    return _scheduler
@@ -0,0 +1,140 @@
+"""Download manager benchmark against a local, bandwidth-limited HTTP server.
+
+Generates short test clips with ffmpeg, serves them on 127.0.0.1 and
+localhost (two "hosts" for the per-host cap) with a per-connection rate
+limit, and downloads them through yt-dlp's generic extractor, first one at
+a time and then with the manager's concurrency. Needs ffmpeg and yt-dlp.
+
+    python benchmarks/download_benchmark.py --clips 8 --concurrency 4 --per-host 2
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from download_manager import DownloadManager  # noqa: E402
+
+
+def make_clips(directory, count, seconds):
+    paths = []
+    for i in range(count):
+        path = os.path.join(directory, f'clip{i:03d}.mp4')
+        subprocess.run(['ffmpeg', '-v', 'error', '-y',
+                        '-f', 'lavfi', '-i', f'testsrc2=size=640x360:rate=25:duration={seconds}',
+                        '-f', 'lavfi', '-i', f'sine=frequency={440 + i * 10}:duration={seconds}',
+                        '-c:v', 'libx264', '-preset', 'ultrafast', '-c:a', 'aac', '-shortest', path], check=True)
+        paths.append(path)
+    return paths
+
+
+def make_server(directory, rate):
+    connections = Counter()
+    peaks = Counter()
+    lock = threading.Lock()
+
+    class Handler(SimpleHTTPRequestHandler):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, directory=directory, **kwargs)
+
+        def log_message(self, *args):
+            pass
+
+        def copyfile(self, source, outputfile):
+            # Trickle the body out at `rate` bytes per second per connection
+            host = self.headers.get('Host', '').split(':')[0]
+            with lock:
+                connections[host] += 1
+                peaks[host] = max(peaks[host], connections[host])
+            try:
+                block = max(1024, rate // 20)
+                while True:
+                    data = source.read(block)
+                    if not data:
+                        break
+                    outputfile.write(data)
+                    time.sleep(len(data) / rate)
+            finally:
+                with lock:
+                    connections[host] -= 1
+
+    class Server(ThreadingHTTPServer):
+        def handle_error(self, request, client_address):
+            # yt-dlp hangs up on the extractor's probe request once it has the headers
+            pass
+
+    server = Server(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, peaks
+
+
+def run(urls, output_dir, concurrency, per_host):
+    from download_engine import download
+
+    # The archive is bypassed so the second pass downloads everything again
+    def runner(task, hook, control):
+        download(task.url, task.output_dir, task.quality, hook, archive=False, control=control)
+
+    manager = DownloadManager(concurrency, per_host, retries=1, backoff=0.5, runner=runner, archive=False)
+    started = time.perf_counter()
+    manager.add_many(urls, output_dir, "Best Quality (Full Resolution)")
+    manager.wait()
+    stats = manager.stats()
+    stats['seconds'] = time.perf_counter() - started
+    stats['throughput'] = stats['downloaded_bytes'] / stats['seconds']
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--clips', type=int, default=8)
+    parser.add_argument('--seconds', type=int, default=5, help="length of each test clip")
+    parser.add_argument('--rate', type=int, default=256 * 1024, help="bytes per second per connection")
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--per-host', type=int, default=2)
+    parser.add_argument('--output', help="write the JSON summary here as well")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        media_dir = os.path.join(workdir, 'media')
+        os.makedirs(media_dir)
+        clips = make_clips(media_dir, args.clips, args.seconds)
+        server, peaks = make_server(media_dir, args.rate)
+        port = server.server_address[1]
+        hosts = ['127.0.0.1', 'localhost']
+        urls = [f'http://{hosts[i % 2]}:{port}/{os.path.basename(path)}' for i, path in enumerate(clips)]
+
+        sequential = run(urls, os.path.join(workdir, 'sequential'), 1, 1)
+        peaks.clear()
+        parallel = run(urls, os.path.join(workdir, 'parallel'), args.concurrency, args.per_host)
+        server.shutdown()
+
+    summary = {
+        'clips': args.clips,
+        'sequential': sequential,
+        'parallel': parallel,
+        'speedup': sequential['seconds'] / parallel['seconds'],
+        'peak_connections_per_host': dict(peaks),
+    }
+    print(json.dumps(summary, indent=2))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)
+    failed = sequential['failed'] + parallel['failed']
+    over_cap = any(peak > args.per_host for peak in peaks.values())
+    if failed or over_cap:
+        print(f"{failed} downloads failed; per-host peaks {dict(peaks)} (cap {args.per_host})", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,134 @@
+"""Fragment concurrency benchmark against a local HLS server with injected latency.
+
+Packages a test clip as HLS with short segments, serves it on 127.0.0.1
+with a fixed delay before every response and a per-connection rate limit,
+and downloads it repeatedly through yt-dlp: with one fragment at a time,
+with a fixed worker count, and with the adaptive tuner (which carries what
+it learned from one round to the next). Needs ffmpeg and yt-dlp.
+
+    python benchmarks/fragment_benchmark.py --seconds 60 --latency 0.15 --rounds 6
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import fragment_tuning  # noqa: E402
+from fragment_tuning import FragmentTuner  # noqa: E402
+
+
+def make_hls(directory, seconds, segment):
+    subprocess.run(['ffmpeg', '-v', 'error', '-y',
+                    '-f', 'lavfi', '-i', f'testsrc2=size=640x360:rate=25:duration={seconds}',
+                    '-f', 'lavfi', '-i', f'sine=frequency=440:duration={seconds}',
+                    '-c:v', 'libx264', '-preset', 'ultrafast', '-b:v', '2M', '-g', str(25 * segment),
+                    '-c:a', 'aac', '-shortest',
+                    '-f', 'hls', '-hls_time', str(segment), '-hls_playlist_type', 'vod',
+                    os.path.join(directory, 'stream.m3u8')], check=True)
+
+
+def make_server(directory, latency, rate):
+    requests = [0]
+    lock = threading.Lock()
+
+    class Handler(SimpleHTTPRequestHandler):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, directory=directory, **kwargs)
+
+        def log_message(self, *args):
+            pass
+
+        def send_head(self):
+            # Round-trip latency: every request waits before the first byte
+            with lock:
+                requests[0] += 1
+            time.sleep(latency)
+            return super().send_head()
+
+        def copyfile(self, source, outputfile):
+            block = max(1024, rate // 20)
+            while True:
+                data = source.read(block)
+                if not data:
+                    break
+                outputfile.write(data)
+                time.sleep(len(data) / rate)
+
+    class Server(ThreadingHTTPServer):
+        def handle_error(self, request, client_address):
+            pass
+
+    server = Server(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, requests
+
+
+def run(url, output_dir, tuner):
+    from download_engine import download
+
+    fragment_tuning._tuner = tuner
+    workers = tuner.workers('127.0.0.1')
+    if os.path.isdir(output_dir):
+        shutil.rmtree(output_dir)
+    os.makedirs(output_dir)
+    started = time.perf_counter()
+    download(url, output_dir, "Best Quality (Full Resolution)", archive=False)
+    seconds = time.perf_counter() - started
+    size = sum(os.path.getsize(os.path.join(output_dir, name)) for name in os.listdir(output_dir))
+    return {'workers': workers, 'seconds': seconds, 'throughput': size / seconds}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--seconds', type=int, default=60, help="length of the test clip")
+    parser.add_argument('--segment', type=int, default=1, help="HLS segment length in seconds")
+    parser.add_argument('--latency', type=float, default=0.15, help="delay before every response")
+    parser.add_argument('--rate', type=int, default=512 * 1024, help="bytes per second per connection")
+    parser.add_argument('--fixed', type=int, default=8, help="worker count for the fixed run")
+    parser.add_argument('--rounds', type=int, default=6, help="adaptive downloads in a row")
+    parser.add_argument('--output', help="write the JSON summary here as well")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        media_dir = os.path.join(workdir, 'media')
+        os.makedirs(media_dir)
+        make_hls(media_dir, args.seconds, args.segment)
+        server, requests = make_server(media_dir, args.latency, args.rate)
+        url = f'http://127.0.0.1:{server.server_address[1]}/stream.m3u8'
+        output_dir = os.path.join(workdir, 'out')
+
+        single = run(url, output_dir, FragmentTuner(1, 1))
+        fixed = run(url, output_dir, FragmentTuner(args.fixed, args.fixed))
+        tuner = FragmentTuner()
+        adaptive = [run(url, output_dir, tuner) for _ in range(args.rounds)]
+        server.shutdown()
+
+    summary = {
+        'latency': args.latency,
+        'single': single,
+        'fixed': fixed,
+        'adaptive': adaptive,
+        'adaptive_speedup': adaptive[-1]['throughput'] / single['throughput'],
+        'requests': requests[0],
+    }
+    print(json.dumps(summary, indent=2))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)
+    if adaptive[-1]['throughput'] < single['throughput']:
+        print("The adaptive tuner ended up slower than one fragment at a time", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
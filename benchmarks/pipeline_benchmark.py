@@ -0,0 +1,116 @@
+"""Pipeline benchmark: download-then-encode in two phases versus overlapped stages.
+
+Serves test clips from the rate-limited local server of download_benchmark
+and runs the same batch twice: first every download, then every encode;
+then through a Pipeline, where encodes start as soon as the first file is
+in. Needs ffmpeg and yt-dlp.
+
+    python benchmarks/pipeline_benchmark.py --clips 8 --downloads 2 --encoders 1
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from download_benchmark import make_clips, make_server  # noqa: E402
+from download_manager import DownloadManager  # noqa: E402
+from pipeline import Pipeline  # noqa: E402
+
+QUALITY = "Best Quality (Full Resolution)"
+OPERATIONS = [{'type': 'resize', 'width': 640, 'height': 360}, {'type': 'compress', 'quality': 28, 'preset': 'veryfast'}]
+
+
+def downloader(task, hook, control):
+    from download_engine import download
+    return download(task.url, task.output_dir, task.quality, hook, archive=False, control=control)
+
+
+def encoder(item, on_progress, control):
+    from ffmpeg_engine import process
+    process(item.input, item.output, OPERATIONS, on_progress=on_progress, control=control)
+
+
+def run_phased(urls, workdir, downloads, encoders):
+    from concurrent.futures import ThreadPoolExecutor
+    from pipeline import EncodeItem
+
+    files = []
+    manager = DownloadManager(downloads, downloads, retries=1, backoff=0.5, archive=False,
+                              runner=lambda task, hook, control: files.extend(downloader(task, hook, control)))
+    started = time.perf_counter()
+    manager.add_many(urls, os.path.join(workdir, 'phased-dl'), QUALITY)
+    manager.wait()
+    downloaded = time.perf_counter() - started
+    output_dir = os.path.join(workdir, 'phased-out')
+    os.makedirs(output_dir)
+    items = [EncodeItem(i, path, os.path.join(output_dir, f'{i}.mp4')) for i, path in enumerate(files)]
+    with ThreadPoolExecutor(max_workers=encoders) as pool:
+        list(pool.map(lambda item: encoder(item, None, None), items))
+    total = time.perf_counter() - started
+    return {'seconds': total, 'download_seconds': downloaded, 'encode_seconds': total - downloaded,
+            'files': len(files)}
+
+
+def run_pipelined(urls, workdir, downloads, encoders, buffer):
+    pipeline = Pipeline(os.path.join(workdir, 'pipe-dl'), os.path.join(workdir, 'pipe-out'), 'mp4', OPERATIONS,
+                        QUALITY, downloads=downloads, per_host=downloads, encoders=encoders, buffer=buffer,
+                        downloader=downloader, encoder=encoder, archive=False)
+    started = time.perf_counter()
+    pipeline.add(urls)
+    pipeline.wait()
+    seconds = time.perf_counter() - started
+    stats = pipeline.stats()
+    pipeline.close()
+    return {'seconds': seconds, **stats}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--clips', type=int, default=8)
+    parser.add_argument('--seconds', type=int, default=10, help="length of each test clip")
+    parser.add_argument('--rate', type=int, default=512 * 1024, help="bytes per second per connection")
+    parser.add_argument('--downloads', type=int, default=2)
+    parser.add_argument('--encoders', type=int, default=1)
+    parser.add_argument('--buffer', type=int, default=2)
+    parser.add_argument('--output', help="write the JSON summary here as well")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        media_dir = os.path.join(workdir, 'media')
+        os.makedirs(media_dir)
+        clips = make_clips(media_dir, args.clips, args.seconds)
+        server, _ = make_server(media_dir, args.rate)
+        port = server.server_address[1]
+        urls = [f'http://127.0.0.1:{port}/{os.path.basename(path)}' for path in clips]
+
+        phased = run_phased(urls, workdir, args.downloads, args.encoders)
+        pipelined = run_pipelined(urls, workdir, args.downloads, args.encoders, args.buffer)
+        server.shutdown()
+
+    slower_stage = max(phased['download_seconds'], phased['encode_seconds'])
+    summary = {
+        'clips': args.clips,
+        'phased': phased,
+        'pipelined': pipelined,
+        'speedup': phased['seconds'] / pipelined['seconds'],
+        # 1.0 means the pipeline took exactly as long as its slower stage
+        'overhead_vs_slower_stage': pipelined['seconds'] / slower_stage,
+    }
+    print(json.dumps(summary, indent=2))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)
+    failed = pipelined['downloads']['failed'] + pipelined['encodes']['failed']
+    if failed or pipelined['seconds'] >= phased['seconds']:
+        print(f"{failed} pipeline jobs failed, or the pipeline was not faster", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
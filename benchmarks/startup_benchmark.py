@@ -0,0 +1,85 @@
+"""Cold-start benchmark: import time of the GUI modules and time to first paint.
+
+Each sample runs in a fresh interpreter so module caches do not hide import
+cost. Needs PyQt6; on CI run it with QT_QPA_PLATFORM=offscreen.
+
+    python benchmarks/startup_benchmark.py --runs 5 --max-first-paint 3.0
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def child():
+    started = time.perf_counter()
+    sys.path.insert(0, ROOT)
+    from PyQt6.QtCore import QEvent, QObject, QTimer
+    from PyQt6.QtWidgets import QApplication
+    import main_window
+    imported = time.perf_counter()
+
+    app = QApplication(sys.argv[:1])
+    from theme import theme_manager
+    theme_manager().apply()
+    window = main_window.MainWindow()
+    result = {'import_seconds': imported - started}
+
+    class FirstPaint(QObject):
+        def eventFilter(self, obj, event):
+            if event.type() == QEvent.Type.Paint and 'first_paint_seconds' not in result:
+                result['first_paint_seconds'] = time.perf_counter() - started
+                QTimer.singleShot(0, app.quit)
+            return False
+
+    spy = FirstPaint()
+    window.installEventFilter(spy)
+    window.show()
+    # Offscreen platforms may never paint; fall back to the first event loop turn
+    QTimer.singleShot(5000, app.quit)
+    app.exec()
+    result.setdefault('first_paint_seconds', time.perf_counter() - started)
+    result['yt_dlp_imported'] = 'yt_dlp' in sys.modules
+    print(json.dumps(result))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--max-first-paint', type=float, help="fail if the median exceeds this many seconds")
+    parser.add_argument('--output', help="write the JSON summary here as well")
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child()
+        return 0
+
+    samples = []
+    for _ in range(args.runs):
+        output = subprocess.check_output([sys.executable, os.path.abspath(__file__), '--child'], cwd=ROOT)
+        samples.append(json.loads(output.decode().strip().splitlines()[-1]))
+
+    summary = {
+        'runs': args.runs,
+        'import_seconds_median': statistics.median(s['import_seconds'] for s in samples),
+        'first_paint_seconds_median': statistics.median(s['first_paint_seconds'] for s in samples),
+        'yt_dlp_imported_at_startup': any(s['yt_dlp_imported'] for s in samples),
+    }
+    print(json.dumps(summary, indent=2))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)
+    if args.max_first_paint and summary['first_paint_seconds_median'] > args.max_first_paint:
+        print(f"First paint median {summary['first_paint_seconds_median']:.3f}s exceeds "
+              f"{args.max_first_paint:.3f}s", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,78 @@
+"""Theme switch benchmark: time to swap dark/light as the operation queue grows.
+
+Builds the FFmpeg tab offscreen, fills it with operation groups and times a
+full round of theme switches at each size. Switching is one application
+stylesheet swap, so the cost per widget should stay flat; the run fails if it
+grows by more than --max-growth between the smallest and largest size.
+
+    QT_QPA_PLATFORM=offscreen python benchmarks/theme_benchmark.py --sizes 10 100 400
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+OPERATIONS = ['compress', 'convert', 'resize', 'trim', 'audio']
+
+
+def measure(app, manager, switches):
+    samples = []
+    for i in range(switches):
+        started = time.perf_counter()
+        manager.apply('light' if i % 2 == 0 else 'dark')
+        app.processEvents()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 400],
+                        help="operation group counts to measure")
+    parser.add_argument('--switches', type=int, default=6)
+    parser.add_argument('--max-growth', type=float, default=2.0,
+                        help="fail if per-widget switch time grows more than this factor")
+    parser.add_argument('--output', help="write the JSON summary here as well")
+    args = parser.parse_args()
+
+    sys.path.insert(0, ROOT)
+    from PyQt6.QtWidgets import QApplication, QWidget
+    from theme import theme_manager
+    from ffmpeg_processor import FFmpegProcessor
+
+    app = QApplication(sys.argv[:1])
+    manager = theme_manager()
+    manager.apply('dark')
+
+    results = []
+    for size in sorted(args.sizes):
+        tab = FFmpegProcessor()
+        for i in range(size):
+            tab.add_operation(OPERATIONS[i % len(OPERATIONS)])
+        tab.show()
+        app.processEvents()
+        widgets = len(tab.findChildren(QWidget)) + 1
+        seconds = measure(app, manager, args.switches)
+        results.append({'groups': size, 'widgets': widgets, 'switch_seconds': seconds,
+                        'per_widget_us': seconds / widgets * 1e6})
+        tab.close()
+        tab.deleteLater()
+        app.processEvents()
+
+    growth = results[-1]['per_widget_us'] / max(results[0]['per_widget_us'], 1e-9)
+    summary = {'results': results, 'per_widget_growth': growth}
+    print(json.dumps(summary, indent=2))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)
+    if growth > args.max_growth:
+        print(f"Per-widget switch time grew {growth:.2f}x (limit {args.max_growth:.2f}x)", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,94 @@
+"""Thumbnail strip benchmark: filling the visible part of a long file's timeline.
+
+Generates a low-resolution test file (an hour by default, a keyframe every
+two seconds) and fills the slots a strip shows at once, the way the Trim
+operation does: first with an empty cache, then again from the disk cache,
+then one page further along (a scroll). Needs ffmpeg.
+
+    python benchmarks/thumbnail_benchmark.py --minutes 60 --slots 8
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from probe_cache import file_fingerprint  # noqa: E402
+from thumbnails import ThumbnailCache, Thumbnailer, default_interval  # noqa: E402
+
+
+def make_long_file(path, minutes):
+    subprocess.run(['ffmpeg', '-v', 'error', '-y', '-f', 'lavfi',
+                    '-i', f'testsrc2=size=640x360:rate=10:duration={minutes * 60}',
+                    '-c:v', 'libx264', '-preset', 'ultrafast', '-g', '20', path], check=True)
+
+
+def fill(thumbnailer, path, fingerprint, times):
+    """Seconds until every slot has an image, served like the strip does (cache first, then the pool)."""
+    started = time.perf_counter()
+    remaining = []
+    for seconds in times:
+        if thumbnailer.cached(fingerprint, seconds) is None:
+            remaining.append(seconds)
+    done = threading.Event()
+    left = [len(remaining)]
+    lock = threading.Lock()
+
+    def ready(seconds, image):
+        with lock:
+            left[0] -= 1
+            if not left[0]:
+                done.set()
+
+    for seconds in remaining:
+        thumbnailer.request(path, fingerprint, seconds, ready)
+    if remaining:
+        done.wait()
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--minutes', type=int, default=60)
+    parser.add_argument('--slots', type=int, default=8, help="thumbnails visible at once")
+    parser.add_argument('--output', help="write the JSON summary here as well")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, 'long.mp4')
+        make_long_file(path, args.minutes)
+        fingerprint = file_fingerprint(path)
+        thumbnailer = Thumbnailer(ThumbnailCache(os.path.join(workdir, 'thumbnails.sqlite3')))
+        interval = default_interval(args.minutes * 60)
+        first_page = [float(slot * interval) for slot in range(args.slots)]
+        next_page = [float(slot * interval) for slot in range(args.slots, 2 * args.slots)]
+
+        summary = {
+            'minutes': args.minutes,
+            'slots': args.slots,
+            'interval': interval,
+            'first_view_seconds': fill(thumbnailer, path, fingerprint, first_page),
+            'cached_view_seconds': fill(thumbnailer, path, fingerprint, first_page),
+            'scroll_seconds': fill(thumbnailer, path, fingerprint, next_page),
+            'cache_bytes': thumbnailer.cache.total_bytes,
+        }
+        thumbnailer.close()
+
+    print(json.dumps(summary, indent=2))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)
+    if summary['scroll_seconds'] >= 1.0 or summary['cached_view_seconds'] >= 0.1:
+        print("Filling the strip took too long", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
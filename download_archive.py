@@ -0,0 +1,84 @@
+import os
+import sqlite3
+import threading
+import time
+
+from app_paths import data_dir
+
+
+class DownloadArchive:
+    """Videos already downloaded, keyed by extractor and video ID.
+
+    Unlike yt-dlp's text archive this also keeps where the file went and how
+    big it was, so an entry whose output has since been deleted or truncated
+    no longer counts and the video is fetched again.
+    """
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or os.path.join(data_dir(), 'download_archive.sqlite3')
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        with self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS archive (
+                    extractor TEXT NOT NULL,
+                    video_id TEXT NOT NULL,
+                    output_path TEXT,
+                    size INTEGER,
+                    downloaded REAL NOT NULL,
+                    PRIMARY KEY (extractor, video_id)
+                ) WITHOUT ROWID
+            """)
+
+    def get(self, extractor, video_id):
+        with self._lock:
+            row = self._conn.execute("SELECT output_path, size FROM archive WHERE extractor = ? AND video_id = ?",
+                                     (extractor.lower(), str(video_id))).fetchone()
+        return row
+
+    def has_output(self, extractor, video_id):
+        """True if the video was downloaded and its file is still there at the recorded size."""
+        if not extractor or video_id is None:
+            return False
+        row = self.get(extractor, video_id)
+        if row is None:
+            return False
+        output_path, size = row
+        try:
+            return os.path.getsize(output_path) == size
+        except (OSError, TypeError):
+            return False
+
+    def add(self, extractor, video_id, output_path):
+        output_path = os.path.abspath(output_path)
+        size = os.path.getsize(output_path)
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO archive (extractor, video_id, output_path, size, downloaded) "
+                               "VALUES (?, ?, ?, ?, ?)",
+                               (extractor.lower(), str(video_id), output_path, size, time.time()))
+
+    def remove(self, extractor, video_id):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM archive WHERE extractor = ? AND video_id = ?",
+                               (extractor.lower(), str(video_id)))
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM archive").fetchone()[0]
+
+
+_archive = None
+_archive_lock = threading.Lock()
+
+
+def get_download_archive():
+    # Shared instance; None when the data directory is unusable
+    global _archive
+    with _archive_lock:
+        if _archive is None:
+            try:
+                _archive = DownloadArchive()
+            except (OSError, sqlite3.Error):
+                _archive = False
+    return _archive or None
@@ -0,0 +1,399 @@
+import copy
+import itertools
+import os
+import sys
+
+from bandwidth import get_bandwidth_scheduler
+from download_archive import get_download_archive
+from ffmpeg_caps import get_capabilities
+from fragment_tuning import FragmentMonitor, get_fragment_tuner, site_of
+from job_control import JobCancelled
+
+QUALITY_CHOICES = [
+    "Best Quality (Full Resolution)",
+    "High Quality (up to 1080p)",
+    "Medium Quality (up to 720p)",
+    "Low Quality (up to 480p)",
+    "Audio Only"
+]
+
+# yt-dlp format selector for each quality choice
+FORMAT_SELECTORS = {
+    QUALITY_CHOICES[0]: 'bestvideo[height>=2160][ext=mp4]+bestaudio[ext=m4a]/bestvideo[height>=1440][ext=mp4]+bestaudio[ext=m4a]/bestvideo[height>=1080][ext=mp4]+bestaudio[ext=m4a]/bestvideo[height>=720][ext=mp4]+bestaudio[ext=m4a]/bestvideo[ext=mp4]+bestaudio[ext=m4a]/bestvideo+bestaudio/best',
+    QUALITY_CHOICES[1]: 'bestvideo[height<=1080][ext=mp4]+bestaudio[ext=m4a]/best[height<=1080]',
+    QUALITY_CHOICES[2]: 'bestvideo[height<=720][ext=mp4]+bestaudio[ext=m4a]/best[height<=720]',
+    QUALITY_CHOICES[3]: 'bestvideo[height<=480][ext=mp4]+bestaudio[ext=m4a]/best[height<=480]',
+    QUALITY_CHOICES[4]: 'bestaudio[ext=m4a]/bestaudio',
+}
+# Used when the chosen selector matches none of the formats a video offers
+FALLBACK_FORMAT = 'bestvideo[height>=720]+bestaudio/best[height>=720]/best'
+
+# Short names accepted by the headless job files
+QUALITY_ALIASES = {
+    'best': QUALITY_CHOICES[0],
+    '1080p': QUALITY_CHOICES[1],
+    '720p': QUALITY_CHOICES[2],
+    '480p': QUALITY_CHOICES[3],
+    'audio': QUALITY_CHOICES[4],
+}
+
+
+EXTRACTOR_ARGS = {
+    'youtube': {
+        'player_client': ['android', 'web', 'mweb', 'tv_embedded'],
+        'player_skip': ['webpage', 'configs'],
+    }
+}
+
+
+# Container every video download ends up in
+TARGET_CONTAINER = 'mp4'
+
+
+class DownloadError(Exception):
+    pass
+
+
+def get_ffmpeg_args():
+    # Capabilities are discovered once at startup; this only waits if discovery is still running
+    caps = get_capabilities()
+    encoder = caps.pick_video_encoder('h264') if caps else None
+    if encoder == 'h264_nvenc':
+        # GPU encoding settings using NVENC
+        return [
+            '-c:v', 'h264_nvenc',  # Use NVIDIA GPU encoder
+            '-preset', 'p4',       # Balanced preset
+            '-tune', 'hq',         # High quality tuning
+            '-rc', 'vbr',          # Variable bitrate
+            '-cq', '19',           # Quality level (lower is better, 19 is visually lossless)
+            '-b:v', '0',           # Let the quality parameter control the bitrate
+            '-c:a', 'aac',
+            '-b:a', '192k'
+        ]
+    elif encoder == 'h264_qsv':
+        # Intel Quick Sync
+        return ['-c:v', 'h264_qsv', '-preset', 'medium', '-global_quality', '19',
+                '-c:a', 'aac', '-b:a', '192k']
+    elif encoder == 'h264_amf':
+        # AMD AMF
+        return ['-c:v', 'h264_amf', '-quality', 'quality', '-rc', 'cqp', '-qp_i', '19', '-qp_p', '19',
+                '-c:a', 'aac', '-b:a', '192k']
+    elif encoder == 'h264_videotoolbox':
+        # Apple VideoToolbox
+        return ['-c:v', 'h264_videotoolbox', '-q:v', '65', '-c:a', 'aac', '-b:a', '192k']
+    else:
+        # CPU encoding settings
+        return [
+            '-c:v', 'libx264',
+            '-preset', 'medium',   # Balanced preset
+            '-crf', '18',          # Quality level (lower is better, 18 is visually lossless)
+            '-c:a', 'aac',
+            '-b:a', '192k'
+        ]
+
+
+def fit_download(path, normalize=False, control=None):
+    """Bring a finished video download into TARGET_CONTAINER and return its new path.
+
+    By default streams that the container can hold are copied and only the
+    others are re-encoded, so a download that already fits is left untouched.
+    `normalize` re-encodes everything to H.264/AAC with get_ffmpeg_args().
+    Audio-only downloads are kept as they are.
+    """
+    from ffmpeg_plan import container_of, execute_plan, plan_job
+    from ffmpeg_progress import run_ffmpeg
+    from media_probe import probe_media
+
+    media = probe_media(path)
+    if not media.video:
+        return path
+    base = os.path.splitext(path)[0]
+    scratch = f'{base}.fit.{TARGET_CONTAINER}'
+    if not normalize:
+        plan = plan_job(path, scratch, [], media)
+        if plan.mode == 'copy' and container_of(path) == TARGET_CONTAINER:
+            return path
+    try:
+        if normalize:
+            run_ffmpeg(['ffmpeg', '-y', '-i', path, *get_ffmpeg_args(), scratch], media.duration, control=control)
+        else:
+            execute_plan(plan, control=control)
+    except Exception:
+        if os.path.exists(scratch):
+            os.remove(scratch)
+        raise
+    target = f'{base}.{TARGET_CONTAINER}'
+    os.replace(scratch, target)
+    return target
+
+
+def _fit_postprocessor(yt_dlp, normalize, control=None):
+    class FitContainer(yt_dlp.postprocessor.PostProcessor):
+        def run(self, info):
+            path = info['filepath']
+            try:
+                target = fit_download(path, normalize, control)
+            except JobCancelled:
+                # ignoreerrors swallows anything else raised inside a playlist
+                raise yt_dlp.utils.DownloadCancelled("Cancelled")
+            if target == path:
+                return [], info
+            info['filepath'], info['ext'] = target, TARGET_CONTAINER
+            # yt-dlp deletes the original unless keepvideo is set
+            return [path], info
+
+    return FitContainer()
+
+
+def build_ydl_opts(output_path, progress_hook=None, format_choice=None):
+    # Base options; the format has to be settled here, YoutubeDL copies its options when it is built
+    ydl_opts = {
+        'format': FORMAT_SELECTORS.get(format_choice, FORMAT_SELECTORS[QUALITY_CHOICES[0]]),
+        'outtmpl': f'{output_path}/%(title)s.%(ext)s',
+        'progress_hooks': [progress_hook] if progress_hook else [],
+        'nocheckcertificate': True,
+        'ignoreerrors': True,
+        'no_warnings': True,
+        'quiet': True,
+        'extract_flat': False,
+        'force_generic_extractor': False,
+        'socket_timeout': 30,
+        'retries': 10,
+        'fragment_retries': 10,
+        # Raised per site by FragmentMonitor while segmented downloads get faster with it
+        'concurrent_fragment_downloads': 1,
+        'extractor_args': EXTRACTOR_ARGS,
+        # Merging is a stream copy; fitting the result into the container is done by FitContainer
+        'merge_output_format': TARGET_CONTAINER,
+        'prefer_ffmpeg': True,
+        'keepvideo': False,
+        'writethumbnail': False,
+        'writesubtitles': False,
+        'writeautomaticsub': False,
+        'geo_bypass': True,
+        'geo_verification_proxy': None,
+        'geo_bypass_country': None,
+        'geo_bypass_ip_block': None,
+        'extractor_retries': 5,
+        'http_headers': {
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+            'Accept-Language': 'en-us,en;q=0.5',
+            'Sec-Fetch-Mode': 'navigate',
+        }
+    }
+    return ydl_opts
+
+
+_extractor_classes = None
+
+
+def archive_key(url):
+    """(extractor, video id) for a URL without extracting it, or None if only extraction can tell."""
+    global _extractor_classes
+    if _extractor_classes is None:
+        from yt_dlp.extractor import gen_extractor_classes
+        _extractor_classes = [ie for ie in gen_extractor_classes() if ie.ie_key() != 'Generic']
+    for ie in _extractor_classes:
+        if ie.suitable(url):
+            video_id = ie.get_temp_id(url)
+            return (ie.ie_key(), video_id) if video_id else None
+    return None
+
+
+class DownloadResult(list):
+    """The paths download() produced; `skipped` when they are the archived file of a video it did not fetch."""
+
+    def __init__(self, paths=(), skipped=False):
+        super().__init__(paths)
+        self.skipped = skipped
+
+
+def download(url, output_path, format_choice, progress_hook=None, archive=None, normalize=False, weight=1.0,
+             control=None):
+    """Download one URL. Videos in the download archive whose file is still present are skipped
+    before any metadata is extracted; pass archive=False to bypass the archive. Downloads are
+    remuxed into TARGET_CONTAINER, or fully re-encoded with `normalize` (see fit_download).
+    `weight` is this download's share of the global bandwidth limit relative to the others.
+    Pausing `control` holds the transfer at its next progress update; cancelling it stops the
+    download there and raises JobCancelled, leaving the .part file for a later resume.
+    Returns a DownloadResult: the paths of the files it produced, or of the archived file it skipped."""
+    # yt_dlp pulls in hundreds of extractor modules; only pay for that once a download starts
+    import yt_dlp
+
+    archive = get_download_archive() if archive is None else archive
+    key = archive_key(url) if archive else None
+    if key and archive.has_output(*key):
+        return DownloadResult([archive.get(*key)[0]], skipped=True)
+
+    outputs = {}
+    skipped = []
+
+    def remember(d):
+        # The last hook to fire for a video (merge, convert, move) carries its final path
+        info = d.get('info_dict') or {}
+        path = info.get('filepath') or d.get('filename')
+        if d.get('status') == 'finished' and info.get('id') and path:
+            outputs[(info.get('extractor_key') or info.get('ie_key'), info['id'])] = path
+
+    def skip_archived(info, incomplete=False):
+        # Also consulted for each playlist entry before yt-dlp extracts it
+        if archive.has_output(info.get('extractor_key') or info.get('ie_key'), info.get('id')):
+            skipped.append(info.get('id'))
+            return "already in the download archive"
+        return None
+
+    def check(d):
+        try:
+            control.check()
+        except JobCancelled:
+            # The one exception yt-dlp lets through its error handling without touching .part files
+            raise yt_dlp.utils.DownloadCancelled("Cancelled")
+
+    ydl_opts = build_ydl_opts(output_path, progress_hook, format_choice)
+    if control:
+        ydl_opts['progress_hooks'].insert(0, check)
+    monitor = FragmentMonitor(get_fragment_tuner(), site_of(url))
+    ydl_opts['progress_hooks'].append(monitor.hook)
+    ydl_opts['logger'] = monitor
+    lease = get_bandwidth_scheduler().lease(weight)
+    ydl_opts['progress_hooks'].extend([lease.hook, remember])
+    ydl_opts['postprocessor_hooks'] = [check, remember] if control else [remember]
+    if archive:
+        ydl_opts['match_filter'] = skip_archived
+    try:
+        _download(yt_dlp, url, ydl_opts, _fit_postprocessor(yt_dlp, normalize, control), (monitor, lease))
+    except yt_dlp.utils.DownloadCancelled:
+        if control and control.cancelled:
+            control.check()
+        raise
+    finally:
+        lease.close()
+        if archive:
+            for (extractor, video_id), path in outputs.items():
+                if extractor and os.path.exists(path):
+                    archive.add(extractor, video_id, path)
+    paths = [path for path in outputs.values() if os.path.exists(path)]
+    # Only archived videos matched: nothing new was downloaded
+    return DownloadResult(paths, skipped=bool(skipped) and not paths)
+
+
+def _log_formats(info):
+    # Kept for debugging; stderr so the headless JSON-lines output stays clean
+    formats = [f for f in info.get('formats') or [] if f.get('height')]
+    if formats:
+        print("\nAvailable formats:", file=sys.stderr)
+        for f in formats:
+            print(f"Format: {f.get('format_id')} - Resolution: {f.get('height')}p - Ext: {f.get('ext')} - Filesize: {f.get('filesize', 'N/A')}", file=sys.stderr)
+
+
+def _process(ydl, info, url):
+    ydl.process_ie_result(info, download=True)
+    # ignoreerrors makes yt-dlp record failures in its return code instead of raising;
+    # download() reads the same attribute to compute its result
+    if getattr(ydl, '_download_retcode', 0):
+        raise DownloadError(f"yt-dlp could not download {url}")
+
+
+def _open(yt_dlp, ydl_opts, postprocessor, attachments):
+    ydl = yt_dlp.YoutubeDL(ydl_opts)
+    ydl.add_post_processor(postprocessor, when='post_process')
+    # These tune the live params (fragment workers, rate limit) while the download runs
+    for attachment in attachments:
+        attachment.attach(ydl)
+    return ydl
+
+
+def _download(yt_dlp, url, ydl_opts, postprocessor, attachments):
+    """Extract once, then hand the same info dict to yt-dlp for format selection and download."""
+    with _open(yt_dlp, ydl_opts, postprocessor, attachments) as ydl:
+        info = ydl.extract_info(url, download=False, process=False)
+        if not info:
+            raise DownloadError(f"yt-dlp found nothing to download at {url}")
+        _log_formats(info)
+        # Playlist entries are generators and cannot be replayed; only a single video gets the fallback
+        reusable = info.get('_type', 'video') == 'video'
+        try:
+            _process(ydl, copy.deepcopy(info) if reusable else info, url)
+            return
+        except Exception as e:
+            if not reusable or ydl_opts['format'] == FALLBACK_FORMAT or isinstance(e, yt_dlp.utils.DownloadCancelled):
+                raise
+            error = e
+    # The selected quality is not offered: retry with a looser selector, reusing the extraction
+    fallback_opts = dict(ydl_opts, format=FALLBACK_FORMAT)
+    with _open(yt_dlp, fallback_opts, postprocessor, attachments) as ydl:
+        try:
+            _process(ydl, info, url)
+        except Exception:
+            raise error
+
+
+# Entries fetched per request when a playlist is paged rather than a generator
+PLAYLIST_PAGE_SIZE = 50
+
+
+def _iter_entries(entries):
+    if hasattr(entries, 'getslice'):
+        # yt-dlp PagedList: pull one page at a time instead of the whole list
+        index = 0
+        while True:
+            page = entries.getslice(index, index + PLAYLIST_PAGE_SIZE)
+            if not page:
+                return
+            yield from page
+            index += len(page)
+    else:
+        yield from entries or ()
+
+
+def _flatten(ydl, result):
+    # Channels resolve through "url" results (channel -> videos tab) and may nest playlists
+    while result and result.get('_type') in ('url', 'url_transparent') and result.get('url'):
+        nested = ydl.extract_info(result['url'], download=False, process=False, ie_key=result.get('ie_key'))
+        if nested is None or nested.get('_type', 'video') == 'video':
+            yield {'url': result['url'], 'title': result.get('title')}
+            return
+        result = nested
+    if not result:
+        return
+    if result.get('_type') != 'playlist':
+        yield {'url': result.get('webpage_url') or result.get('original_url'), 'title': result.get('title')}
+        return
+    for entry in _iter_entries(result.get('entries')):
+        if not entry:
+            continue
+        if entry.get('_type') == 'playlist':
+            yield from _flatten(ydl, entry)
+        else:
+            yield {'url': entry.get('webpage_url') or entry.get('url'), 'title': entry.get('title'),
+                   'extractor': entry.get('ie_key'), 'id': entry.get('id')}
+
+
+def expand_url(url, start=1, end=None, limit=None):
+    """Yield {'url', 'title'} for each video behind a URL, listing playlists and channels lazily.
+
+    Entries are flat (no per-video metadata) and come out as the extractor
+    pages through the listing, so the first downloads can start long before
+    a large channel is fully listed. `start`/`end` are 1-based and inclusive
+    like yt-dlp's playlist items; `limit` caps the number yielded. A plain
+    video URL yields itself.
+    """
+    import yt_dlp
+
+    opts = {
+        'extract_flat': 'in_playlist',
+        'lazy_playlist': True,
+        'quiet': True,
+        'no_warnings': True,
+        'socket_timeout': 30,
+        'extractor_retries': 5,
+        'extractor_args': EXTRACTOR_ARGS,
+    }
+    with yt_dlp.YoutubeDL(opts) as ydl:
+        result = ydl.extract_info(url, download=False, process=False)
+        entries = (entry for entry in _flatten(ydl, result) if entry['url'])
+        stop = end if end else None
+        if limit:
+            stop = min(stop, start - 1 + limit) if stop else start - 1 + limit
+        yield from itertools.islice(entries, max(0, start - 1), stop)
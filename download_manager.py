@@ -0,0 +1,421 @@
+import random
+import re
+import threading
+import time
+from collections import Counter, deque
+from dataclasses import dataclass, asdict
+from urllib.parse import urlparse
+
+from download_archive import get_download_archive
+from ffmpeg_progress import ProgressThrottle
+from job_control import JobCancelled, JobControl
+
+QUEUED = 'queued'
+DOWNLOADING = 'downloading'
+RETRYING = 'retrying'
+DONE = 'done'
+FAILED = 'failed'
+SKIPPED = 'skipped'
+CANCELLED = 'cancelled'
+
+DEFAULT_CONCURRENCY = 3
+DEFAULT_PER_HOST = 2
+DEFAULT_RETRIES = 3
+# Seconds before the first retry; doubles with each further attempt
+DEFAULT_BACKOFF = 5.0
+MAX_BACKOFF = 300.0
+
+
+def parse_url_list(text):
+    """URLs from pasted text or a list file: whitespace separated, '#' starts a comment."""
+    urls = []
+    for line in text.splitlines():
+        # '#' only starts a comment at the start of a word, so URL fragments survive
+        for word in re.split(r'(?:^|\s)#', line, 1)[0].split():
+            if word.startswith(('http://', 'https://')) and word not in urls:
+                urls.append(word)
+    return urls
+
+
+def load_url_file(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return parse_url_list(f.read())
+
+
+def host_of(url):
+    return (urlparse(url).hostname or '').lower()
+
+
+@dataclass
+class DownloadTask:
+    id: int
+    url: str
+    output_dir: str
+    quality: str
+    host: str
+    title: str = None
+    normalize: bool = False
+    state: str = QUEUED
+    attempts: int = 0
+    downloaded_bytes: int = 0
+    total_bytes: int = None
+    speed: float = None
+    eta: float = None
+    filename: str = None
+    error: str = None
+    not_before: float = 0.0
+    started: float = None
+    finished: float = None
+
+    @property
+    def progress(self):
+        if not self.total_bytes:
+            return None
+        return min(100.0, self.downloaded_bytes / self.total_bytes * 100)
+
+    def as_dict(self):
+        data = asdict(self)
+        data['progress'] = self.progress
+        return data
+
+
+def _expand(url, start, end, limit):
+    from download_engine import expand_url
+    return expand_url(url, start, end, limit)
+
+
+def _run_download(task, hook, control):
+    # The journaled engine checks the download archive itself before extracting
+    from job_queue import run_now
+    spec = {'url': task.url, 'output_dir': task.output_dir, 'quality': task.quality}
+    if task.normalize:
+        spec['normalize'] = True
+    result = run_now('download', spec, hook, control=control)
+    return SKIPPED if getattr(result, 'skipped', False) else None
+
+
+class DownloadManager:
+    """Runs many downloads at once with a global cap, a per-host cap and retries.
+
+    Workers are plain threads so the manager works the same in the GUI and
+    headless; `on_update(task)` is called from those threads, throttled per
+    task, whenever a task's progress or state changes, and with None when
+    only the totals changed (archive skips, a listing finishing). `runner(task, hook, control)`
+    does the actual download and defaults to the journaled yt-dlp engine; it
+    should call `control.check()` now and then (JobControl), and returns
+    SKIPPED when the video turned out to be archived already.
+
+    `cancel` and `pause` act on single tasks or, without a task id, on the
+    whole manager: cancelling everything also stops the listings feeding it,
+    and a paused manager starts nothing new until it is resumed. Cancelled
+    tasks are not retried.
+
+    Playlists and channels are fed in by `add_source`, which lists them
+    lazily and stops pulling entries while the backlog is full, so memory
+    follows the number of jobs in flight rather than the playlist length.
+    Entries already in the download archive (with their file still present)
+    are skipped without being queued. Finished tasks are only kept as counts.
+    """
+
+    def __init__(self, concurrency=DEFAULT_CONCURRENCY, per_host=DEFAULT_PER_HOST, retries=DEFAULT_RETRIES,
+                 backoff=DEFAULT_BACKOFF, on_update=None, runner=None, expander=None, archive=None,
+                 clock=time.monotonic):
+        self.concurrency = max(1, concurrency)
+        self.per_host = max(1, per_host)
+        self.retries = retries
+        self.backoff = backoff
+        self.on_update = on_update
+        self.runner = runner or _run_download
+        self.expander = expander or _expand
+        # None means the shared archive; False turns skipping off
+        self.archive = get_download_archive() if archive is None else archive
+        self.clock = clock
+        # Unfinished tasks by id
+        self.tasks = {}
+        self._count = 0
+        self._finished = Counter()
+        self._finished_bytes = 0
+        self._pending = deque()
+        self._hosts = Counter()
+        self._active = 0
+        self._workers = 0
+        self._feeders = 0
+        self._closed = False
+        self._paused = False
+        # Bumped by cancel() so running listings stop feeding
+        self._generation = 0
+        self._controls = {}
+        self._cond = threading.Condition()
+
+    @property
+    def backlog(self):
+        # Queued tasks a playlist feeder may get ahead of the workers
+        return max(4, 2 * self.concurrency)
+
+    def _add(self, url, output_dir, quality, title=None, normalize=False, state=QUEUED, error=None):
+        # Called with the lock held
+        self._count += 1
+        task = DownloadTask(self._count, url, output_dir, quality, host_of(url), title, normalize, state,
+                            error=error)
+        if state == QUEUED:
+            self.tasks[task.id] = task
+            self._pending.append(task)
+            self._spawn()
+            self._cond.notify_all()
+        else:
+            self._finished[state] += 1
+        return task
+
+    def add(self, url, output_dir, quality, title=None, normalize=False):
+        with self._cond:
+            task = self._add(url, output_dir, quality, title, normalize)
+        self._notify(task)
+        return task
+
+    def add_many(self, urls, output_dir, quality, normalize=False):
+        return [self.add(url, output_dir, quality, normalize=normalize) for url in urls]
+
+    def add_source(self, url, output_dir, quality, start=1, end=None, limit=None, normalize=False):
+        """Expand a playlist, channel or video URL in the background and queue what it lists."""
+        with self._cond:
+            self._feeders += 1
+            generation = self._generation
+        threading.Thread(target=self._feed, args=(url, output_dir, quality, start, end, limit, normalize, generation),
+                         name='download-feeder', daemon=True).start()
+
+    def _feed(self, url, output_dir, quality, start, end, limit, normalize, generation):
+        entries = None
+        throttle = ProgressThrottle()
+        try:
+            entries = self.expander(url, start, end, limit)
+            for entry in entries:
+                if self.archive and self.archive.has_output(entry.get('extractor'), entry.get('id')):
+                    with self._cond:
+                        self._add(entry['url'], output_dir, quality, entry.get('title'), normalize, SKIPPED)
+                    if throttle.ready():
+                        self._notify(None)
+                    continue
+                with self._cond:
+                    while (self._pending and len(self._pending) >= self.backlog and not self._closed
+                           and generation == self._generation):
+                        self._cond.wait()
+                    if self._closed or generation != self._generation:
+                        break
+                    task = self._add(entry['url'], output_dir, quality, entry.get('title'), normalize)
+                self._notify(task)
+        except Exception as e:
+            with self._cond:
+                task = self._add(url, output_dir, quality, state=FAILED, error=f"Could not list {url}: {e}")
+            self._notify(task)
+        finally:
+            if hasattr(entries, 'close'):
+                entries.close()
+            with self._cond:
+                self._feeders -= 1
+                self._cond.notify_all()
+            self._notify(None)
+
+    def set_limits(self, concurrency=None, per_host=None):
+        with self._cond:
+            if concurrency:
+                self.concurrency = max(1, concurrency)
+            if per_host:
+                self.per_host = max(1, per_host)
+            self._spawn()
+            self._cond.notify_all()
+
+    def _spawn(self):
+        # Called with the lock held; extra workers retire on their own when the cap drops
+        while self._workers < min(self.concurrency, len(self._pending) + self._active):
+            self._workers += 1
+            threading.Thread(target=self._work, name=f'download-{self._workers}', daemon=True).start()
+
+    def _next_task(self):
+        """Pop the first pending task whose host has room and whose backoff has passed.
+
+        Returns (task, None), or (None, seconds to wait) when nothing is runnable yet.
+        """
+        now = self.clock()
+        wait = None
+        for task in self._pending:
+            if self._hosts[task.host] >= self.per_host:
+                continue
+            if task.not_before > now:
+                delay = task.not_before - now
+                wait = delay if wait is None else min(wait, delay)
+                continue
+            self._pending.remove(task)
+            return task, None
+        return None, wait
+
+    def _work(self):
+        while True:
+            with self._cond:
+                while True:
+                    if self._closed or self._workers > self.concurrency or not self._pending:
+                        self._workers -= 1
+                        self._cond.notify_all()
+                        return
+                    if self._paused:
+                        self._cond.wait()
+                        continue
+                    task, wait = self._next_task()
+                    if task:
+                        break
+                    self._cond.wait(wait)
+                self._hosts[task.host] += 1
+                self._active += 1
+                task.state = DOWNLOADING
+                task.attempts += 1
+                task.started = task.started or time.time()
+                control = self._controls[task.id] = JobControl()
+            self._notify(task)
+            self._run(task, control)
+
+    def _run(self, task, control):
+        throttle = ProgressThrottle()
+
+        def hook(d):
+            if d.get('status') != 'downloading':
+                return
+            task.downloaded_bytes = d.get('downloaded_bytes') or task.downloaded_bytes
+            task.total_bytes = d.get('total_bytes') or d.get('total_bytes_estimate') or task.total_bytes
+            task.speed = d.get('speed')
+            task.eta = d.get('eta')
+            task.filename = d.get('filename') or task.filename
+            if throttle.ready():
+                self._notify(task)
+
+        cancelled = skipped = False
+        try:
+            skipped = self.runner(task, hook, control) == SKIPPED
+        except JobCancelled:
+            cancelled, error = True, None
+        except Exception as e:
+            error = str(e)
+        else:
+            error = None
+        with self._cond:
+            del self._controls[task.id]
+            self._hosts[task.host] -= 1
+            self._active -= 1
+            task.speed = None
+            task.error = error
+            if cancelled or error is None:
+                task.state = CANCELLED if cancelled else SKIPPED if skipped else DONE
+                task.finished = time.time()
+                self._retire(task)
+            elif task.attempts <= self.retries:
+                task.state = RETRYING
+                delay = min(MAX_BACKOFF, self.backoff * 2 ** (task.attempts - 1))
+                # A little jitter so tasks that failed together do not retry together
+                task.not_before = self.clock() + delay * random.uniform(1.0, 1.25)
+                self._pending.append(task)
+            else:
+                task.state = FAILED
+                task.finished = time.time()
+                self._retire(task)
+            self._spawn()
+            self._cond.notify_all()
+        self._notify(task)
+
+    def _retire(self, task):
+        del self.tasks[task.id]
+        self._finished[task.state] += 1
+        self._finished_bytes += task.downloaded_bytes
+
+    def _notify(self, task):
+        if self.on_update:
+            self.on_update(task)
+
+    @property
+    def idle(self):
+        with self._cond:
+            return not self._pending and not self._active and not self._feeders
+
+    def wait(self, timeout=None):
+        """Block until every added task is done or failed; False if the timeout ran out first."""
+        deadline = None if timeout is None else self.clock() + timeout
+        with self._cond:
+            while self._pending or self._active or self._feeders:
+                remaining = None if deadline is None else deadline - self.clock()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def cancel(self, task_id=None, interrupt=False):
+        """Cancel one task, or every queued, running and still to be listed one. Partial files are kept.
+
+        With `interrupt` the running jobs stay in the job journal, to be resumed by the next session.
+        """
+        with self._cond:
+            if task_id is None:
+                self._generation += 1
+                pending = list(self._pending)
+                controls = list(self._controls.values())
+            else:
+                pending = [task for task in self._pending if task.id == task_id]
+                controls = [self._controls[task_id]] if task_id in self._controls else []
+            for task in pending:
+                self._pending.remove(task)
+                task.state, task.finished = CANCELLED, time.time()
+                self._retire(task)
+            self._cond.notify_all()
+        for task in pending:
+            self._notify(task)
+        # Outside the lock: stopping a child process can take a few seconds
+        for control in controls:
+            control.cancel(interrupt)
+        return bool(pending or controls)
+
+    @property
+    def paused(self):
+        with self._cond:
+            return self._paused
+
+    def pause(self, task_id=None):
+        """Hold one running task where it is, or the whole manager (running and queued tasks)."""
+        with self._cond:
+            if task_id is None:
+                self._paused = True
+                controls = list(self._controls.values())
+            else:
+                controls = [self._controls[task_id]] if task_id in self._controls else []
+        for control in controls:
+            control.pause()
+
+    def resume(self, task_id=None):
+        with self._cond:
+            if task_id is None:
+                self._paused = False
+                controls = list(self._controls.values())
+                self._spawn()
+                self._cond.notify_all()
+            else:
+                controls = [self._controls[task_id]] if task_id in self._controls else []
+        for control in controls:
+            control.resume()
+
+    def close(self):
+        # Running downloads finish; queued ones are dropped
+        with self._cond:
+            self._closed = True
+            self._pending.clear()
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            live = list(self.tasks.values())
+            return {
+                'total': self._count,
+                'queued': len(self._pending),
+                'active': self._active,
+                'done': self._finished[DONE],
+                'failed': self._finished[FAILED],
+                'skipped': self._finished[SKIPPED],
+                'cancelled': self._finished[CANCELLED],
+                'listing': self._feeders,
+                'speed': sum(task.speed or 0 for task in live if task.state == DOWNLOADING),
+                'downloaded_bytes': self._finished_bytes + sum(task.downloaded_bytes for task in live),
+            }
@@ -0,0 +1,211 @@
+import json
+import os
+import shutil
+import subprocess
+import threading
+
+from app_paths import cache_dir
+
+# Hardware encoders worth trying, best first, and the software encoder each falls back to
+HARDWARE_ENCODERS = {
+    'h264': ['h264_nvenc', 'h264_qsv', 'h264_amf', 'h264_videotoolbox'],
+    'hevc': ['hevc_nvenc', 'hevc_qsv', 'hevc_amf', 'hevc_videotoolbox'],
+}
+SOFTWARE_ENCODERS = {
+    'h264': 'libx264',
+    'hevc': 'libx265',
+}
+
+CACHE_VERSION = 1
+
+
+def _run(binary, *args, timeout=30):
+    try:
+        result = subprocess.run([binary, '-hide_banner', *args], capture_output=True, timeout=timeout)
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    return result
+
+
+def _parse_codec_list(output):
+    # Lines after the "------" separator look like " V....D libx264   description"
+    names = set()
+    started = False
+    for line in output.splitlines():
+        if not started:
+            started = line.strip().startswith('------')
+            continue
+        parts = line.split()
+        if len(parts) >= 2:
+            names.add(parts[1])
+    return names
+
+
+def _parse_filters(output):
+    # " T.C scale  V->V  Scale the input video size..." after the legend block
+    names = set()
+    for line in output.splitlines():
+        parts = line.split()
+        if len(parts) >= 3 and '->' in parts[2]:
+            names.add(parts[1])
+    return names
+
+
+def _parse_hwaccels(output):
+    lines = [line.strip() for line in output.splitlines()]
+    if 'Hardware acceleration methods:' in lines:
+        lines = lines[lines.index('Hardware acceleration methods:') + 1:]
+    return {line for line in lines if line}
+
+
+def _probe_encoder(binary, encoder):
+    # Listing an encoder only means it was compiled in; a one-frame encode proves the hardware is there
+    result = _run(binary, '-v', 'error', '-f', 'lavfi', '-i', 'color=size=256x256:duration=0.1',
+                  '-frames:v', '1', '-c:v', encoder, '-f', 'null', '-', timeout=15)
+    return result is not None and result.returncode == 0
+
+
+class FFmpegCapabilities:
+    def __init__(self, binary=None, encoders=(), decoders=(), filters=(), hwaccels=(), verified=None):
+        self.binary = binary
+        self.encoders = set(encoders)
+        self.decoders = set(decoders)
+        self.filters = set(filters)
+        self.hwaccels = set(hwaccels)
+        # hardware encoder -> whether a test encode succeeded
+        self.verified = dict(verified or {})
+
+    @property
+    def available(self):
+        return self.binary is not None
+
+    def has_encoder(self, name):
+        return name in self.encoders
+
+    def has_decoder(self, name):
+        return name in self.decoders
+
+    def has_filter(self, name):
+        return name in self.filters
+
+    def encoder_usable(self, name):
+        if name not in self.encoders:
+            return False
+        return self.verified.get(name, True)
+
+    def pick_video_encoder(self, codec='h264', prefer_hardware=True):
+        """Best working encoder for a codec: verified hardware first, then software."""
+        if prefer_hardware:
+            for name in HARDWARE_ENCODERS.get(codec, []):
+                if self.verified.get(name):
+                    return name
+        software = SOFTWARE_ENCODERS.get(codec)
+        if software and software in self.encoders:
+            return software
+        return None
+
+    def software_fallback(self, encoder):
+        for codec, names in HARDWARE_ENCODERS.items():
+            if encoder in names:
+                return SOFTWARE_ENCODERS[codec]
+        return None
+
+    def to_dict(self):
+        return {
+            'binary': self.binary,
+            'encoders': sorted(self.encoders),
+            'decoders': sorted(self.decoders),
+            'filters': sorted(self.filters),
+            'hwaccels': sorted(self.hwaccels),
+            'verified': self.verified,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data.get('binary'), data.get('encoders', ()), data.get('decoders', ()),
+                   data.get('filters', ()), data.get('hwaccels', ()), data.get('verified'))
+
+
+def discover(binary):
+    caps = FFmpegCapabilities(binary)
+    for flag, attr, parse in (('-encoders', 'encoders', _parse_codec_list),
+                              ('-decoders', 'decoders', _parse_codec_list),
+                              ('-filters', 'filters', _parse_filters),
+                              ('-hwaccels', 'hwaccels', _parse_hwaccels)):
+        result = _run(binary, flag)
+        if result is not None and result.returncode == 0:
+            setattr(caps, attr, parse(result.stdout.decode('utf-8', 'replace')))
+    for names in HARDWARE_ENCODERS.values():
+        for name in names:
+            if name in caps.encoders:
+                caps.verified[name] = _probe_encoder(binary, name)
+    return caps
+
+
+def _cache_key(binary):
+    stat = os.stat(binary)
+    return {'version': CACHE_VERSION, 'binary': os.path.abspath(binary), 'mtime_ns': stat.st_mtime_ns}
+
+
+def load_capabilities(binary=None, cache_path=None):
+    """Capabilities of the ffmpeg on PATH, cached on disk per binary path and mtime."""
+    binary = binary or shutil.which('ffmpeg')
+    if not binary:
+        return FFmpegCapabilities()
+    cache_path = cache_path or os.path.join(cache_dir(), 'ffmpeg_caps.json')
+    key = _cache_key(binary)
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            cached = json.load(f)
+        if cached.get('key') == key:
+            return FFmpegCapabilities.from_dict(cached['capabilities'])
+    except (OSError, ValueError, KeyError):
+        pass
+    caps = discover(binary)
+    try:
+        with open(cache_path, 'w', encoding='utf-8') as f:
+            json.dump({'key': key, 'capabilities': caps.to_dict()}, f)
+    except OSError:
+        pass
+    return caps
+
+
+class CapabilityService:
+    """Runs discovery once on a background thread; callers block only if they ask before it is done."""
+
+    def __init__(self):
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._caps = None
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._discover, name='ffmpeg-caps', daemon=True)
+                self._thread.start()
+
+    def _discover(self):
+        try:
+            self._caps = load_capabilities()
+        except Exception:
+            self._caps = FFmpegCapabilities()
+        finally:
+            self._ready.set()
+
+    def get(self, timeout=None):
+        self.start()
+        if not self._ready.wait(timeout):
+            return None
+        return self._caps
+
+
+_service = CapabilityService()
+
+
+def start_discovery():
+    _service.start()
+
+
+def get_capabilities(timeout=None):
+    return _service.get(timeout)
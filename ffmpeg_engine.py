@@ -0,0 +1,26 @@
+from ffmpeg_plan import plan_job, execute_plan
+from media_probe import probe_media
+from parallel_encode import plan_parallel_job
+
+
+def plan_processing(input_file, output_file, operations, chunks=0, media=None):
+    media = media or probe_media(input_file)
+    if chunks > 1:
+        return plan_parallel_job(input_file, output_file, operations, chunks, media=media)
+    return plan_job(input_file, output_file, operations, media)
+
+
+def process(input_file, output_file, operations, chunks=0, media=None, on_progress=None, on_message=None,
+            done_steps=(), on_step_done=None, control=None):
+    """Plan and run one processing job. Shared by the GUI worker and the headless runner.
+
+    Planning is deterministic, so a job re-run with the `done_steps` journaled
+    by `on_step_done` skips the chunks or smart-cut pieces it already finished.
+    """
+    plan = plan_processing(input_file, output_file, operations, chunks, media)
+    for note in plan.notes:
+        if on_message:
+            on_message(note)
+    execute_plan(plan, on_progress=on_progress, done_steps=done_steps, on_step_done=on_step_done,
+                 control=control)
+    return plan
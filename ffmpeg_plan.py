@@ -0,0 +1,734 @@
+import os
+import shlex
+import shutil
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, replace
+from itertools import groupby
+
+from ffmpeg_caps import get_capabilities
+from ffmpeg_progress import run_ffmpeg, ProgressThrottle
+from media_probe import StreamInfo, probe_media, find_keyframe_before, find_keyframe_after
+
+# Codecs each container can hold without re-encoding. None means "anything".
+CONTAINER_CODECS = {
+    'mp4': {'h264', 'hevc', 'mpeg4', 'av1', 'vp9', 'aac', 'mp3', 'ac3', 'eac3', 'alac', 'opus', 'flac'},
+    'm4v': {'h264', 'hevc', 'mpeg4', 'aac', 'ac3'},
+    'mov': {'h264', 'hevc', 'mpeg4', 'prores', 'mjpeg', 'aac', 'mp3', 'ac3', 'alac', 'pcm_s16le', 'pcm_s24le'},
+    'mkv': None,
+    'webm': {'vp8', 'vp9', 'av1', 'opus', 'vorbis'},
+    'avi': {'h264', 'mpeg4', 'mjpeg', 'mp3', 'ac3', 'pcm_s16le'},
+    'ts': {'h264', 'hevc', 'mpeg2video', 'aac', 'mp3', 'ac3', 'eac3'},
+}
+
+# Encoders used when a copied stream does not fit the output container
+CONTAINER_DEFAULTS = {
+    'mp4': ('libx264', 'aac'),
+    'm4v': ('libx264', 'aac'),
+    'mov': ('libx264', 'aac'),
+    'webm': ('libvpx-vp9', 'libopus'),
+    'avi': ('mpeg4', 'libmp3lame'),
+    'ts': ('libx264', 'aac'),
+}
+
+# Encoder name -> codec it produces
+VIDEO_ENCODERS = {
+    'libx264': 'h264',
+    'libx265': 'hevc',
+    'h264_nvenc': 'h264',
+    'hevc_nvenc': 'hevc',
+    'av1_nvenc': 'av1',
+    'h264_qsv': 'h264',
+    'hevc_qsv': 'hevc',
+    'h264_amf': 'h264',
+    'hevc_amf': 'hevc',
+    'h264_videotoolbox': 'h264',
+    'hevc_videotoolbox': 'hevc',
+    'mpeg4': 'mpeg4',
+    'mpeg2video': 'mpeg2video',
+    'libvpx-vp9': 'vp9',
+    'libsvtav1': 'av1',
+}
+AUDIO_ENCODERS = {
+    'aac': 'aac',
+    'libmp3lame': 'mp3',
+    'libopus': 'opus',
+    'libvorbis': 'vorbis',
+}
+
+# Names offered in the UI that are codecs rather than encoders
+VIDEO_CODEC_ALIASES = {'vp9': 'libvpx-vp9', 'h264': 'libx264', 'hevc': 'libx265', 'av1': 'libsvtav1'}
+AUDIO_CODEC_ALIASES = {'mp3': 'libmp3lame', 'opus': 'libopus', 'vorbis': 'libvorbis'}
+
+PRESETS = ['ultrafast', 'superfast', 'veryfast', 'faster', 'fast', 'medium', 'slow', 'slower', 'veryslow']
+
+# Hardware encoder families, each with its own rate control options
+NVENC_ENCODERS = {'h264_nvenc', 'hevc_nvenc', 'av1_nvenc'}
+QSV_ENCODERS = {'h264_qsv', 'hevc_qsv'}
+AMF_ENCODERS = {'h264_amf', 'hevc_amf'}
+VIDEOTOOLBOX_ENCODERS = {'h264_videotoolbox', 'hevc_videotoolbox'}
+
+# Encoders whose 4:2:0 output needs even frame dimensions
+EVEN_DIMENSION_ENCODERS = {'libx264', 'libx265', 'libvpx-vp9', 'libsvtav1', *NVENC_ENCODERS, *QSV_ENCODERS,
+                           *AMF_ENCODERS, *VIDEOTOOLBOX_ENCODERS}
+
+# Encoder that reproduces a source codec closely enough to concat with copied GOPs
+MATCHING_ENCODERS = {
+    'h264': 'libx264',
+    'hevc': 'libx265',
+    'mpeg4': 'mpeg4',
+    'mpeg2video': 'mpeg2video',
+    'vp9': 'libvpx-vp9',
+    'av1': 'libsvtav1',
+}
+
+# Bitstream filters that put parameter sets in-band, so pieces made by different encoders join cleanly
+ANNEXB_FILTERS = {'h264': 'h264_mp4toannexb', 'hevc': 'hevc_mp4toannexb'}
+# ffprobe profile name -> encoder profile
+X264_PROFILES = {
+    'Constrained Baseline': 'baseline', 'Baseline': 'baseline', 'Main': 'main', 'High': 'high',
+    'High 10': 'high10', 'High 4:2:2': 'high422', 'High 4:4:4 Predictive': 'high444',
+}
+X265_PROFILES = {'Main': 'main', 'Main 10': 'main10', 'Main Still Picture': 'mainstillpicture', 'Rext': None}
+
+# Relative cost of a second of stream copy compared to a second of encoding
+COPY_WEIGHT = 0.05
+
+# How long planning waits for the startup capability scan before skipping those checks
+CAPABILITIES_TIMEOUT = 15
+
+# Encoders that take -pass/-passlogfile (x265 gets the same through -x265-params)
+TWO_PASS_ENCODERS = {'libx264', 'libx265', 'libvpx-vp9', 'mpeg4'}
+# Share of a target size spent on the streams; the rest is left for the container
+SIZE_HEADROOM = 0.97
+MIN_VIDEO_KBPS = 32
+# Assumed for copied audio whose bitrate the probe did not report
+DEFAULT_AUDIO_KBPS = 128
+# The first pass only analyses, so it costs about half of the second
+FIRST_PASS_WEIGHT = 0.5
+
+
+class PlanError(ValueError):
+    pass
+
+
+@dataclass
+class PlanStep:
+    command: list
+    duration: float
+    weight: float = None
+    label: str = ''
+    # Consecutive steps sharing a group run concurrently
+    group: str = None
+    # Frame count used for progress when the duration is unknown
+    frames: int = None
+    # Working directory for the ffmpeg process, for encoders that take relative scratch paths
+    cwd: str = None
+
+    def __post_init__(self):
+        if self.weight is None:
+            self.weight = self.duration or 1.0
+
+    def fraction_done(self, event):
+        if event.finished:
+            return 1.0
+        if self.duration:
+            return min(event.out_time / self.duration, 1.0)
+        if self.frames:
+            return min(event.frame / self.frames, 1.0)
+        return None
+
+
+@dataclass
+class JobPlan:
+    mode: str
+    steps: list
+    duration: float
+    snap_offset: float = 0.0
+    notes: list = field(default_factory=list)
+    workdir: str = None
+    files: dict = field(default_factory=dict)
+    max_workers: int = None
+
+    @property
+    def command(self):
+        return self.steps[-1].command
+
+    def prepare(self):
+        # Scratch files are only written when the plan actually runs, so a dry run has no side effects
+        if self.workdir:
+            os.makedirs(self.workdir, exist_ok=True)
+        for path, content in self.files.items():
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(content)
+
+    def cleanup(self):
+        if self.workdir:
+            shutil.rmtree(self.workdir, ignore_errors=True)
+
+    def describe(self):
+        lines = [f"Mode: {self.mode}"]
+        for step in self.steps:
+            prefix = f"[{step.label}] " if step.label else ''
+            lines.append(prefix + format_command(step.command))
+        lines.extend(self.notes)
+        return '\n'.join(lines)
+
+
+@dataclass
+class CompiledChain:
+    video_encoder: str = 'copy'
+    video_args: list = field(default_factory=list)
+    filters: list = field(default_factory=list)
+    audio_encoder: str = 'copy'
+    audio_args: list = field(default_factory=list)
+    start: float = 0.0
+    duration: float = None
+    smart_trim: bool = False
+    compress: dict = None
+    # Output size in bytes for target-size compression
+    target_size: int = None
+    notes: list = field(default_factory=list)
+
+    @property
+    def stream_copy(self):
+        return self.video_encoder == 'copy' and self.audio_encoder == 'copy'
+
+
+def format_command(command):
+    if os.name == 'nt':
+        return subprocess.list2cmdline(command)
+    return shlex.join(command)
+
+
+def container_of(path):
+    ext = os.path.splitext(path)[1].lower().lstrip('.')
+    return 'mkv' if ext == 'mka' else ext
+
+
+def combine_trims(operations):
+    """Fold every trim into a single (start, duration) range on the source.
+
+    Each trim applies to the output of the previous one; a duration of 0
+    means "until the end". Returns None if there is no trim.
+    """
+    start, duration = None, None
+    for op in operations:
+        if op['type'] != 'trim':
+            continue
+        op_start, op_duration = float(op['start']), float(op['duration'])
+        if op_start < 0 or op_duration < 0:
+            raise PlanError("Trim start and duration cannot be negative")
+        if start is None:
+            start, duration = op_start, op_duration if op_duration > 0 else None
+            continue
+        start += op_start
+        remaining = None if duration is None else max(duration - op_start, 0.0)
+        if op_duration > 0:
+            remaining = op_duration if remaining is None else min(remaining, op_duration)
+        duration = remaining
+    if start is None:
+        return None
+    if duration == 0:
+        raise PlanError("The trim operations leave nothing to keep")
+    return start, duration
+
+
+def _last(operations, op_type, notes, label):
+    matching = [op for op in operations if op['type'] == op_type]
+    if len(matching) > 1:
+        notes.append(f"Merged {len(matching)} {label} operations; the last one wins")
+    return matching[-1] if matching else None
+
+
+def _video_quality_args(encoder, compress):
+    preset = compress['preset']
+    if preset not in PRESETS:
+        raise PlanError(f"Unknown compression preset '{preset}'")
+    if compress.get('mode', 'crf') == 'size':
+        return _video_rate_args(encoder, compress, preset)
+    quality = int(compress['quality'])
+    if not 0 <= quality <= 51:
+        raise PlanError(f"Compression quality must be between 0 and 51, got {quality}")
+    if encoder in ('libx264', 'libx265'):
+        return ['-crf', str(quality), '-preset', preset]
+    if encoder == 'libvpx-vp9':
+        # VP9 has no x264-style presets; map them onto its speed scale
+        cpu_used = 8 - round(PRESETS.index(preset) * 8 / (len(PRESETS) - 1))
+        return ['-crf', str(quality), '-b:v', '0', '-deadline', 'good', '-cpu-used', str(cpu_used)]
+    if encoder == 'libsvtav1':
+        return ['-crf', str(quality), '-preset', str(12 - PRESETS.index(preset))]
+    if encoder in NVENC_ENCODERS:
+        return ['-rc', 'vbr', '-cq', str(quality), '-b:v', '0']
+    # Same rate control the download re-encode uses for these encoders (download_engine.get_ffmpeg_args)
+    if encoder in QSV_ENCODERS:
+        return ['-preset', _qsv_preset(preset), '-global_quality', str(quality)]
+    if encoder in AMF_ENCODERS:
+        return ['-quality', _amf_quality(preset), '-rc', 'cqp', '-qp_i', str(quality), '-qp_p', str(quality)]
+    if encoder in VIDEOTOOLBOX_ENCODERS:
+        # -q:v runs from 1 to 100, higher is better
+        return ['-q:v', str(max(1, round(100 - quality * 100 / 51)))]
+    raise PlanError(f"{encoder} does not support quality-based compression; pick another codec")
+
+
+def _qsv_preset(preset):
+    # QSV has the x264 names from veryfast on
+    return PRESETS[max(PRESETS.index(preset), PRESETS.index('veryfast'))]
+
+
+def _amf_quality(preset):
+    index = PRESETS.index(preset)
+    if index < PRESETS.index('fast'):
+        return 'speed'
+    return 'balanced' if index < PRESETS.index('slow') else 'quality'
+
+
+def _video_rate_args(encoder, compress, preset):
+    # Everything but the bitrate, which plan_job works out from the duration
+    if float(compress.get('target_mb') or 0) <= 0:
+        raise PlanError("Target size must be positive")
+    if encoder in ('libx264', 'libx265'):
+        return ['-preset', preset]
+    if encoder == 'libvpx-vp9':
+        cpu_used = 8 - round(PRESETS.index(preset) * 8 / (len(PRESETS) - 1))
+        return ['-deadline', 'good', '-cpu-used', str(cpu_used)]
+    if encoder == 'mpeg4':
+        return []
+    if encoder in NVENC_ENCODERS:
+        # NVENC runs both passes inside one encode
+        return ['-rc', 'vbr', '-multipass', 'fullres']
+    if encoder in QSV_ENCODERS:
+        return ['-preset', _qsv_preset(preset)]
+    if encoder in AMF_ENCODERS:
+        return ['-quality', _amf_quality(preset), '-rc', 'vbr_peak']
+    if encoder in VIDEOTOOLBOX_ENCODERS:
+        return []
+    raise PlanError(f"{encoder} cannot encode to a target size; pick another codec")
+
+
+def _audio_kbps(chain, media):
+    if media is not None and media.audio is None:
+        return 0
+    if '-b:a' in chain.audio_args:
+        return int(chain.audio_args[chain.audio_args.index('-b:a') + 1].rstrip('k'))
+    if chain.audio_encoder == 'copy' and media and media.audio.bitrate:
+        return media.audio.bitrate / 1000
+    return DEFAULT_AUDIO_KBPS
+
+
+def target_video_kbps(chain, media, duration):
+    """Video bitrate that brings `duration` seconds of output to chain.target_size next to its audio."""
+    if not duration:
+        raise PlanError("Target size needs an input with a known duration")
+    total_kbps = chain.target_size * 8 * SIZE_HEADROOM / duration / 1000
+    video_kbps = int(total_kbps - _audio_kbps(chain, media))
+    if video_kbps < MIN_VIDEO_KBPS:
+        raise PlanError(f"{chain.target_size / 1e6:g} MB leaves only {max(video_kbps, 0)} kb/s of video for "
+                        f"{duration:.0f}s; pick a larger size, a shorter trim or a lower audio bitrate")
+    return video_kbps
+
+
+def compile_operations(operations, media=None, output_file=None, capabilities=None):
+    """Merge an operation chain into one validated encoder/filter configuration.
+
+    Later operations of the same kind override earlier ones, every trim is
+    folded into a single input-side seek, streams that need no processing
+    are copied, and chains ffmpeg would reject are refused up front with a
+    PlanError. With `capabilities`, encoders are also checked against the
+    installed ffmpeg and missing hardware encoders fall back to software.
+    """
+    chain = CompiledChain()
+    notes = chain.notes
+    source_duration = media.duration if media else None
+    for op in operations:
+        if op['type'] not in ('compress', 'convert', 'resize', 'trim', 'audio'):
+            raise PlanError(f"Unknown operation '{op['type']}'")
+
+    compress = _last(operations, 'compress', notes, 'Compression')
+    convert = _last(operations, 'convert', notes, 'Conversion')
+    resize = _last(operations, 'resize', notes, 'Resize')
+    audio = _last(operations, 'audio', notes, 'Audio')
+
+    if compress or convert or resize:
+        encoder = 'libx264'
+        if convert:
+            encoder = VIDEO_CODEC_ALIASES.get(convert['codec'], convert['codec'])
+            if encoder not in VIDEO_ENCODERS:
+                raise PlanError(f"Unknown video codec '{convert['codec']}'")
+        chain.video_encoder = encoder
+        if compress:
+            chain.compress = compress
+            chain.video_args = _video_quality_args(encoder, compress)
+            if compress.get('mode', 'crf') == 'size':
+                chain.target_size = int(float(compress['target_mb']) * 1000 * 1000)
+        if resize:
+            width, height = int(resize['width']), int(resize['height'])
+            if width <= 0 or height <= 0:
+                raise PlanError("Resize width and height must be positive")
+            if encoder in EVEN_DIMENSION_ENCODERS and (width % 2 or height % 2):
+                raise PlanError(f"{encoder} needs even dimensions, got {width}x{height}")
+            chain.filters.append(f'scale={width}:{height}')
+
+    if audio:
+        encoder = AUDIO_CODEC_ALIASES.get(audio['codec'], audio['codec'])
+        if encoder not in AUDIO_ENCODERS:
+            raise PlanError(f"Unknown audio codec '{audio['codec']}'")
+        bitrate = int(audio['bitrate'])
+        if not 8 <= bitrate <= 512:
+            raise PlanError(f"Audio bitrate must be between 8 and 512 kbps, got {bitrate}")
+        chain.audio_encoder = encoder
+        chain.audio_args = ['-b:a', f'{bitrate}k']
+
+    trim = combine_trims(operations)
+    if trim:
+        chain.start, chain.duration = trim
+        if source_duration and chain.start >= source_duration:
+            raise PlanError(f"Trim starts at {chain.start:.2f}s but the input is only {source_duration:.2f}s long")
+        chain.smart_trim = any(op.get('mode') == 'smart' for op in operations if op['type'] == 'trim')
+        if chain.smart_trim and chain.video_encoder == 'copy' and chain.audio_encoder != 'copy':
+            # Smart cut copies audio; with re-encoded audio an accurate re-encode is simpler
+            chain.video_encoder = 'libx264'
+            notes.append("Smart cut with audio changes: re-encoding video for a frame-accurate cut")
+
+    if output_file:
+        _fit_container(chain, media.codecs if media else (), container_of(output_file))
+    if capabilities and capabilities.available:
+        _check_encoders(chain, capabilities)
+    return chain
+
+
+def _check_encoders(chain, capabilities):
+    if chain.video_encoder not in (None, 'copy') and not capabilities.encoder_usable(chain.video_encoder):
+        fallback = capabilities.software_fallback(chain.video_encoder)
+        if fallback and capabilities.has_encoder(fallback):
+            chain.notes.append(f"{chain.video_encoder} is not usable on this machine; using {fallback}")
+            chain.video_encoder = fallback
+            if chain.compress:
+                chain.video_args = _video_quality_args(fallback, chain.compress)
+        else:
+            raise PlanError(f"The installed FFmpeg has no working {chain.video_encoder} encoder")
+    if chain.audio_encoder not in (None, 'copy') and not capabilities.has_encoder(chain.audio_encoder):
+        raise PlanError(f"The installed FFmpeg has no {chain.audio_encoder} encoder")
+    for name in chain.filters:
+        if not capabilities.has_filter(name.split('=', 1)[0]):
+            raise PlanError(f"The installed FFmpeg has no {name.split('=', 1)[0]} filter")
+
+
+def _fit_container(chain, source_codecs, container):
+    if container not in CONTAINER_CODECS:
+        # Unknown container: let ffmpeg choose its default encoders for copied streams
+        if chain.video_encoder == 'copy':
+            chain.video_encoder = None
+        if chain.audio_encoder == 'copy':
+            chain.audio_encoder = None
+        return
+    allowed = CONTAINER_CODECS[container]
+    if allowed is None:
+        return
+    default_video, default_audio = CONTAINER_DEFAULTS[container]
+    for encoder in (chain.video_encoder, chain.audio_encoder):
+        codec = VIDEO_ENCODERS.get(encoder) or AUDIO_ENCODERS.get(encoder)
+        if codec and codec not in allowed:
+            raise PlanError(f"{codec} cannot be stored in a .{container} file")
+    for kind, name in source_codecs:
+        if name in allowed:
+            continue
+        if kind == 'video' and chain.video_encoder == 'copy':
+            chain.video_encoder = default_video
+            chain.notes.append(f"Source video ({name}) does not fit .{container}; re-encoding with {default_video}")
+        elif kind == 'audio' and chain.audio_encoder == 'copy':
+            chain.audio_encoder = default_audio
+            chain.notes.append(f"Source audio ({name}) does not fit .{container}; re-encoding with {default_audio}")
+
+
+def build_command(input_file, output_file, chain):
+    command = ['ffmpeg', '-y']
+    if chain.start > 0:
+        # Input-side seek: jump to the nearest keyframe instead of decoding up to the cut
+        command.extend(['-ss', f'{chain.start:.6f}'])
+    command.extend(['-i', input_file])
+    if chain.duration:
+        command.extend(['-t', f'{chain.duration:.6f}'])
+    if chain.filters:
+        command.extend(['-vf', ','.join(chain.filters)])
+    if chain.video_encoder:
+        command.extend(['-c:v', chain.video_encoder, *chain.video_args])
+    if chain.audio_encoder:
+        command.extend(['-c:a', chain.audio_encoder, *chain.audio_args])
+    if chain.video_encoder == 'copy':
+        command.extend(['-avoid_negative_ts', 'make_zero'])
+    command.append(output_file)
+    return command
+
+
+def concat_entry(path):
+    return "file '" + path.replace("'", "'\\''") + "'\n"
+
+
+def matching_encode_args(encoder, video):
+    """Encoder arguments that reproduce the source's profile, level, reference count, pixel format and timebase."""
+    args = ['-c:v', encoder, '-pix_fmt', video.pix_fmt or 'yuv420p']
+    if video.time_base:
+        args.extend(['-enc_time_base:v', video.time_base])
+    if encoder == 'libx264':
+        args.extend(['-crf', '18', '-preset', 'medium'])
+        if X264_PROFILES.get(video.profile):
+            args.extend(['-profile:v', X264_PROFILES[video.profile]])
+        if video.level and video.level >= 10:
+            args.extend(['-level:v', f'{video.level / 10:.1f}'])
+        if video.refs:
+            args.extend(['-refs', str(video.refs)])
+    elif encoder == 'libx265':
+        args.extend(['-crf', '18', '-preset', 'medium'])
+        if X265_PROFILES.get(video.profile):
+            args.extend(['-profile:v', X265_PROFILES[video.profile]])
+        if video.level:
+            # HEVC levels are reported as 30 times the level number
+            args = _merge_x265_params(args, {'level-idc': f'{video.level / 30:.1f}'})
+    elif encoder == 'libvpx-vp9':
+        # Constant quality; at its default bitrate VP9 comes out far blockier than the copied middle
+        args.extend(['-crf', '18', '-b:v', '0', '-deadline', 'good'])
+    elif encoder == 'libsvtav1':
+        args.extend(['-crf', '18'])
+    elif encoder in ('mpeg4', 'mpeg2video'):
+        args.extend(['-q:v', '2'])
+    return args
+
+
+def _fallback_chain(encoder, media, output_file, start, duration):
+    # Picked like compile_operations would: the source's matching encoder if its codec fits the
+    # container, else the container's default, and streams that do not fit are re-encoded too
+    chain = CompiledChain(start=start, duration=duration)
+    container = container_of(output_file)
+    _fit_container(chain, media.codecs, container)
+    if chain.video_encoder in ('copy', None):
+        chain.video_encoder = encoder or CONTAINER_DEFAULTS.get(container, ('libx264',))[0]
+    video = media.video
+    if video:
+        if chain.video_encoder != encoder:
+            # A different codec: none of the source's profile or level applies
+            video = StreamInfo(video.index, 'video', VIDEO_ENCODERS.get(chain.video_encoder))
+        chain.video_args = matching_encode_args(chain.video_encoder, video)[2:]
+    return chain
+
+
+def plan_smart_cut(input_file, output_file, start, end, media):
+    """Frame-accurate trim that only re-encodes the partial GOPs at each end.
+
+    The keyframe-aligned middle is stream-copied and the three video pieces
+    are joined with the concat demuxer. Audio packets are tiny, so the audio
+    is simply copied over the exact range and muxed back in.
+
+    The re-encoded ends copy the source's profile, level and timebase, and
+    H.264/HEVC pieces are written as MPEG-TS in Annex B form: each piece
+    carries its own SPS/PPS in-band, so the copied middle is never decoded
+    with the parameter sets of a re-encoded end.
+    """
+    video = media.video
+    encoder = MATCHING_ENCODERS.get(video.codec) if video else None
+    first_key = find_keyframe_after(input_file, start) if encoder else None
+    last_key = find_keyframe_before(input_file, end) if first_key is not None else None
+    if first_key is None or last_key is None or last_key <= first_key:
+        # No whole GOP inside the range: re-encoding the range is all there is
+        chain = _fallback_chain(encoder, media, output_file, start, end - start)
+        plan = JobPlan('encode', [PlanStep(build_command(input_file, output_file, chain), end - start)], end - start)
+        plan.notes.append("Smart cut fell back to re-encoding: no keyframe-aligned section in range")
+        return plan
+
+    output_dir, output_name = os.path.split(os.path.abspath(output_file))
+    workdir = os.path.join(output_dir, f'.{output_name}.smartcut')
+    encode_args = matching_encode_args(encoder, video)
+    annexb = ANNEXB_FILTERS.get(video.codec)
+    piece_args = ['-bsf:v', annexb, '-f', 'mpegts'] if annexb else []
+    steps = []
+    pieces = []
+
+    def piece(name):
+        path = os.path.join(workdir, f"{name}.{'ts' if annexb else 'mkv'}")
+        pieces.append(path)
+        return path
+
+    if first_key - start > 0.001:
+        head = first_key - start
+        steps.append(PlanStep(['ffmpeg', '-y', '-ss', f'{start:.6f}', '-i', input_file, '-t', f'{head:.6f}',
+                               '-map', '0:v:0', '-an', *encode_args, *piece_args, piece('head')], head, label='head'))
+    # Seek just past the keyframe so the demuxer lands exactly on it
+    seek = first_key + 0.001
+    steps.append(PlanStep(['ffmpeg', '-y', '-ss', f'{seek:.6f}', '-i', input_file, '-t', f'{last_key - seek:.6f}',
+                           '-map', '0:v:0', '-an', '-c:v', 'copy', *piece_args, piece('middle')],
+                          last_key - first_key, (last_key - first_key) * COPY_WEIGHT, 'middle'))
+    if end - last_key > 0.001:
+        tail = end - last_key
+        steps.append(PlanStep(['ffmpeg', '-y', '-ss', f'{last_key:.6f}', '-i', input_file, '-t', f'{tail:.6f}',
+                               '-map', '0:v:0', '-an', *encode_args, *piece_args, piece('tail')], tail, label='tail'))
+
+    concat_list = os.path.join(workdir, 'pieces.txt')
+    duration = end - start
+    steps.append(PlanStep(['ffmpeg', '-y', '-f', 'concat', '-safe', '0', '-i', concat_list,
+                           '-ss', f'{start:.6f}', '-t', f'{duration:.6f}', '-i', input_file,
+                           '-map', '0:v:0', '-map', '1:a?', '-c', 'copy', output_file],
+                          duration, duration * COPY_WEIGHT, 'join'))
+    notes = [f"Smart cut: re-encoded {duration - (last_key - first_key):.3f}s, copied {last_key - first_key:.3f}s"]
+    return JobPlan('smart', steps, duration, notes=notes, workdir=workdir,
+                   files={concat_list: ''.join(concat_entry(path) for path in pieces)})
+
+
+def _merge_x265_params(video_args, params):
+    """video_args with `params` added to its -x265-params (or a new one), replacing keys it already sets."""
+    args = list(video_args)
+    if '-x265-params' not in args:
+        return [*args, '-x265-params', ':'.join(f'{key}={value}' for key, value in params.items())]
+    index = args.index('-x265-params') + 1
+    kept = [item for item in args[index].split(':') if item and item.split('=', 1)[0] not in params]
+    args[index] = ':'.join([*kept, *(f'{key}={value}' for key, value in params.items())])
+    return args
+
+
+def plan_two_pass(input_file, output_file, chain, duration, media):
+    """Encode to chain.target_size: the bitrate follows from the duration, and a first
+    analysis pass lets the second spend it where the picture needs it.
+
+    Both passes run inside the scratch directory with a relative stats file:
+    x265 takes its stats path inside -x265-params, where the ':' of a Windows
+    drive letter would split the value.
+    """
+    kbps = target_video_kbps(chain, media, duration)
+    rate = ['-b:v', f'{kbps}k']
+    notes = [f"Target size {chain.target_size / 1e6:g} MB: video at {kbps} kb/s"]
+    if chain.video_encoder not in TWO_PASS_ENCODERS:
+        command = build_command(input_file, output_file, replace(chain, video_args=[*chain.video_args, *rate]))
+        return JobPlan('encode', [PlanStep(command, duration)], duration, notes=notes)
+
+    input_file, output_file = os.path.abspath(input_file), os.path.abspath(output_file)
+    output_dir, output_name = os.path.split(output_file)
+    workdir = os.path.join(output_dir, f'.{output_name}.2pass')
+
+    def video_args(number):
+        if chain.video_encoder == 'libx265':
+            return _merge_x265_params([*chain.video_args, *rate], {'pass': number, 'stats': 'pass.log'})
+        return [*chain.video_args, *rate, '-pass', str(number), '-passlogfile', 'pass']
+
+    # The first pass only needs the video statistics; its output is thrown away
+    first = build_command(input_file, os.devnull, replace(
+        chain, video_args=video_args(1), audio_encoder=None, audio_args=[]))
+    first[-1:-1] = ['-an', '-f', 'null']
+    second = build_command(input_file, output_file, replace(chain, video_args=video_args(2)))
+    steps = [PlanStep(first, duration, duration * FIRST_PASS_WEIGHT, 'pass 1', cwd=workdir),
+             PlanStep(second, duration, label='pass 2', cwd=workdir)]
+    return JobPlan('two-pass', steps, duration, notes=notes, workdir=workdir)
+
+
+def plan_job(input_file, output_file, operations, media=None):
+    """Compile the operation chain and pick the cheapest command that runs it.
+
+    Jobs that change no pixels are stream-copied with an input-side seek, or
+    smart-cut when a trim asks for frame accuracy; everything else runs as a
+    single encode with one filtergraph and one encoder configuration, or
+    two passes when the compression asks for a target size. Planning never
+    writes files, so the result doubles as a dry run.
+    """
+    media = media or probe_media(input_file)
+    chain = compile_operations(operations, media, output_file, get_capabilities(CAPABILITIES_TIMEOUT))
+    end = media.duration
+    if chain.duration:
+        end = chain.start + chain.duration if end is None else min(chain.start + chain.duration, end)
+    duration = max(end - chain.start, 0.0) if end is not None else None
+    notes = list(chain.notes)
+
+    if chain.stream_copy and chain.smart_trim:
+        if end is not None:
+            plan = plan_smart_cut(input_file, output_file, chain.start, end, media)
+            plan.notes[:0] = notes
+            return plan
+        notes.append("Smart cut needs a known end point; cutting on keyframes instead")
+
+    if chain.target_size:
+        plan = plan_two_pass(input_file, output_file, chain, duration, media)
+        plan.notes[:0] = notes
+        return plan
+
+    # Frame-based progress for inputs whose container has no duration
+    frames = None
+    if duration is None:
+        frames = media.total_frames
+    elif media.video and media.video.fps:
+        frames = int(duration * media.video.fps)
+
+    snap_offset = 0.0
+    if chain.video_encoder == 'copy' and chain.start > 0:
+        keyframe = find_keyframe_before(input_file, chain.start)
+        if keyframe is not None:
+            snap_offset = max(chain.start - keyframe, 0.0)
+            if snap_offset > 0.001:
+                notes.append(f"Cut snapped {snap_offset:.3f}s earlier to the keyframe at {keyframe:.3f}s")
+
+    command = build_command(input_file, output_file, chain)
+    if chain.stream_copy:
+        total = duration + snap_offset if duration is not None else None
+        step = PlanStep(command, total, (total or 1.0) * COPY_WEIGHT, frames=frames)
+        return JobPlan('copy', [step], total, snap_offset, notes)
+    return JobPlan('encode', [PlanStep(command, duration, frames=frames)], duration, snap_offset, notes)
+
+
+def execute_plan(plan, on_progress=None, done_steps=(), on_step_done=None, control=None):
+    """Run every step of a plan, folding per-step progress into one percentage.
+
+    Grouped steps run side by side (up to plan.max_workers ffmpeg processes);
+    their individual percentages are reported in the event's `stages`.
+
+    Steps whose label is in `done_steps` and whose output still exists are
+    skipped, and `on_step_done(step)` is called as each step finishes. When a
+    caller journals steps this way the scratch directory is kept on failure,
+    so a later run of the same plan picks up at the first unfinished step.
+    Every ffmpeg process of the plan is paused, resumed and stopped through
+    `control` (a JobControl).
+    """
+    total_weight = sum(step.weight for step in plan.steps) or 1.0
+    fractions = {id(step): 1.0 for step in plan.steps
+                 if step.label in done_steps and os.path.exists(step.command[-1])}
+    lock = threading.Lock()
+    throttle = ProgressThrottle()
+
+    def reporter(step, grouped):
+        def report(event):
+            with lock:
+                fraction = step.fraction_done(event)
+                if fraction is not None:
+                    fractions[id(step)] = fraction
+                    done = sum(s.weight * fractions.get(id(s), 0.0) for s in plan.steps)
+                    event.progress = done / total_weight * 100
+                if grouped:
+                    event.stages = {s.label: fractions.get(id(s), 0.0) * 100
+                                    for s in plan.steps if s.group == step.group}
+                    event.finished = False
+                if on_progress and throttle.ready(final=event.finished):
+                    on_progress(event)
+        return report
+
+    def run_step(step, grouped):
+        if control:
+            control.check()
+        run_ffmpeg(step.command, on_progress=reporter(step, grouped), control=control, cwd=step.cwd)
+        with lock:
+            fractions[id(step)] = 1.0
+        if on_step_done:
+            on_step_done(step)
+
+    plan.prepare()
+    succeeded = False
+    try:
+        for group, steps in groupby(plan.steps, key=lambda step: step.group):
+            steps = [step for step in steps if fractions.get(id(step)) != 1.0]
+            if group is None or len(steps) == 1:
+                for step in steps:
+                    run_step(step, False)
+                continue
+            with ThreadPoolExecutor(max_workers=plan.max_workers or len(steps)) as pool:
+                futures = [pool.submit(run_step, step, True) for step in steps]
+                for future in futures:
+                    future.result()
+        succeeded = True
+    finally:
+        if succeeded or on_step_done is None:
+            plan.cleanup()
@@ -1,543 +1,171 @@
+import copy
+import itertools
 import os
-import subprocess
+import threading
 from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QPushButton,
                             QLabel, QFileDialog, QComboBox, QProgressBar,
                             QMessageBox, QCheckBox, QSpinBox, QDoubleSpinBox,
                             QGroupBox, QScrollArea, QFrame, QApplication, QTabWidget)
-from PyQt6.QtCore import QThread, pyqtSignal, Qt
+from PyQt6.QtCore import QThread, QTimer, pyqtSignal, Qt
 from PyQt6.QtGui import QFont, QIcon, QPalette, QColor
-
-DARK_STYLE = """
-QWidget {
-    background-color: #181818;
-    color: #E0E0E0;
-    font-family: 'Segoe UI', Arial, sans-serif;
-}
-QLabel {
-    color: #E0E0E0;
-}
-QLineEdit, QComboBox, QProgressBar, QGroupBox, QTabWidget, QTabBar, QCheckBox {
-    font-family: 'Segoe UI', Arial, sans-serif;
-}
-QLineEdit {
-    padding: 8px;
-    border: 1px solid #333;
-    border-radius: 4px;
-    background-color: #232323;
-    color: #E0E0E0;
-    min-height: 25px;
-}
-QComboBox {
-    padding: 8px;
-    border: 1px solid #333;
-    border-radius: 4px;
-    background-color: #232323;
-    color: #E0E0E0;
-    min-height: 25px;
-}
-QComboBox QAbstractItemView {
-    background-color: #232323;
-    color: #E0E0E0;
-    selection-background-color: #333;
-    selection-color: #E0E0E0;
-    border: 1px solid #333;
-}
-QProgressBar {
-    border: 1px solid #333;
-    border-radius: 4px;
-    text-align: center;
-    background-color: #232323;
-    color: #E0E0E0;
-}
-QProgressBar::chunk {
-    background-color: #2196F3;
-    border-radius: 3px;
-}
-QGroupBox {
-    background-color: #232323;
-    border: 1px solid #333;
-    border-radius: 6px;
-    margin-top: 12px;
-    padding: 12px;
-    color: #E0E0E0;
-}
-QGroupBox::title {
-    subcontrol-origin: margin;
-    left: 10px;
-    padding: 0 5px;
-    color: #42A5F5;
-    font-weight: bold;
-    background: transparent;
-}
-QTabWidget::pane {
-    border: 1px solid #333;
-    background: #181818;
-}
-QTabBar::tab {
-    background: #232323;
-    color: #E0E0E0;
-    border: 1px solid #333;
-    border-bottom: none;
-    padding: 8px 16px;
-    min-width: 100px;
-}
-QTabBar::tab:selected {
-    background: #181818;
-    color: #42A5F5;
-    border-bottom: 2px solid #2196F3;
-}
-QTabBar::tab:!selected {
-    margin-top: 2px;
-}
-QCheckBox {
-    color: #E0E0E0;
-    spacing: 8px;
-}
-QCheckBox::indicator {
-    width: 18px;
-    height: 18px;
-    border: 2px solid #333;
-    border-radius: 3px;
-    background-color: #232323;
-}
-QCheckBox::indicator:checked {
-    background-color: #2196F3;
-    border-color: #2196F3;
-}
-QPushButton {
-    background-color: #232323;
-    color: #E0E0E0;
-    border: none;
-    border-radius: 4px;
-    padding: 8px 16px;
-}
-QPushButton:hover {
-    background-color: #333;
-}
-QPushButton:pressed {
-    background-color: #444;
-}
-QPushButton:disabled {
-    background-color: #232323;
-    color: #757575;
-}
-QMessageBox {
-    background-color: #181818;
-}
-QMessageBox QLabel {
-    color: #E0E0E0;
-}
-"""
-
-LIGHT_STYLE = """
-QWidget {
-    background-color: #F5F5F5;
-    color: #212121;
-    font-family: 'Segoe UI', Arial, sans-serif;
-}
-QLabel {
-    color: #212121;
-}
-QLineEdit, QComboBox, QProgressBar, QGroupBox, QTabWidget, QTabBar, QCheckBox {
-    font-family: 'Segoe UI', Arial, sans-serif;
-}
-QLineEdit {
-    padding: 8px;
-    border: 1px solid #E0E0E0;
-    border-radius: 4px;
-    background-color: white;
-    color: #212121;
-    min-height: 25px;
-}
-QComboBox {
-    padding: 8px;
-    border: 1px solid #E0E0E0;
-    border-radius: 4px;
-    background-color: white;
-    color: #212121;
-    min-height: 25px;
-}
-QComboBox QAbstractItemView {
-    background-color: white;
-    color: #212121;
-    selection-background-color: #E0E0E0;
-    selection-color: #212121;
-    border: 1px solid #E0E0E0;
-}
-QProgressBar {
-    border: 1px solid #E0E0E0;
-    border-radius: 4px;
-    text-align: center;
-    background-color: #F5F5F5;
-    color: #212121;
-}
-QProgressBar::chunk {
-    background-color: #2196F3;
-    border-radius: 3px;
-}
-QGroupBox {
-    background-color: #FFFFFF;
-    border: 1px solid #E0E0E0;
-    border-radius: 6px;
-    margin-top: 12px;
-    padding: 12px;
-    color: #212121;
-}
-QGroupBox::title {
-    subcontrol-origin: margin;
-    left: 10px;
-    padding: 0 5px;
-    color: #2196F3;
-    font-weight: bold;
-    background: transparent;
-}
-QTabWidget::pane {
-    border: 1px solid #E0E0E0;
-    background: #F5F5F5;
-}
-QTabBar::tab {
-    background: #FFFFFF;
-    color: #212121;
-    border: 1px solid #E0E0E0;
-    border-bottom: none;
-    padding: 8px 16px;
-    min-width: 100px;
-}
-QTabBar::tab:selected {
-    background: #F5F5F5;
-    color: #2196F3;
-    border-bottom: 2px solid #2196F3;
-}
-QTabBar::tab:!selected {
-    margin-top: 2px;
-}
-QCheckBox {
-    color: #212121;
-    spacing: 8px;
-}
-QCheckBox::indicator {
-    width: 18px;
-    height: 18px;
-    border: 2px solid #E0E0E0;
-    border-radius: 3px;
-    background-color: white;
-}
-QCheckBox::indicator:checked {
-    background-color: #2196F3;
-    border-color: #2196F3;
-}
-QPushButton {
-    background-color: #E0E0E0;
-    color: #212121;
-    border: none;
-    border-radius: 4px;
-    padding: 8px 16px;
-}
-QPushButton:hover {
-    background-color: #BDBDBD;
-}
-QPushButton:pressed {
-    background-color: #9E9E9E;
-}
-QPushButton:disabled {
-    background-color: #F5F5F5;
-    color: #BDBDBD;
-}
-QMessageBox {
-    background-color: #F5F5F5;
-}
-QMessageBox QLabel {
-    color: #212121;
-}
-"""
-
-class StyledButton(QPushButton):
-    def __init__(self, text, primary=False, is_dark_mode=True):
-        super().__init__(text)
-        self.setMinimumHeight(35)
-        self.is_dark_mode = is_dark_mode
-        self.primary = primary
-        self.apply_theme()
-
-    def apply_theme(self):
-        if self.is_dark_mode:
-            if self.primary:
-                self.setStyleSheet("""
-                    QPushButton {
-                        background-color: #2196F3;
-                        color: white;
-                        border: none;
-                        border-radius: 4px;
-                        padding: 8px 16px;
-                        font-weight: bold;
-                    }
-                    QPushButton:hover {
-                        background-color: #1976D2;
-                    }
-                    QPushButton:pressed {
-                        background-color: #1565C0;
-                    }
-                    QPushButton:disabled {
-                        background-color: #424242;
-                        color: #757575;
-                    }
-                """)
-            else:
-                self.setStyleSheet("""
-                    QPushButton {
-                        background-color: #424242;
-                        color: #E0E0E0;
-                        border: none;
-                        border-radius: 4px;
-                        padding: 8px 16px;
-                    }
-                    QPushButton:hover {
-                        background-color: #616161;
-                    }
-                    QPushButton:pressed {
-                        background-color: #757575;
-                    }
-                    QPushButton:disabled {
-                        background-color: #2D2D2D;
-                        color: #757575;
-                    }
-                """)
-        else:
-            if self.primary:
-                self.setStyleSheet("""
-                    QPushButton {
-                        background-color: #2196F3;
-                        color: white;
-                        border: none;
-                        border-radius: 4px;
-                        padding: 8px 16px;
-                        font-weight: bold;
-                    }
-                    QPushButton:hover {
-                        background-color: #1976D2;
-                    }
-                    QPushButton:pressed {
-                        background-color: #1565C0;
-                    }
-                    QPushButton:disabled {
-                        background-color: #BDBDBD;
-                        color: #757575;
-                    }
-                """)
-            else:
-                self.setStyleSheet("""
-                    QPushButton {
-                        background-color: #E0E0E0;
-                        color: #212121;
-                        border: none;
-                        border-radius: 4px;
-                        padding: 8px 16px;
-                    }
-                    QPushButton:hover {
-                        background-color: #BDBDBD;
-                    }
-                    QPushButton:pressed {
-                        background-color: #9E9E9E;
-                    }
-                    QPushButton:disabled {
-                        background-color: #F5F5F5;
-                        color: #BDBDBD;
-                    }
-                """)
+from ffmpeg_engine import plan_processing
+from job_queue import run_now
+from job_control import JobCancelled, JobControl
+from ffmpeg_plan import container_of, VIDEO_ENCODERS
+from media_probe import probe_media
+from parallel_encode import default_workers
+from progress_bus import progress_bus, format_eta
+from ffmpeg_caps import get_capabilities
+from size_estimate import estimate_size
+from theme import StyledButton, theme_manager, set_state
+from thumbnail_strip import ThumbnailStrip
 
 class OperationGroup(QGroupBox):
-    def __init__(self, title, is_dark_mode=True):
+    def __init__(self, title):
         super().__init__(title)
-        self.is_dark_mode = is_dark_mode
-        self.apply_theme()
-
-    def apply_theme(self):
-        if self.is_dark_mode:
-            self.setStyleSheet("""
-                QGroupBox {
-                    background-color: #2D2D2D;
-                    border: 1px solid #424242;
-                    border-radius: 6px;
-                    margin-top: 12px;
-                    padding: 12px;
-                    color: #E0E0E0;
-                }
-                QGroupBox::title {
-                    subcontrol-origin: margin;
-                    left: 10px;
-                    padding: 0 5px;
-                    color: #2196F3;
-                    font-weight: bold;
-                }
-                QLabel {
-                    color: #E0E0E0;
-                }
-                QComboBox, QSpinBox, QDoubleSpinBox {
-                    padding: 5px;
-                    border: 1px solid #424242;
-                    border-radius: 4px;
-                    background-color: #2D2D2D;
-                    color: #E0E0E0;
-                    min-height: 25px;
-                }
-                QComboBox::drop-down {
-                    border: none;
-                }
-                QComboBox::down-arrow {
-                    image: none;
-                    border: none;
-                }
-                QComboBox QAbstractItemView {
-                    background-color: #2D2D2D;
-                    color: #E0E0E0;
-                    selection-background-color: #424242;
-                    selection-color: #E0E0E0;
-                    border: 1px solid #424242;
-                }
-            """)
-        else:
-            self.setStyleSheet("""
-                QGroupBox {
-                    background-color: #FFFFFF;
-                    border: 1px solid #E0E0E0;
-                    border-radius: 6px;
-                    margin-top: 12px;
-                    padding: 12px;
-                    color: #212121;
-                }
-                QGroupBox::title {
-                    subcontrol-origin: margin;
-                    left: 10px;
-                    padding: 0 5px;
-                    color: #2196F3;
-                    font-weight: bold;
-                }
-                QLabel {
-                    color: #424242;
-                }
-                QComboBox, QSpinBox, QDoubleSpinBox {
-                    padding: 5px;
-                    border: 1px solid #E0E0E0;
-                    border-radius: 4px;
-                    background-color: white;
-                    color: #212121;
-                    min-height: 25px;
-                }
-                QComboBox::drop-down {
-                    border: none;
-                }
-                QComboBox::down-arrow {
-                    image: none;
-                    border: none;
-                }
-                QComboBox QAbstractItemView {
-                    background-color: white;
-                    color: #212121;
-                    selection-background-color: #E0E0E0;
-                    selection-color: #212121;
-                    border: 1px solid #E0E0E0;
-                }
-            """)
+        # Styled by the application sheet through QGroupBox#operationGroup
+        self.setObjectName('operationGroup')
+
+class ProbeWorker(QThread):
+    probed = pyqtSignal(object)
+    error = pyqtSignal(str)
+
+    def __init__(self, input_file):
+        super().__init__()
+        self.input_file = input_file
+
+    def run(self):
+        try:
+            self.probed.emit(probe_media(self.input_file))
+        except Exception as e:
+            self.error.emit(str(e))
+
+class PlanWorker(QThread):
+    """Plans a job for the dry run; planning can wait for the capability scan, probe and index keyframes."""
+    planned = pyqtSignal(object)
+    error = pyqtSignal(str)
+
+    def __init__(self, input_file, output_file, operations, chunks=0, media=None):
+        super().__init__()
+        self.input_file = input_file
+        self.output_file = output_file
+        self.operations = operations
+        self.chunks = chunks
+        self.media = media
+
+    def run(self):
+        try:
+            self.planned.emit(plan_processing(self.input_file, self.output_file, self.operations, self.chunks,
+                                              self.media))
+        except Exception as e:
+            self.error.emit(str(e))
+
+class EstimateWorker(QThread):
+    """Encodes a few samples of the chain to predict its output size (see size_estimate)."""
+    estimated = pyqtSignal(object)
+    error = pyqtSignal(str)
+
+    def __init__(self, input_file, output_file, operations, media=None):
+        super().__init__()
+        self.input_file = input_file
+        self.output_file = output_file
+        self.operations = operations
+        self.media = media
+        self.control = JobControl()
+
+    def run(self):
+        try:
+            self.estimated.emit(estimate_size(self.input_file, self.output_file, self.operations, self.media,
+                                              control=self.control))
+        except JobCancelled:
+            pass
+        except Exception as e:
+            self.error.emit(str(e))
+
+def event_detail(event):
+    if event.progress is None:
+        # Neither duration nor frame count is known: raw counters only
+        return f"frame {event.frame}, {event.out_time:.1f}s written"
+    if event.stages:
+        done = sum(1 for value in event.stages.values() if value >= 100)
+        return f"{done}/{len(event.stages)} chunks done"
+    if event.speed:
+        return f"{event.speed:.2f}x, {event.fps:.0f} fps"
+    return ''
+
+def describe_estimate(estimate, target_mb):
+    text = (f"About {estimate.size / 1e6:.1f} MB ({estimate.low / 1e6:.1f}-{estimate.high / 1e6:.1f} MB), "
+            f"from {estimate.sampled:.0f}s of samples")
+    quality = estimate.quality_for(target_mb * 1e6)
+    if quality is not None and quality != estimate.quality:
+        text += f"; quality {quality} should land near {target_mb:g} MB"
+    return text
+
+_worker_ids = itertools.count(1)
 
 class FFmpegWorker(QThread):
-    progress = pyqtSignal(dict)
+    """Runs one job; progress goes to the progress bus under `key`, the rest through signals.
+
+    `control` pauses, resumes and cancels the job from the GUI thread.
+    """
+    message = pyqtSignal(str)
     finished = pyqtSignal()
+    cancelled = pyqtSignal()
     error = pyqtSignal(str)
 
-    def __init__(self, input_file, output_file, operations):
+    def __init__(self, input_file, output_file, operations, chunks=0, media=None):
         super().__init__()
         self.input_file = input_file
         self.output_file = output_file
         self.operations = operations
+        self.chunks = chunks
+        self.media = media
+        self.key = f'process-{next(_worker_ids)}'
+        self.control = JobControl()
+
+    def publish(self, event):
+        progress_bus().publish(self.key, 'process', 'process', label=os.path.basename(self.input_file),
+                               detail=event_detail(event), done=event.out_time, percent=event.progress)
 
     def run(self):
         try:
-            # Build FFmpeg command based on selected operations
-            command = ['ffmpeg', '-i', self.input_file]
-            command.extend(['-y'])  # Overwrite output file if exists
-            for op in self.operations:
-                if op['type'] == 'compress':
-                    command.extend([
-                        '-c:v', 'libx264',
-                        '-crf', str(op['quality']),
-                        '-preset', op['preset']
-                    ])
-                elif op['type'] == 'convert':
-                    command.extend(['-c:v', op['codec']])
-                elif op['type'] == 'resize':
-                    command.extend([
-                        '-vf', f'scale={op["width"]}:{op["height"]}'
-                    ])
-                elif op['type'] == 'trim':
-                    command.extend([
-                        '-ss', str(op['start']),
-                        '-t', str(op['duration'])
-                    ])
-                elif op['type'] == 'audio':
-                    command.extend([
-                        '-c:a', op['codec'],
-                        '-b:a', f'{op["bitrate"]}k'
-                    ])
-            command.append(self.output_file)
-
-            # Get video duration for progress calculation
-            duration_cmd = ['ffprobe', '-v', 'error', '-show_entries', 'format=duration',
-                          '-of', 'default=noprint_wrappers=1:nokey=1', self.input_file]
-            duration_str = subprocess.check_output(duration_cmd).decode().strip()
-            try:
-                duration = float(duration_str)
-                if duration <= 0:
-                    raise ValueError
-            except Exception:
-                self.error.emit("Could not determine video duration. The file may be corrupted or unsupported.")
-                return
-
-            # Start FFmpeg process
-            process = subprocess.Popen(
-                command,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                universal_newlines=True
+            # Journal the job, then plan it (stream copy, smart cut, parallel or single encode) and run it
+            spec = {
+                'input': os.path.abspath(self.input_file),
+                'output': os.path.abspath(self.output_file),
+                'operations': self.operations,
+                'chunks': self.chunks,
+            }
+            run_now(
+                'process',
+                spec,
+                on_progress=self.publish,
+                on_message=self.message.emit,
+                media=self.media,
+                control=self.control
             )
 
-            # Monitor progress
-            while True:
-                line = process.stderr.readline()
-                if not line and process.poll() is not None:
-                    break
-                if 'time=' in line:
-                    time_str = line.split('time=')[1].split()[0]
-                    try:
-                        hours, minutes, seconds = map(float, time_str.split(':'))
-                        current_time = hours * 3600 + minutes * 60 + seconds
-                        progress = (current_time / duration) * 100
-                        self.progress.emit({'progress': progress})
-                    except Exception:
-                        pass
-
-            if process.returncode != 0:
-                raise Exception("FFmpeg processing failed")
-
             self.finished.emit()
+        except JobCancelled:
+            self.cancelled.emit()
         except Exception as e:
             self.error.emit(f"Processing failed: {e}")
+        finally:
+            progress_bus().publish(self.key, 'process', 'process', finished=True)
 
 class FFmpegProcessor(QWidget):
     def __init__(self):
         super().__init__()
-        self.is_dark_mode = True
+        # The application stylesheet is applied once at startup, not per tab
+        self.theme = theme_manager()
+        self.thumbnail_strips = []
         self.init_ui()
-        self.apply_theme()
         self.operations = []
-
-    def apply_theme(self):
-        app = QApplication.instance()
-        if self.is_dark_mode:
-            if app:
-                app.setStyleSheet(DARK_STYLE)
-        else:
-            if app:
-                app.setStyleSheet(LIGHT_STYLE)
+        self.theme.changed.connect(self.sync_theme_switch)
+        self.bus = progress_bus()
+        self.poll_timer = QTimer(self)
+        self.poll_timer.setInterval(self.bus.interval_ms)
+        self.poll_timer.timeout.connect(self.update_progress)
 
     def init_ui(self):
         layout = QVBoxLayout(self)
@@ -547,17 +175,12 @@ class FFmpegProcessor(QWidget):
         # Title and theme switcher
         title_layout = QHBoxLayout()
         title = QLabel("FFmpeg Video Processor")
-        title.setStyleSheet("""
-            font-size: 24px;
-            font-weight: bold;
-            color: #2196F3;
-            margin-bottom: 10px;
-        """)
+        title.setObjectName('title')
         title_layout.addWidget(title)
         
         # Theme switcher
         self.theme_switch = QCheckBox("Light Mode")
-        self.theme_switch.setChecked(not self.is_dark_mode)
+        self.theme_switch.setChecked(not self.theme.is_dark)
         self.theme_switch.stateChanged.connect(self.toggle_theme)
         title_layout.addWidget(self.theme_switch, alignment=Qt.AlignmentFlag.AlignRight)
         layout.addLayout(title_layout)
@@ -575,23 +198,23 @@ class FFmpegProcessor(QWidget):
         buttons_layout = QHBoxLayout()
         buttons_layout.setSpacing(10)
         
-        add_compress = StyledButton("Add Compression", is_dark_mode=self.is_dark_mode)
+        add_compress = StyledButton("Add Compression")
         add_compress.clicked.connect(lambda: self.add_operation('compress'))
         buttons_layout.addWidget(add_compress)
         
-        add_convert = StyledButton("Add Conversion", is_dark_mode=self.is_dark_mode)
+        add_convert = StyledButton("Add Conversion")
         add_convert.clicked.connect(lambda: self.add_operation('convert'))
         buttons_layout.addWidget(add_convert)
         
-        add_resize = StyledButton("Add Resize", is_dark_mode=self.is_dark_mode)
+        add_resize = StyledButton("Add Resize")
         add_resize.clicked.connect(lambda: self.add_operation('resize'))
         buttons_layout.addWidget(add_resize)
         
-        add_trim = StyledButton("Add Trim", is_dark_mode=self.is_dark_mode)
+        add_trim = StyledButton("Add Trim")
         add_trim.clicked.connect(lambda: self.add_operation('trim'))
         buttons_layout.addWidget(add_trim)
         
-        add_audio = StyledButton("Add Audio", is_dark_mode=self.is_dark_mode)
+        add_audio = StyledButton("Add Audio")
         add_audio.clicked.connect(lambda: self.add_operation('audio'))
         buttons_layout.addWidget(add_audio)
         
@@ -602,19 +225,23 @@ class FFmpegProcessor(QWidget):
         file_layout = QVBoxLayout()
         
         input_layout = QHBoxLayout()
-        self.input_button = StyledButton("Select Input File", is_dark_mode=self.is_dark_mode)
+        self.input_button = StyledButton("Select Input File")
         self.input_button.clicked.connect(self.select_input_file)
         self.input_label = QLabel("No file selected")
-        self.input_label.setStyleSheet("color: #757575;" if not self.is_dark_mode else "color: #E0E0E0;")
+        set_state(self.input_label, 'idle')
         input_layout.addWidget(self.input_button)
         input_layout.addWidget(self.input_label)
         file_layout.addLayout(input_layout)
 
+        self.media_label = QLabel("")
+        set_state(self.media_label, 'muted')
+        file_layout.addWidget(self.media_label)
+
         output_layout = QHBoxLayout()
-        self.output_button = StyledButton("Select Output File", is_dark_mode=self.is_dark_mode)
+        self.output_button = StyledButton("Select Output File")
         self.output_button.clicked.connect(self.select_output_file)
         self.output_label = QLabel("No file selected")
-        self.output_label.setStyleSheet("color: #757575;" if not self.is_dark_mode else "color: #E0E0E0;")
+        set_state(self.output_label, 'idle')
         output_layout.addWidget(self.output_button)
         output_layout.addWidget(self.output_label)
         file_layout.addLayout(output_layout)
@@ -622,10 +249,33 @@ class FFmpegProcessor(QWidget):
         file_group.setLayout(file_layout)
         layout.addWidget(file_group)
 
-        # Process button
-        self.process_button = StyledButton("Process", primary=True, is_dark_mode=self.is_dark_mode)
+        # Parallel encoding
+        parallel_layout = QHBoxLayout()
+        self.parallel_check = QCheckBox("Parallel encode (split at keyframes)")
+        parallel_layout.addWidget(self.parallel_check)
+        parallel_layout.addWidget(QLabel("Chunks:"))
+        self.chunks_spin = QSpinBox()
+        self.chunks_spin.setRange(2, 256)
+        self.chunks_spin.setValue(max(2, default_workers()))
+        parallel_layout.addWidget(self.chunks_spin)
+        layout.addLayout(parallel_layout)
+
+        # Process and dry-run buttons
+        process_layout = QHBoxLayout()
+        self.preview_button = StyledButton("Preview Command")
+        self.preview_button.clicked.connect(self.preview_plan)
+        process_layout.addWidget(self.preview_button)
+        self.process_button = StyledButton("Process", primary=True)
         self.process_button.clicked.connect(self.start_processing)
-        layout.addWidget(self.process_button)
+        process_layout.addWidget(self.process_button)
+        self.pause_button = StyledButton("Pause")
+        self.pause_button.setCheckable(True)
+        self.pause_button.toggled.connect(self.toggle_pause)
+        process_layout.addWidget(self.pause_button)
+        self.cancel_button = StyledButton("Cancel")
+        self.cancel_button.clicked.connect(self.cancel_processing)
+        process_layout.addWidget(self.cancel_button)
+        layout.addLayout(process_layout)
 
         # Progress section
         progress_group = QGroupBox("Progress")
@@ -636,7 +286,7 @@ class FFmpegProcessor(QWidget):
         progress_layout.addWidget(self.progress_bar)
 
         self.status_label = QLabel("Ready")
-        self.status_label.setStyleSheet("color: #757575;" if not self.is_dark_mode else "color: #E0E0E0;")
+        set_state(self.status_label, 'idle')
         progress_layout.addWidget(self.status_label)
         
         progress_group.setLayout(progress_layout)
@@ -644,38 +294,24 @@ class FFmpegProcessor(QWidget):
 
         self.input_file = None
         self.output_file = None
+        self.media = None
+        self.job_notes = []
+        self.worker = None
+        self.probe_worker = None
+        self.estimate_worker = None
+        self.plan_worker = None
+        self.set_job_running(False)
 
     def toggle_theme(self, state):
-        self.is_dark_mode = not state
-        self.apply_theme()
-        
-        # Update buttons
-        self.input_button.is_dark_mode = self.is_dark_mode
-        self.input_button.apply_theme()
-        self.output_button.is_dark_mode = self.is_dark_mode
-        self.output_button.apply_theme()
-        self.process_button.is_dark_mode = self.is_dark_mode
-        self.process_button.apply_theme()
-        
-        # Update all operation groups
-        for i in range(self.operations_layout.count()):
-            widget = self.operations_layout.itemAt(i).widget()
-            if isinstance(widget, OperationGroup):
-                widget.is_dark_mode = self.is_dark_mode
-                widget.apply_theme()
-        
-        # Update status label colors
-        if self.status_label.text() == "Ready":
-            self.status_label.setStyleSheet("color: #757575;" if not self.is_dark_mode else "color: #E0E0E0;")
-        elif "Processing" in self.status_label.text():
-            self.status_label.setStyleSheet("color: #2196F3;")
-        elif "completed" in self.status_label.text().lower():
-            self.status_label.setStyleSheet("color: #4CAF50;")
-        elif "Error" in self.status_label.text():
-            self.status_label.setStyleSheet("color: #F44336;")
+        self.theme.apply('light' if state else 'dark')
+
+    def sync_theme_switch(self, name):
+        self.theme_switch.blockSignals(True)
+        self.theme_switch.setChecked(name == 'light')
+        self.theme_switch.blockSignals(False)
 
     def add_operation(self, op_type):
-        group = OperationGroup("", self.is_dark_mode)
+        group = OperationGroup("")
         layout = QVBoxLayout()
         layout.setSpacing(10)
         
@@ -696,15 +332,47 @@ class FFmpegProcessor(QWidget):
             preset_combo.setCurrentText('medium')
             preset_layout.addWidget(preset_combo)
             layout.addLayout(preset_layout)
+
+            # Target size: the bitrate follows from the duration and the job runs in two passes
+            size_layout = QHBoxLayout()
+            size_layout.addWidget(QLabel("Mode:"))
+            mode_combo = QComboBox()
+            mode_combo.addItems(['Quality (CRF)', 'Target size (two-pass)'])
+            size_layout.addWidget(mode_combo)
+            size_layout.addWidget(QLabel("Target size:"))
+            target_spin = QDoubleSpinBox()
+            target_spin.setRange(1, 100000)
+            target_spin.setValue(25)
+            target_spin.setSuffix(" MB")
+            size_layout.addWidget(target_spin)
+            layout.addLayout(size_layout)
+
+            estimate_layout = QHBoxLayout()
+            estimate_button = StyledButton("Estimate Size")
+            estimate_layout.addWidget(estimate_button)
+            estimate_label = QLabel("Encodes a few short samples to predict the output size")
+            estimate_label.setWordWrap(True)
+            estimate_layout.addWidget(estimate_label, 1)
+            layout.addLayout(estimate_layout)
             
             operation = {
                 'type': 'compress',
+                'mode': 'crf',
                 'quality': quality_spin.value(),
-                'preset': preset_combo.currentText()
+                'preset': preset_combo.currentText(),
+                'target_mb': target_spin.value()
             }
+
+            def set_mode(index):
+                operation['mode'] = ['crf', 'size'][index]
+                quality_spin.setEnabled(index == 0)
+                estimate_button.setEnabled(index == 0)
             
             quality_spin.valueChanged.connect(lambda v: operation.update({'quality': v}))
             preset_combo.currentTextChanged.connect(lambda v: operation.update({'preset': v}))
+            mode_combo.currentIndexChanged.connect(set_mode)
+            target_spin.valueChanged.connect(lambda v: operation.update({'target_mb': v}))
+            estimate_button.clicked.connect(lambda: self.estimate_size(estimate_label, target_spin.value()))
             
         elif op_type == 'convert':
             group.setTitle("Conversion")
@@ -712,6 +380,11 @@ class FFmpegProcessor(QWidget):
             codec_layout.addWidget(QLabel("Codec:"))
             codec_combo = QComboBox()
             codec_combo.addItems(['libx264', 'libx265', 'mpeg4', 'vp9'])
+            # Offer the hardware encoders that passed a test encode, if discovery has finished
+            caps = get_capabilities(timeout=0)
+            if caps:
+                codec_combo.addItems([name for name, ok in sorted(caps.verified.items())
+                                      if ok and name in VIDEO_ENCODERS])
             codec_layout.addWidget(codec_combo)
             layout.addLayout(codec_layout)
             
@@ -760,15 +433,35 @@ class FFmpegProcessor(QWidget):
             duration_spin.setRange(0, 999999)
             trim_layout.addWidget(duration_spin)
             layout.addLayout(trim_layout)
+
+            mode_layout = QHBoxLayout()
+            mode_layout.addWidget(QLabel("Cut mode:"))
+            mode_combo = QComboBox()
+            mode_combo.addItems(['Fast (snap to keyframe)', 'Smart (frame-accurate)'])
+            mode_layout.addWidget(mode_combo)
+            layout.addLayout(mode_layout)
+
+            # Pick cut points on the timeline instead of guessing seconds
+            strip = ThumbnailStrip()
+            self.thumbnail_strips.append(strip)
+            if self.media and self.media.video:
+                strip.set_media(self.input_file, self.media.duration)
+            strip.startPicked.connect(start_spin.setValue)
+            strip.endPicked.connect(lambda end: duration_spin.setValue(max(0.0, end - start_spin.value())))
+            start_spin.valueChanged.connect(lambda v: strip.set_range(v, duration_spin.value()))
+            duration_spin.valueChanged.connect(lambda v: strip.set_range(start_spin.value(), v))
+            layout.addWidget(strip)
             
             operation = {
                 'type': 'trim',
                 'start': start_spin.value(),
-                'duration': duration_spin.value()
+                'duration': duration_spin.value(),
+                'mode': 'fast'
             }
             
             start_spin.valueChanged.connect(lambda v: operation.update({'start': v}))
             duration_spin.valueChanged.connect(lambda v: operation.update({'duration': v}))
+            mode_combo.currentIndexChanged.connect(lambda i: operation.update({'mode': ['fast', 'smart'][i]}))
             
         elif op_type == 'audio':
             group.setTitle("Audio")
@@ -805,6 +498,9 @@ class FFmpegProcessor(QWidget):
 
     def remove_operation(self, group, operation):
         self.operations.remove(operation)
+        for strip in group.findChildren(ThumbnailStrip):
+            strip.cancel_requests()
+            self.thumbnail_strips.remove(strip)
         group.deleteLater()
 
     def select_input_file(self):
@@ -815,7 +511,39 @@ class FFmpegProcessor(QWidget):
         if file_name:
             self.input_file = file_name
             self.input_label.setText(file_name)
-            self.input_label.setStyleSheet("color: #2196F3;")
+            set_state(self.input_label, 'accent')
+            self.probe_input()
+
+    def probe_input(self):
+        self.media = None
+        self.media_label.setText("Reading media information...")
+        self.probe_worker = ProbeWorker(self.input_file)
+        self.probe_worker.probed.connect(self.media_probed)
+        self.probe_worker.error.connect(lambda msg: self.media_label.setText(f"Could not read media information: {msg}"))
+        self.probe_worker.start()
+
+    def media_probed(self, media):
+        if media.path != self.input_file:
+            return
+        self.media = media
+        self.media_label.setText(media.summary())
+        for strip in self.thumbnail_strips:
+            strip.set_media(self.input_file, media.duration if media.video else None)
+
+    def estimate_size(self, label, target_mb):
+        if not self.input_file:
+            QMessageBox.warning(self, "Error", "Please select an input file")
+            return
+        if self.estimate_worker and self.estimate_worker.isRunning():
+            return
+        # The container matters (overhead, default audio), so estimate for the real output when there is one
+        output_file = self.output_file or os.path.splitext(self.input_file)[0] + '.estimate.mp4'
+        label.setText("Estimating: encoding samples...")
+        self.estimate_worker = EstimateWorker(self.input_file, output_file, copy.deepcopy(self.operations),
+                                              self.media)
+        self.estimate_worker.estimated.connect(lambda estimate: label.setText(describe_estimate(estimate, target_mb)))
+        self.estimate_worker.error.connect(lambda msg: label.setText(f"Could not estimate: {msg}"))
+        self.estimate_worker.start()
 
     def select_output_file(self):
         file_name, _ = QFileDialog.getSaveFileName(
@@ -825,46 +553,143 @@ class FFmpegProcessor(QWidget):
         if file_name:
             self.output_file = file_name
             self.output_label.setText(file_name)
-            self.output_label.setStyleSheet("color: #2196F3;")
+            set_state(self.output_label, 'accent')
 
-    def start_processing(self):
+    def validate_job(self):
         if not self.input_file:
             QMessageBox.warning(self, "Error", "Please select an input file")
-            return
+            return False
         
         if not self.output_file:
             QMessageBox.warning(self, "Error", "Please select an output file")
-            return
+            return False
         
-        if not self.operations:
+        # With no operations the job is a plain container change (remux)
+        if not self.operations and container_of(self.input_file) == container_of(self.output_file):
             QMessageBox.warning(self, "Error", "Please add at least one operation")
+            return False
+        return True
+
+    def preview_plan(self):
+        if not self.validate_job() or (self.plan_worker and self.plan_worker.isRunning()):
             return
+        chunks = self.chunks_spin.value() if self.parallel_check.isChecked() else 0
+        self.preview_button.setEnabled(False)
+        self.plan_worker = PlanWorker(self.input_file, self.output_file, copy.deepcopy(self.operations), chunks,
+                                      self.media)
+        self.plan_worker.planned.connect(lambda plan: QMessageBox.information(self, "Dry Run", plan.describe()))
+        self.plan_worker.error.connect(lambda msg: QMessageBox.warning(self, "Invalid operation chain", msg))
+        self.plan_worker.finished.connect(lambda: self.preview_button.setEnabled(True))
+        self.plan_worker.start()
 
-        self.process_button.setEnabled(False)
+    def start_processing(self):
+        if not self.validate_job():
+            return
+
+        self.set_job_running(True)
+        self.job_notes = []
         self.worker = FFmpegWorker(
             self.input_file,
             self.output_file,
-            self.operations
+            self.operations,
+            self.chunks_spin.value() if self.parallel_check.isChecked() else 0,
+            self.media
         )
-        self.worker.progress.connect(self.update_progress)
+        self.poll_timer.start()
+        self.worker.message.connect(self.show_message)
         self.worker.finished.connect(self.processing_finished)
+        self.worker.cancelled.connect(self.processing_cancelled)
         self.worker.error.connect(self.processing_error)
         self.worker.start()
 
-    def update_progress(self, d):
-        self.progress_bar.setValue(int(d['progress']))
-        self.status_label.setText(f"Processing: {int(d['progress'])}%")
-        self.status_label.setStyleSheet("color: #2196F3;")
+    def set_job_running(self, running):
+        self.process_button.setEnabled(not running)
+        if not running:
+            self.pause_button.setChecked(False)
+        self.pause_button.setEnabled(running)
+        self.cancel_button.setEnabled(running)
+
+    def toggle_pause(self, paused):
+        if not self.worker:
+            return
+        # ffmpeg is suspended where it is and keeps its output open
+        if paused:
+            self.worker.control.pause()
+            self.status_label.setText("Paused")
+            set_state(self.status_label, 'idle')
+        else:
+            self.worker.control.resume()
+        self.pause_button.setText("Resume" if paused else "Pause")
+
+    def cancel_processing(self):
+        if self.worker:
+            self.status_label.setText("Cancelling...")
+            self.cancel_button.setEnabled(False)
+            # Stopping ffmpeg can take a few seconds; the cancelled signal reports when it is done
+            threading.Thread(target=self.worker.control.cancel, daemon=True).start()
+
+    def shutdown(self):
+        """Stop the running job and wait for the worker threads; for closing the window."""
+        self.poll_timer.stop()
+        for strip in self.thumbnail_strips:
+            strip.cancel_requests()
+        if self.worker:
+            self.worker.control.cancel(interrupt=True)
+            self.worker.wait()
+        if self.probe_worker:
+            self.probe_worker.wait()
+        if self.estimate_worker:
+            self.estimate_worker.control.cancel(interrupt=True)
+            self.estimate_worker.wait()
+        if self.plan_worker:
+            self.plan_worker.wait()
+
+    def update_progress(self):
+        # Only the latest snapshot matters; the finished/error signals end the job
+        jobs = [job for job in self.bus.take('process') if not job.finished]
+        if not jobs or self.worker.control.paused:
+            return
+        job = jobs[-1]
+        if job.percent is None:
+            self.progress_bar.setRange(0, 0)
+            self.status_label.setText(f"Processing: {job.detail}")
+            set_state(self.status_label, 'busy')
+            return
+        self.progress_bar.setRange(0, 100)
+        self.progress_bar.setValue(int(job.percent))
+        status = f"Processing: {int(job.percent)}%"
+        details = [text for text in (job.detail, format_eta(job.eta) and f"{format_eta(job.eta)} left") if text]
+        if details:
+            status += f" ({', '.join(details)})"
+        self.status_label.setText(status)
+        set_state(self.status_label, 'busy')
+
+    def show_message(self, text):
+        self.job_notes.append(text)
+        self.status_label.setText(text)
+        set_state(self.status_label, 'busy')
 
     def processing_finished(self):
-        self.process_button.setEnabled(True)
+        self.poll_timer.stop()
+        self.set_job_running(False)
+        self.progress_bar.setRange(0, 100)
         self.progress_bar.setValue(100)
         self.status_label.setText("Processing completed!")
-        self.status_label.setStyleSheet("color: #4CAF50;")
-        QMessageBox.information(self, "Success", "Processing completed successfully!")
+        set_state(self.status_label, 'success')
+        QMessageBox.information(self, "Success", "\n".join(["Processing completed successfully!", *self.job_notes]))
+
+    def processing_cancelled(self):
+        self.poll_timer.stop()
+        self.set_job_running(False)
+        self.progress_bar.setRange(0, 100)
+        self.progress_bar.setValue(0)
+        self.status_label.setText("Processing cancelled")
+        set_state(self.status_label, 'idle')
 
     def processing_error(self, error_msg):
-        self.process_button.setEnabled(True)
+        self.poll_timer.stop()
+        self.set_job_running(False)
+        self.progress_bar.setRange(0, 100)
         self.status_label.setText("Error occurred during processing")
-        self.status_label.setStyleSheet("color: #F44336;")
+        set_state(self.status_label, 'error')
         QMessageBox.critical(self, "Error", f"Processing failed: {error_msg}") 
\ No newline at end of file
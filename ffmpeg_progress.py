@@ -0,0 +1,206 @@
+import os
+import subprocess
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, asdict
+
+from job_control import register_child, unregister_child
+
+# How often ffmpeg writes a progress block (seconds) and how often we forward
+# one to the UI (updates per second).
+DEFAULT_STATS_PERIOD = 0.5
+DEFAULT_UI_RATE = 4
+
+
+class FFmpegError(Exception):
+    def __init__(self, returncode, stderr_tail=''):
+        message = f"FFmpeg exited with code {returncode}"
+        if stderr_tail:
+            message += f": {stderr_tail}"
+        super().__init__(message)
+        self.returncode = returncode
+        self.stderr_tail = stderr_tail
+
+
+@dataclass
+class ProgressEvent:
+    frame: int = 0
+    fps: float = 0.0
+    speed: float = 0.0
+    out_time: float = 0.0
+    total_size: int = 0
+    bitrate: float = 0.0
+    finished: bool = False
+    progress: float = None
+    # Per-step percentages when a plan runs several ffmpeg processes at once
+    stages: dict = None
+
+    def as_dict(self):
+        return asdict(self)
+
+
+def _to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+
+def _to_float(value, suffix=''):
+    if value is None:
+        return 0.0
+    value = value.strip()
+    if suffix and value.endswith(suffix):
+        value = value[:-len(suffix)]
+    try:
+        return float(value)
+    except ValueError:
+        return 0.0
+
+
+def parse_timestamp(value):
+    # ffmpeg prints out_time as HH:MM:SS.micro, older builds may print N/A
+    try:
+        hours, minutes, seconds = value.strip().split(':')
+        return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+    except (AttributeError, ValueError):
+        return 0.0
+
+
+class ProgressParser:
+    """Turns the key=value lines written by `-progress` into ProgressEvents.
+
+    ffmpeg writes one block per stats period, terminated by a
+    `progress=continue` or `progress=end` line.
+    """
+
+    def __init__(self):
+        self._fields = {}
+
+    def feed_line(self, line):
+        line = line.strip()
+        if '=' not in line:
+            return None
+        key, value = line.split('=', 1)
+        if key != 'progress':
+            self._fields[key] = value
+            return None
+        event = self._build_event(finished=value.strip() == 'end')
+        self._fields = {}
+        return event
+
+    def _build_event(self, finished):
+        fields = self._fields
+        if 'out_time_us' in fields:
+            out_time = _to_int(fields['out_time_us']) / 1_000_000
+        elif 'out_time_ms' in fields:
+            # Despite the name, ffmpeg reports this one in microseconds too
+            out_time = _to_int(fields['out_time_ms']) / 1_000_000
+        else:
+            out_time = parse_timestamp(fields.get('out_time'))
+        return ProgressEvent(
+            frame=_to_int(fields.get('frame')),
+            fps=_to_float(fields.get('fps')),
+            speed=_to_float(fields.get('speed'), 'x'),
+            out_time=max(out_time, 0.0),
+            total_size=_to_int(fields.get('total_size')),
+            bitrate=_to_float(fields.get('bitrate'), 'kbits/s'),
+            finished=finished,
+        )
+
+
+class ProgressThrottle:
+    """Lets at most `rate` events per second through; final events always pass."""
+
+    def __init__(self, rate=DEFAULT_UI_RATE, clock=time.monotonic):
+        self.interval = 1.0 / rate if rate and rate > 0 else 0.0
+        self.clock = clock
+        self._last = None
+
+    def ready(self, final=False):
+        now = self.clock()
+        if final or self._last is None or now - self._last >= self.interval:
+            self._last = now
+            return True
+        return False
+
+
+def progress_args(stats_period=DEFAULT_STATS_PERIOD):
+    return ['-progress', 'pipe:1', '-stats_period', str(stats_period), '-nostats']
+
+
+def with_progress(command, stats_period=DEFAULT_STATS_PERIOD):
+    # Global options go right after the binary so they apply to the whole run
+    return [command[0], *progress_args(stats_period), *command[1:]]
+
+
+def _drain(stream, tail):
+    for raw in iter(stream.readline, b''):
+        line = raw.decode('utf-8', 'replace').strip()
+        if line:
+            tail.append(line)
+    stream.close()
+
+
+def run_ffmpeg(command, duration=None, on_progress=None,
+               stats_period=DEFAULT_STATS_PERIOD, ui_rate=DEFAULT_UI_RATE, stdin=None, control=None, cwd=None):
+    """Run an ffmpeg command, reporting throttled ProgressEvents to on_progress.
+
+    stderr is drained on a separate thread so a chatty encode can never stall
+    on a full pipe; its last lines are kept for the error message. `stdin`
+    is for commands reading `pipe:0`; otherwise ffmpeg's stdin is kept open
+    so a JobControl can stop it with 'q'. A cancelled run removes its
+    half-written output (the command's last argument) and raises JobCancelled.
+    `cwd` is the process's working directory; paths in `command` should be absolute.
+    """
+    process = subprocess.Popen(
+        with_progress(command, stats_period),
+        stdin=subprocess.PIPE if stdin is None else stdin,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        cwd=cwd,
+    )
+    quit_command = b'q' if stdin is None else None
+    if control:
+        control.track(process, quit_command)
+    else:
+        register_child(process, quit_command)
+    stderr_tail = deque(maxlen=10)
+    reader = threading.Thread(target=_drain, args=(process.stderr, stderr_tail), daemon=True)
+    reader.start()
+
+    parser = ProgressParser()
+    throttle = ProgressThrottle(ui_rate)
+    try:
+        for raw in iter(process.stdout.readline, b''):
+            event = parser.feed_line(raw.decode('utf-8', 'replace'))
+            if event is None:
+                continue
+            if duration:
+                event.progress = min(event.out_time / duration * 100, 100.0)
+            if on_progress and throttle.ready(final=event.finished):
+                on_progress(event)
+    except BaseException:
+        # A progress callback raised: do not leave ffmpeg running behind it
+        process.kill()
+        raise
+    finally:
+        process.stdout.close()
+        process.wait()
+        reader.join()
+        if control:
+            control.untrack(process)
+        else:
+            unregister_child(process)
+        if process.stdin:
+            process.stdin.close()
+
+    if control and control.cancelled:
+        output = command[-1]
+        if not output.startswith('pipe:') and os.path.isfile(output):
+            os.remove(output)
+        control.check()
+    if process.returncode != 0:
+        raise FFmpegError(process.returncode, ' | '.join(list(stderr_tail)[-3:]))
+    return process.returncode
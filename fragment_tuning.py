@@ -0,0 +1,155 @@
+import sys
+import threading
+from urllib.parse import urlparse
+
+MIN_WORKERS = 1
+MAX_WORKERS = 16
+START_WORKERS = 2
+# A step up has to raise throughput by this fraction to be kept
+MIN_GAIN = 0.10
+# Reports at a settled level before probing above the ceiling again
+REPROBE_AFTER = 8
+# Formats smaller than this finish too fast to measure
+MIN_SAMPLE_BYTES = 2 * 1024 * 1024
+
+# yt-dlp warnings that mean the server is pushing back
+THROTTLE_MARKERS = ('HTTP Error 429', 'HTTP Error 403', 'HTTP Error 503', 'Retrying fragment',
+                    'Skipping fragment', 'timed out')
+
+
+def site_of(url):
+    host = (urlparse(url).hostname or '').lower()
+    return host[4:] if host.startswith('www.') else host
+
+
+class _Site:
+    def __init__(self, workers, ceiling):
+        self.workers = workers
+        self.previous = None
+        # Throughput measured at `previous`, the level before the last step up
+        self.baseline = None
+        self.ceiling = ceiling
+        self.settled = 0
+
+
+class FragmentTuner:
+    """Picks yt-dlp's concurrent_fragment_downloads per site by hill climbing.
+
+    Each segmented (HLS/DASH) format that finishes reports the throughput it
+    got with the worker count it ran with. The count starts small and steps
+    up while throughput keeps rising by at least MIN_GAIN; a step that did
+    not pay off is undone and becomes the ceiling. Throttling or fragment
+    errors halve the count. After REPROBE_AFTER settled reports the ceiling
+    is lifted again, since what a server allows changes over time.
+    """
+
+    def __init__(self, start=START_WORKERS, maximum=MAX_WORKERS):
+        self.start = start
+        self.maximum = maximum
+        self._sites = {}
+        self._lock = threading.Lock()
+
+    def _site(self, site):
+        state = self._sites.get(site)
+        if state is None:
+            state = self._sites[site] = _Site(self.start, self.maximum)
+        return state
+
+    def workers(self, site):
+        with self._lock:
+            return self._site(site).workers
+
+    def report(self, site, workers, rate, errors=0):
+        """Record one format's throughput (bytes/s) at `workers`; returns the count to use next."""
+        with self._lock:
+            state = self._site(site)
+            if workers != state.workers:
+                # Measured before the last change (parallel downloads of the same site)
+                return state.workers
+            if errors:
+                state.workers = state.ceiling = max(MIN_WORKERS, workers // 2)
+                state.previous = state.baseline = None
+                state.settled = 0
+            elif state.baseline is not None and rate < state.baseline * (1 + MIN_GAIN):
+                # The last step up did not pay for its extra connections
+                state.ceiling = state.previous
+                state.workers = state.previous
+                state.previous = state.baseline = None
+            else:
+                step = min(state.ceiling, workers + max(1, workers // 2))
+                if step > workers:
+                    state.previous, state.baseline, state.workers = workers, rate, step
+                else:
+                    state.settled += 1
+                    if state.settled >= REPROBE_AFTER:
+                        state.ceiling = self.maximum
+                        state.settled = 0
+            return state.workers
+
+
+_tuner = None
+_tuner_lock = threading.Lock()
+
+
+def get_fragment_tuner():
+    global _tuner
+    with _tuner_lock:
+        if _tuner is None:
+            _tuner = FragmentTuner()
+    return _tuner
+
+
+class FragmentMonitor:
+    """Connects one download to the tuner.
+
+    Used as both a progress hook and the yt-dlp logger: it times each
+    segmented format, counts retry and throttling warnings while it runs,
+    and writes the tuner's answer into the live YoutubeDL params, which
+    yt-dlp reads again when the next format (or playlist entry) starts.
+    """
+
+    def __init__(self, tuner, site):
+        self.tuner = tuner
+        self.site = site
+        self.params = {}
+        self._reset()
+
+    def _reset(self):
+        self.workers = None
+        self.errors = 0
+
+    def attach(self, ydl):
+        self.params = ydl.params
+        self.params['concurrent_fragment_downloads'] = self.tuner.workers(self.site)
+
+    def hook(self, d):
+        status = d.get('status')
+        if status == 'downloading':
+            if self.workers is None and d.get('fragment_count'):
+                self.workers = self.params.get('concurrent_fragment_downloads', 1)
+            return
+        if self.workers is None:
+            return
+        if status == 'finished':
+            size, elapsed = d.get('total_bytes') or d.get('downloaded_bytes') or 0, d.get('elapsed')
+            if elapsed and (size >= MIN_SAMPLE_BYTES or self.errors):
+                self.params['concurrent_fragment_downloads'] = self.tuner.report(
+                    self.site, self.workers, size / elapsed, self.errors)
+        elif status == 'error':
+            self.params['concurrent_fragment_downloads'] = self.tuner.report(self.site, self.workers, 0, 1)
+        self._reset()
+
+    # yt-dlp logger interface
+    def debug(self, message):
+        pass
+
+    def info(self, message):
+        pass
+
+    def warning(self, message):
+        if any(marker in message for marker in THROTTLE_MARKERS):
+            self.errors += 1
+
+    def error(self, message):
+        # What yt-dlp prints itself when it has no logger
+        print(message, file=sys.stderr)
@@ -0,0 +1,260 @@
+import argparse
+import glob
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from ffmpeg_progress import ProgressThrottle
+from job_queue import HEADLESS, JobQueue, run_job
+
+# Fields of a yt-dlp progress dict that are worth printing (the rest is not JSON-serializable)
+DOWNLOAD_FIELDS = ('status', 'downloaded_bytes', 'total_bytes', 'total_bytes_estimate',
+                   'speed', 'eta', 'filename')
+
+
+class JsonLinesReporter:
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+        self._lock = threading.Lock()
+
+    def emit(self, event, **fields):
+        line = json.dumps({'event': event, 'time': round(time.time(), 3), **fields}, default=str)
+        with self._lock:
+            self.stream.write(line + '\n')
+            self.stream.flush()
+
+
+def load_job_file(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        text = f.read()
+    if path.lower().endswith(('.yaml', '.yml')):
+        try:
+            import yaml
+        except ImportError:
+            raise SystemExit("YAML job files need PyYAML: pip install pyyaml")
+        return yaml.safe_load(text) or {}
+    return json.loads(text)
+
+
+def _as_list(value):
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def expand_download_jobs(specs):
+    if not specs:
+        return []
+    from download_engine import QUALITY_ALIASES, QUALITY_CHOICES
+    jobs = []
+    for spec in _as_list(specs):
+        quality = spec.get('quality', 'best')
+        quality = QUALITY_ALIASES.get(quality, quality)
+        if quality not in QUALITY_CHOICES:
+            raise ValueError(f"Unknown quality '{spec.get('quality')}'")
+        output_dir = os.path.abspath(spec.get('output_dir', '.'))
+        for url in _as_list(spec.get('urls')) + _as_list(spec.get('url')):
+            job = {'url': url, 'output_dir': output_dir, 'quality': quality}
+            transcode = spec.get('transcode')
+            if transcode:
+                # Streamed through ffmpeg: only the transcoded file is written
+                jobs.append(('stream', dict(job, extension=transcode.get('extension', 'mp4'),
+                                            operations=transcode.get('operations', []))))
+                continue
+            if spec.get('normalize'):
+                job['normalize'] = True
+            if spec.get('weight', 1) != 1:
+                job['weight'] = float(spec['weight'])
+            jobs.append(('download', job))
+    return jobs
+
+
+def expand_process_jobs(specs):
+    jobs = []
+    for spec in _as_list(specs):
+        operations = spec.get('operations', [])
+        inputs = []
+        for pattern in _as_list(spec.get('inputs')) + _as_list(spec.get('input')):
+            inputs.extend(sorted(glob.glob(os.path.expanduser(pattern))) or [])
+        for input_file in inputs:
+            stem, ext = os.path.splitext(os.path.basename(input_file))
+            output_dir = spec.get('output_dir') or os.path.dirname(input_file)
+            extension = spec.get('extension', ext.lstrip('.'))
+            suffix = spec.get('suffix', '' if spec.get('output_dir') else '_processed')
+            jobs.append(('process', {
+                'input': os.path.abspath(input_file),
+                'output': os.path.abspath(os.path.join(output_dir, f'{stem}{suffix}.{extension}')),
+                'operations': operations,
+                'chunks': spec.get('chunks', 0),
+            }))
+    return jobs
+
+
+def run_queue(queue, concurrency, reporter):
+    """Work through every pending job in the queue, `concurrency` at a time."""
+    claimed = []
+    failures = []
+
+    def report_progress(job):
+        throttle = ProgressThrottle()
+
+        def report(event):
+            if job.kind == 'download':
+                if event.get('status') == 'downloading' and throttle.ready():
+                    reporter.emit('progress', job=job.name, **{k: event.get(k) for k in DOWNLOAD_FIELDS})
+            else:
+                reporter.emit('progress', job=job.name, **event.as_dict())
+        return report
+
+    def worker():
+        while True:
+            job = queue.claim()
+            if job is None:
+                return
+            claimed.append(job.name)
+            reporter.emit('start', job=job.name, kind=job.kind, source=job.source, attempt=job.attempts)
+            started = time.monotonic()
+            try:
+                run_job(queue, job, on_progress=report_progress(job),
+                        on_message=lambda text: reporter.emit('message', job=job.name, text=text))
+            except Exception as e:
+                failures.append(job.name)
+                reporter.emit('error', job=job.name, error=str(e))
+            else:
+                reporter.emit('done', job=job.name, seconds=round(time.monotonic() - started, 3))
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        for future in [pool.submit(worker) for _ in range(max(1, concurrency))]:
+            future.result()
+    return len(claimed), failures
+
+
+def run_pipelines(specs, reporter):
+    """Run each 'pipelines' entry: downloads flow into an encode stage as they finish."""
+    from download_engine import QUALITY_ALIASES, QUALITY_CHOICES
+    from download_manager import DONE as DOWNLOAD_DONE, FAILED as DOWNLOAD_FAILED, SKIPPED as DOWNLOAD_SKIPPED
+    from pipeline import Pipeline, DONE, FAILED
+    failures = []
+
+    def on_download(task):
+        if task and task.state in (DOWNLOAD_DONE, DOWNLOAD_FAILED, DOWNLOAD_SKIPPED):
+            reporter.emit('download', url=task.url, state=task.state, error=task.error)
+            if task.state == DOWNLOAD_FAILED:
+                failures.append(task.url)
+
+    def on_encode(item):
+        # State changes only; per-encode progress would flood the output
+        if item.progress is None or item.state in (DONE, FAILED):
+            reporter.emit('encode', input=item.input, output=item.output, state=item.state, error=item.error)
+        if item.state == FAILED:
+            failures.append(item.output)
+
+    for spec in _as_list(specs):
+        quality = QUALITY_ALIASES.get(spec.get('quality', 'best'), spec.get('quality'))
+        if quality not in QUALITY_CHOICES:
+            raise ValueError(f"Unknown quality '{spec.get('quality')}'")
+        pipeline = Pipeline(os.path.abspath(spec.get('download_dir', 'downloads')),
+                            os.path.abspath(spec.get('output_dir', 'encoded')), spec.get('extension', 'mp4'),
+                            spec.get('operations', []), quality,
+                            chunks=spec.get('chunks', 0), downloads=int(spec.get('download_concurrency', 3)),
+                            encoders=int(spec.get('encode_concurrency', 1)), buffer=int(spec.get('buffer', 2)),
+                            on_download=on_download, on_encode=on_encode)
+        for url in _as_list(spec.get('urls')) + _as_list(spec.get('url')):
+            pipeline.add_source(url)
+        pipeline.wait()
+        pipeline.close()
+        reporter.emit('pipeline', **pipeline.stats())
+    return failures
+
+
+def run_estimates(config, reporter):
+    """Predict the output size of every processing job from a few encoded samples; nothing is written."""
+    from size_estimate import estimate_size
+    failures = []
+    for _, spec in expand_process_jobs(config.get('process')):
+        try:
+            estimate = estimate_size(spec['input'], spec['output'], spec['operations'])
+        except Exception as e:
+            failures.append(spec['input'])
+            reporter.emit('error', job=spec['input'], error=str(e))
+            continue
+        reporter.emit('estimate', input=spec['input'], output=spec['output'], **estimate.as_dict())
+    return failures
+
+
+def apply_bandwidth(config):
+    # Shared by every download of this process; the limit can be a number of bytes/s or '2M'
+    from bandwidth import get_bandwidth_scheduler, parse_schedule
+    scheduler = get_bandwidth_scheduler()
+    scheduler.set_limit(config.get('limit'))
+    scheduler.set_schedule(parse_schedule(config.get('schedule')))
+
+
+def run_job_file(config, reporter, queue):
+    concurrency = int(config.get('concurrency', 1))
+    if config.get('bandwidth'):
+        apply_bandwidth(config['bandwidth'])
+    total = 0
+    failures = []
+    # Jobs already finished by an earlier run of the same file are skipped by the queue.
+    # Downloads run first so processing globs can pick up what they fetched.
+    for kind, spec in expand_download_jobs(config.get('downloads')):
+        queue.add(kind, spec)
+    count, failed = run_queue(queue, concurrency, reporter)
+    total, failures = total + count, failures + failed
+    for kind, spec in expand_process_jobs(config.get('process')):
+        queue.add(kind, spec)
+    count, failed = run_queue(queue, concurrency, reporter)
+    total, failures = total + count, failures + failed
+    if config.get('pipelines'):
+        failures += run_pipelines(config['pipelines'], reporter)
+    reporter.emit('summary', jobs=total, failed=len(failures))
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='VideoTools --headless',
+                                     description="Run download and processing jobs without the GUI.")
+    parser.add_argument('--headless', metavar='JOBFILE', nargs='?', const='',
+                        help="JSON or YAML job file with 'downloads', 'process' and 'concurrency'")
+    parser.add_argument('--resume', action='store_true',
+                        help="only finish jobs left pending or interrupted by an earlier headless run")
+    parser.add_argument('--concurrency', type=int, help="override the job file's concurrency")
+    parser.add_argument('--queue', metavar='DB', help="job queue database (defaults to the app data directory)")
+    parser.add_argument('--estimate', action='store_true',
+                        help="only predict the output size of each processing job, by encoding short samples")
+    parser.add_argument('--limit-rate', metavar='RATE',
+                        help="total download bandwidth, e.g. 2M (overrides the job file's bandwidth limit)")
+    args = parser.parse_args(argv)
+    if not args.headless and not args.resume:
+        parser.error("give a job file, or --resume to finish interrupted jobs")
+    if args.estimate and not args.headless:
+        parser.error("--estimate needs a job file")
+
+    reporter = JsonLinesReporter()
+    if args.estimate:
+        try:
+            return 1 if run_estimates(load_job_file(args.headless), reporter) else 0
+        except (OSError, ValueError) as e:
+            reporter.emit('error', error=str(e))
+            return 2
+    try:
+        # Scoped to this job file, or with a bare --resume to every headless run; never the GUI's jobs
+        queue = JobQueue(args.queue, HEADLESS, os.path.abspath(args.headless) if args.headless else None)
+        recovered = queue.recover()
+        if recovered:
+            reporter.emit('message', text=f"Resuming {recovered} interrupted jobs")
+        config = load_job_file(args.headless) if args.headless else {}
+        if args.concurrency:
+            config['concurrency'] = args.concurrency
+        if args.limit_rate:
+            config['bandwidth'] = dict(config.get('bandwidth') or {}, limit=args.limit_rate)
+        failures = run_job_file(config, reporter, queue)
+    except (OSError, ValueError, sqlite3.Error) as e:
+        reporter.emit('error', error=str(e))
+        return 2
+    return 1 if failures else 0
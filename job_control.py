@@ -0,0 +1,158 @@
+import atexit
+import os
+import signal
+import subprocess
+import threading
+
+# Seconds a child gets after each step (quit command, terminate) before the next, harsher one
+STOP_GRACE = 5.0
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class JobInterrupted(JobCancelled):
+    """Cancelled because the application is closing; the job is left to resume next time."""
+
+
+def suspend_process(process):
+    if os.name == 'nt':
+        import ctypes
+        ctypes.windll.ntdll.NtSuspendProcess(int(process._handle))
+    else:
+        os.kill(process.pid, signal.SIGSTOP)
+
+
+def resume_process(process):
+    if os.name == 'nt':
+        import ctypes
+        ctypes.windll.ntdll.NtResumeProcess(int(process._handle))
+    else:
+        os.kill(process.pid, signal.SIGCONT)
+
+
+def stop_process(process, quit_command=None, grace=STOP_GRACE):
+    """Ask a child to quit (e.g. b'q' for ffmpeg, which then finalizes its output), then terminate, then kill."""
+    if process.poll() is not None:
+        return
+    if quit_command and process.stdin:
+        try:
+            process.stdin.write(quit_command)
+            process.stdin.flush()
+            process.wait(grace)
+            return
+        except (OSError, ValueError, subprocess.TimeoutExpired):
+            pass
+    process.terminate()
+    try:
+        process.wait(grace)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+# Every running ffmpeg (or yt-dlp feeder) process, so none outlives the application
+_children = {}
+_children_lock = threading.Lock()
+
+
+def register_child(process, quit_command=None):
+    with _children_lock:
+        _children[process] = quit_command
+
+
+def unregister_child(process):
+    with _children_lock:
+        _children.pop(process, None)
+
+
+def reap_children(grace=STOP_GRACE):
+    with _children_lock:
+        children = list(_children.items())
+    for process, quit_command in children:
+        try:
+            resume_process(process)
+        except OSError:
+            pass
+        stop_process(process, quit_command, grace)
+
+
+atexit.register(reap_children)
+
+
+class JobControl:
+    """Cooperative cancel and pause for one job, shared by the job and whoever started it.
+
+    Engines call `check()` at safe points (yt-dlp progress hooks): it blocks
+    while the job is paused and raises JobCancelled once it is cancelled
+    (JobInterrupted when it was cancelled with `interrupt=True`).
+    Child processes registered with `track` are suspended and resumed with
+    the job and stopped when it is cancelled, so an encode gives its CPU
+    back at once instead of at its next progress line.
+    """
+
+    def __init__(self):
+        self._cancelled = threading.Event()
+        self._interrupted = False
+        self._running = threading.Event()
+        self._running.set()
+        self._processes = {}
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    @property
+    def paused(self):
+        return not self._running.is_set()
+
+    def check(self):
+        self._running.wait()
+        if self._cancelled.is_set():
+            raise JobInterrupted("Interrupted") if self._interrupted else JobCancelled("Cancelled")
+
+    def pause(self):
+        with self._lock:
+            if self.paused or self.cancelled:
+                return
+            self._running.clear()
+            for process in self._processes:
+                if process.poll() is None:
+                    suspend_process(process)
+
+    def resume(self):
+        with self._lock:
+            if not self.paused:
+                return
+            for process in self._processes:
+                if process.poll() is None:
+                    resume_process(process)
+            self._running.set()
+
+    def cancel(self, interrupt=False):
+        with self._lock:
+            if not self.cancelled:
+                self._interrupted = interrupt
+            self._cancelled.set()
+            processes = list(self._processes.items())
+        # A stopped child cannot read its quit command
+        self.resume()
+        self._running.set()
+        for process, quit_command in processes:
+            stop_process(process, quit_command)
+
+    def track(self, process, quit_command=None):
+        with self._lock:
+            self._processes[process] = quit_command
+            if self.paused:
+                suspend_process(process)
+        register_child(process, quit_command)
+        if self.cancelled:
+            stop_process(process, quit_command)
+
+    def untrack(self, process):
+        with self._lock:
+            self._processes.pop(process, None)
+        unregister_child(process)
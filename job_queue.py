@@ -0,0 +1,333 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+
+from app_paths import data_dir
+from job_control import JobCancelled, JobInterrupted
+from probe_cache import file_fingerprint
+
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+# Who added a job: each origin only recovers and runs its own
+GUI = 'gui'
+HEADLESS = 'headless'
+
+
+@dataclass
+class Job:
+    id: int
+    kind: str
+    spec: dict
+    state: str = PENDING
+    attempts: int = 0
+    partial: dict = field(default_factory=dict)
+    error: str = None
+    created: float = None
+    started: float = None
+    finished: float = None
+
+    @property
+    def name(self):
+        return f'{self.kind}-{self.id}'
+
+    @property
+    def source(self):
+        return self.spec.get('url') or self.spec.get('input')
+
+
+def input_fingerprint(kind, spec):
+    # Size and mtime of a processing job's input; None for URLs and inputs that are not there (yet)
+    if kind != 'process':
+        return None
+    try:
+        _, size, mtime_ns = file_fingerprint(spec['input'])
+    except OSError:
+        return None
+    return [size, mtime_ns]
+
+
+def spec_key(kind, spec, fingerprint=None):
+    parts = [kind, spec] if fingerprint is None else [kind, spec, fingerprint]
+    payload = json.dumps(parts, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+class JobQueue:
+    """Download and encode jobs journaled in SQLite (WAL), shared by the GUI and headless runner.
+
+    Every state change is committed before the work it describes starts, so
+    after a crash or reboot `recover()` finds the jobs that were running and
+    puts them back in line. Adding a spec that is already queued or done
+    returns the existing job instead of doing the work twice; a processing
+    job whose input file changed on disk is a new job.
+
+    A queue only sees the jobs of its own `origin` (GUI or HEADLESS) and,
+    with `job_file`, of that headless job file, so one does not recover
+    and run what the other journaled.
+    """
+
+    COLUMNS = 'id, kind, spec, state, attempts, partial, error, created, started, finished'
+
+    def __init__(self, db_path=None, origin=GUI, job_file=None):
+        self.db_path = db_path or os.path.join(data_dir(), 'jobs.sqlite3')
+        self.origin = origin
+        self.job_file = job_file
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    kind TEXT NOT NULL,
+                    spec TEXT NOT NULL,
+                    spec_key TEXT NOT NULL,
+                    state TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    partial TEXT NOT NULL DEFAULT '{}',
+                    error TEXT,
+                    created REAL NOT NULL,
+                    started REAL,
+                    finished REAL
+                )
+            """)
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+            if 'origin' not in columns:
+                # Journals written before jobs had an origin only ever held GUI jobs worth resuming
+                self._conn.execute(f"ALTER TABLE jobs ADD COLUMN origin TEXT NOT NULL DEFAULT '{GUI}'")
+                self._conn.execute("ALTER TABLE jobs ADD COLUMN job_file TEXT")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, id)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_spec_key ON jobs (spec_key)")
+
+    def _job(self, row):
+        id, kind, spec, state, attempts, partial, error, created, started, finished = row
+        return Job(id, kind, json.loads(spec), state, attempts, json.loads(partial), error,
+                   created, started, finished)
+
+    def _scope(self):
+        if self.job_file:
+            return "origin = ? AND job_file = ?", (self.origin, self.job_file)
+        return "origin = ?", (self.origin,)
+
+    def _select(self, where, params=()):
+        scope, scope_params = self._scope()
+        return self._conn.execute(f"SELECT {self.COLUMNS} FROM jobs WHERE {scope} AND {where}",
+                                  (*scope_params, *params)).fetchall()
+
+    def add(self, kind, spec):
+        fingerprint = input_fingerprint(kind, spec)
+        key = spec_key(kind, spec, fingerprint)
+        with self._lock, self._conn:
+            rows = self._select("spec_key = ? ORDER BY id DESC LIMIT 1", (key,))
+            if rows:
+                job = self._job(rows[0])
+                if job.state in (FAILED, CANCELLED):
+                    # Asked for again: retry it, keeping whatever partial output it left behind
+                    self._conn.execute("UPDATE jobs SET state = ?, error = NULL WHERE id = ?", (PENDING, job.id))
+                    job.state, job.error = PENDING, None
+                return job
+            partial = {'fingerprint': fingerprint} if fingerprint else {}
+            cursor = self._conn.execute(
+                "INSERT INTO jobs (kind, spec, spec_key, state, partial, created, origin, job_file) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (kind, json.dumps(spec), key, PENDING, json.dumps(partial), time.time(), self.origin, self.job_file))
+            return self._get(cursor.lastrowid)
+
+    def _get(self, job_id):
+        rows = self._conn.execute(f"SELECT {self.COLUMNS} FROM jobs WHERE id = ?", (job_id,)).fetchall()
+        return self._job(rows[0]) if rows else None
+
+    def get(self, job_id):
+        with self._lock:
+            return self._get(job_id)
+
+    def jobs(self, *states):
+        with self._lock:
+            if not states:
+                return [self._job(row) for row in self._select("1 = 1 ORDER BY id")]
+            marks = ', '.join('?' * len(states))
+            return [self._job(row) for row in self._select(f"state IN ({marks}) ORDER BY id", states)]
+
+    def unfinished(self):
+        return self.jobs(PENDING, RUNNING)
+
+    def _start(self, job_id):
+        self._conn.execute("UPDATE jobs SET state = ?, attempts = attempts + 1, started = ?, finished = NULL "
+                           "WHERE id = ?", (RUNNING, time.time(), job_id))
+
+    def claim(self):
+        """Mark the oldest pending job as running and return it, or None when the queue is empty."""
+        with self._lock, self._conn:
+            rows = self._select("state = ? ORDER BY id LIMIT 1", (PENDING,))
+            if not rows:
+                return None
+            self._start(rows[0][0])
+            return self._get(rows[0][0])
+
+    def start(self, job_id):
+        # For jobs the GUI runs right away instead of leaving them to a queue runner
+        with self._lock, self._conn:
+            self._start(job_id)
+            return self._get(job_id)
+
+    def record_partial(self, job_id, **values):
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT partial FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            partial = json.loads(row[0]) if row else {}
+            for key, value in values.items():
+                if isinstance(partial.get(key), dict) and isinstance(value, dict):
+                    partial[key].update(value)
+                else:
+                    partial[key] = value
+            self._conn.execute("UPDATE jobs SET partial = ? WHERE id = ?", (json.dumps(partial), job_id))
+
+    def reset_partial(self, job_id, **values):
+        # Forget what an earlier attempt left behind, e.g. because its input changed since
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE jobs SET partial = ? WHERE id = ?", (json.dumps(values), job_id))
+
+    def _finish(self, job_id, state, error=None):
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE jobs SET state = ?, error = ?, finished = ? WHERE id = ?",
+                               (state, error, time.time(), job_id))
+
+    def done(self, job_id):
+        # The scratch files are gone now; only the input fingerprint is worth keeping
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT partial FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            fingerprint = json.loads(row[0]).get('fingerprint') if row else None
+            partial = json.dumps({'fingerprint': fingerprint} if fingerprint else {})
+            self._conn.execute("UPDATE jobs SET state = ?, error = NULL, finished = ?, partial = ? WHERE id = ?",
+                               (DONE, time.time(), partial, job_id))
+
+    def fail(self, job_id, error):
+        self._finish(job_id, FAILED, str(error))
+
+    def cancel(self, job_id):
+        self._finish(job_id, CANCELLED)
+
+    def recover(self):
+        """Put this origin's jobs left running by a crashed or closed process back in line; call once at startup."""
+        scope, scope_params = self._scope()
+        with self._lock, self._conn:
+            return self._conn.execute(f"UPDATE jobs SET state = ? WHERE {scope} AND state = ?",
+                                      (PENDING, *scope_params, RUNNING)).rowcount
+
+    def close(self):
+        self._conn.close()
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_job_queue():
+    # Shared instance; None when the data directory is unusable
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            try:
+                _queue = JobQueue()
+            except (OSError, sqlite3.Error):
+                _queue = False
+    return _queue or None
+
+
+def run_job(queue, job, on_progress=None, on_message=None, media=None, control=None):
+    """Run one claimed job to completion, journaling partial output as it goes.
+
+    Downloads resume from the `.part` files yt-dlp leaves behind; chunked and
+    smart-cut encodes skip the steps a previous attempt finished. Returns
+    what the engine returned (the downloaded files for a download) and raises
+    whatever it raised after marking the job failed, or cancelled when
+    `control` was cancelled (JobCancelled). An interrupted job stays running
+    for the next session's recover().
+    """
+    try:
+        if control:
+            control.check()
+        if job.kind == 'download':
+            result = _run_download(queue, job, on_progress, control)
+        elif job.kind == 'process':
+            result = _run_process(queue, job, on_progress, on_message, media, control)
+        elif job.kind == 'stream':
+            result = _run_stream(job, on_progress, on_message, control)
+        else:
+            raise ValueError(f"Unknown job kind '{job.kind}'")
+    except JobInterrupted:
+        # Left running like after a crash, so recover() puts it back in line
+        raise
+    except JobCancelled:
+        # The partial record stays, so the same job run again still resumes
+        queue.cancel(job.id)
+        raise
+    except Exception as e:
+        # A KeyboardInterrupt skips this and leaves the job running, so recover() resumes it
+        queue.fail(job.id, e)
+        raise
+    queue.done(job.id)
+    return result
+
+
+def _run_download(queue, job, on_progress, control):
+    from download_engine import download
+    spec = job.spec
+    os.makedirs(spec['output_dir'], exist_ok=True)
+    seen = set(job.partial.get('parts', []))
+
+    def hook(d):
+        part = d.get('tmpfilename')
+        if part and part not in seen:
+            seen.add(part)
+            queue.record_partial(job.id, parts=sorted(seen))
+        if on_progress:
+            on_progress(d)
+
+    return download(spec['url'], spec['output_dir'], spec['quality'], hook, normalize=spec.get('normalize', False),
+                    weight=spec.get('weight', 1.0), control=control)
+
+
+def _run_stream(job, on_progress, on_message, control):
+    # Nothing to journal: the only file is the output, which is only moved into place when complete
+    from stream_engine import stream
+    spec = job.spec
+    os.makedirs(spec['output_dir'], exist_ok=True)
+    return stream(spec['url'], spec['output_dir'], spec['extension'], spec['quality'], spec.get('operations', []),
+                  on_progress=on_progress, on_message=on_message, control=control)
+
+
+def _run_process(queue, job, on_progress, on_message, media, control):
+    from ffmpeg_engine import process
+    spec = job.spec
+    os.makedirs(os.path.dirname(os.path.abspath(spec['output'])), exist_ok=True)
+    done_steps = job.partial.get('steps', {})
+    fingerprint = input_fingerprint(job.kind, spec)
+    if fingerprint != job.partial.get('fingerprint'):
+        # Pieces encoded from an earlier version of the input must not end up in this output
+        if done_steps and on_message:
+            on_message("The input changed since the last attempt; starting over")
+        done_steps = {}
+        queue.reset_partial(job.id, fingerprint=fingerprint)
+    elif done_steps and on_message:
+        on_message(f"Resuming: {len(done_steps)} finished steps kept from the last attempt")
+    return process(spec['input'], spec['output'], spec['operations'], spec.get('chunks', 0), media,
+                   on_progress=on_progress, on_message=on_message, done_steps=done_steps,
+                   on_step_done=lambda step: queue.record_partial(job.id, steps={step.label: step.command[-1]}),
+                   control=control)
+
+
+def run_now(kind, spec, on_progress=None, on_message=None, media=None, control=None):
+    """Journal a job the GUI starts immediately and run it on the calling thread."""
+    # Without a usable data directory the job still runs, it just is not durable
+    queue = get_job_queue() or JobQueue(':memory:')
+    job = queue.start(queue.add(kind, spec).id)
+    return run_job(queue, job, on_progress, on_message, media, control)
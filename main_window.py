@@ -0,0 +1,158 @@
+from PyQt6.QtWidgets import (QApplication, QMainWindow, QTabWidget, 
+                            QWidget, QVBoxLayout, QMessageBox, QLabel)
+from PyQt6.QtCore import QThread, QTimer, pyqtSignal
+from ffmpeg_caps import start_discovery
+from job_queue import get_job_queue, run_job, PENDING
+from job_control import JobCancelled, JobControl, reap_children
+from progress_bus import progress_bus, format_eta, format_rate
+
+class LazyTab(QWidget):
+    """Placeholder that builds (and imports) the real tab the first time it is shown."""
+
+    def __init__(self, factory):
+        super().__init__()
+        self.factory = factory
+        self.widget = None
+        self.layout = QVBoxLayout(self)
+        self.layout.setContentsMargins(0, 0, 0, 0)
+
+    def showEvent(self, event):
+        if self.widget is None:
+            self.widget = self.factory()
+            self.layout.addWidget(self.widget)
+        super().showEvent(event)
+
+def create_youtube_tab():
+    from youtube_downloader import YouTubeDownloader
+    return YouTubeDownloader()
+
+def create_ffmpeg_tab():
+    from ffmpeg_processor import FFmpegProcessor
+    return FFmpegProcessor()
+
+class QueueWorker(QThread):
+    """Finishes the jobs a previous session left pending or interrupted."""
+    message = pyqtSignal(str)
+
+    def __init__(self, queue):
+        super().__init__()
+        self.queue = queue
+        self.control = JobControl()
+
+    def run(self):
+        while not self.control.cancelled:
+            job = self.queue.claim()
+            if job is None:
+                break
+            self.message.emit(f"Resuming {job.kind}: {job.source}")
+            try:
+                run_job(self.queue, job, on_progress=lambda event, job=job: self.publish(job, event),
+                        on_message=self.message.emit, control=self.control)
+            except JobCancelled:
+                break
+            except Exception as e:
+                self.message.emit(f"{job.kind} failed: {e}")
+            finally:
+                progress_bus().publish(job.name, job.kind, finished=True)
+        self.message.emit("All resumed jobs finished")
+
+    def publish(self, job, event):
+        # Only the window's totals show these jobs, so they have no group
+        if job.kind == 'download':
+            if event.get('status') == 'downloading':
+                progress_bus().publish(job.name, job.kind, done=event.get('downloaded_bytes'),
+                                       total=event.get('total_bytes') or event.get('total_bytes_estimate'))
+        else:
+            progress_bus().publish(job.name, job.kind, done=event.out_time, percent=event.progress)
+
+class MainWindow(QMainWindow):
+    def __init__(self):
+        super().__init__()
+        self.setWindowTitle("Video Tools")
+        self.setMinimumSize(800, 600)
+        
+        # Create central widget and layout
+        central_widget = QWidget()
+        self.setCentralWidget(central_widget)
+        layout = QVBoxLayout(central_widget)
+        
+        # Create tab widget
+        tabs = QTabWidget()
+        layout.addWidget(tabs)
+        
+        # Tabs are built the first time they are shown
+        self.youtube_tab = LazyTab(create_youtube_tab)
+        self.ffmpeg_tab = LazyTab(create_ffmpeg_tab)
+        
+        tabs.addTab(self.youtube_tab, "YouTube Downloader")
+        tabs.addTab(self.ffmpeg_tab, "FFmpeg Processor")
+
+        # Totals over every running job, whichever tab or worker started it
+        self.totals_label = QLabel()
+        self.statusBar().addPermanentWidget(self.totals_label)
+        self.totals_timer = QTimer(self)
+        self.totals_timer.setInterval(progress_bus().interval_ms)
+        self.totals_timer.timeout.connect(self.update_totals)
+        self.totals_timer.start()
+
+        self.queue_worker = None
+        # Look for unfinished jobs after the first paint, not before
+        QTimer.singleShot(0, self.offer_resume)
+
+    def update_totals(self):
+        bus = progress_bus()
+        totals = bus.aggregate()
+        if not totals['jobs']:
+            self.totals_label.clear()
+            return
+        parts = [f"{totals['jobs']} jobs"]
+        rate = bus.aggregate('download')['rate']
+        if rate:
+            parts.append(format_rate(rate))
+        if totals['eta'] is not None:
+            parts.append(f"{format_eta(totals['eta'])} left")
+        self.totals_label.setText(", ".join(parts))
+
+    def offer_resume(self):
+        queue = get_job_queue()
+        if queue is None:
+            return
+        queue.recover()
+        jobs = queue.jobs(PENDING)
+        if not jobs:
+            return
+        answer = QMessageBox.question(
+            self, "Resume jobs",
+            f"{len(jobs)} jobs from the last session did not finish. Resume them now?")
+        if answer != QMessageBox.StandardButton.Yes:
+            for job in jobs:
+                queue.cancel(job.id)
+            return
+        self.queue_worker = QueueWorker(queue)
+        self.queue_worker.message.connect(self.statusBar().showMessage)
+        self.queue_worker.start()
+
+    def closeEvent(self, event):
+        # Stop every job and wait for the threads running them before Qt destroys them;
+        # interrupted jobs are offered for resuming at the next start
+        self.totals_timer.stop()
+        for tab in (self.youtube_tab, self.ffmpeg_tab):
+            if tab.widget is not None:
+                tab.widget.shutdown()
+        if self.queue_worker:
+            self.queue_worker.control.cancel(interrupt=True)
+            self.queue_worker.wait()
+        # Anything a worker did not get to stop in time
+        reap_children()
+        super().closeEvent(event)
+
+def run_gui(argv):
+    # Probe the installed ffmpeg in the background while the window comes up
+    start_discovery()
+    app = QApplication(argv)
+    # Style the whole application exactly once; theme switches swap this one sheet
+    from theme import theme_manager
+    theme_manager().apply()
+    window = MainWindow()
+    window.show()
+    return app.exec()
@@ -0,0 +1,259 @@
+import json
+import subprocess
+from dataclasses import dataclass, field
+
+from probe_cache import get_probe_cache
+
+
+class ProbeError(Exception):
+    pass
+
+
+def run_ffprobe(args):
+    command = ['ffprobe', '-v', 'error', *args]
+    try:
+        return subprocess.check_output(command, stderr=subprocess.PIPE).decode('utf-8', 'replace')
+    except FileNotFoundError:
+        raise ProbeError("ffprobe was not found. Please install FFmpeg and add it to your PATH.")
+    except subprocess.CalledProcessError as e:
+        message = e.stderr.decode('utf-8', 'replace').strip() if e.stderr else str(e)
+        raise ProbeError(message)
+
+
+def probe_json(path):
+    """Full `-show_format -show_streams` probe, served from the persistent cache when possible."""
+    cache = get_probe_cache()
+    try:
+        if cache:
+            cached = cache.get_probe(path)
+            if cached is not None:
+                return cached
+        output = run_ffprobe(['-show_format', '-show_streams', '-of', 'json', path])
+        probe = json.loads(output or '{}')
+        if cache:
+            cache.put_probe(path, probe)
+    except OSError as e:
+        # The cache stats the file before ffprobe ever sees it; callers only expect ProbeError
+        raise _unreadable(path, e)
+    return probe
+
+
+def _unreadable(path, error):
+    return ProbeError(f"Cannot read {path}: {error.strerror or error}")
+
+
+def _int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _float(value):
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return value if value > 0 else None
+
+
+def parse_rate(value):
+    # ffprobe reports frame rates as fractions such as 30000/1001; 0/0 means unknown
+    try:
+        num, _, den = str(value).partition('/')
+        rate = float(num) / float(den or 1)
+    except (ValueError, ZeroDivisionError):
+        return None
+    return rate if rate > 0 else None
+
+
+@dataclass
+class StreamInfo:
+    index: int
+    kind: str
+    codec: str
+    width: int = None
+    height: int = None
+    fps: float = None
+    bitrate: int = None
+    pix_fmt: str = None
+    # Encoder setup of the video, needed to re-encode pieces that are joined with copied ones
+    profile: str = None
+    level: int = None
+    refs: int = None
+    time_base: str = None
+    channels: int = None
+    channel_layout: str = None
+    sample_rate: int = None
+    frames: int = None
+    duration: float = None
+    cover_art: bool = False
+
+
+@dataclass
+class MediaInfo:
+    path: str
+    duration: float = None
+    bitrate: int = None
+    format_name: str = None
+    streams: list = field(default_factory=list)
+
+    @property
+    def video(self):
+        return next((s for s in self.streams if s.kind == 'video' and not s.cover_art), None)
+
+    @property
+    def audio(self):
+        return next((s for s in self.streams if s.kind == 'audio'), None)
+
+    @property
+    def codecs(self):
+        return [(s.kind, s.codec) for s in self.streams if not s.cover_art]
+
+    @property
+    def total_frames(self):
+        video = self.video
+        if video is None:
+            return None
+        if video.frames:
+            return video.frames
+        if video.fps and self.duration:
+            return int(self.duration * video.fps)
+        return None
+
+    def summary(self):
+        parts = []
+        video, audio = self.video, self.audio
+        if video:
+            text = f"{video.codec} {video.width}x{video.height}"
+            if video.fps:
+                text += f" @ {video.fps:.3g} fps"
+            parts.append(text)
+        if audio:
+            text = audio.codec
+            if audio.channel_layout or audio.channels:
+                text += f" {audio.channel_layout or str(audio.channels) + 'ch'}"
+            if audio.sample_rate:
+                text += f" {audio.sample_rate / 1000:g} kHz"
+            parts.append(text)
+        if self.duration:
+            minutes, seconds = divmod(self.duration, 60)
+            hours, minutes = divmod(int(minutes), 60)
+            parts.append(f"{hours:02d}:{minutes:02d}:{seconds:05.2f}")
+        else:
+            parts.append("unknown duration")
+        return ', '.join(parts)
+
+
+def _stream_info(stream):
+    kind = stream.get('codec_type')
+    tags = stream.get('tags', {})
+    info = StreamInfo(
+        index=stream.get('index', 0),
+        kind=kind,
+        codec=stream.get('codec_name'),
+        bitrate=_int(stream.get('bit_rate') or tags.get('BPS')),
+        frames=_int(stream.get('nb_frames') or tags.get('NUMBER_OF_FRAMES')),
+        duration=_float(stream.get('duration')),
+        cover_art=bool(stream.get('disposition', {}).get('attached_pic')),
+    )
+    if kind == 'video':
+        info.width = _int(stream.get('width'))
+        info.height = _int(stream.get('height'))
+        info.fps = parse_rate(stream.get('avg_frame_rate')) or parse_rate(stream.get('r_frame_rate'))
+        info.pix_fmt = stream.get('pix_fmt')
+        info.profile = stream.get('profile')
+        info.level = _int(stream.get('level'))
+        info.refs = _int(stream.get('refs'))
+        info.time_base = stream.get('time_base')
+    elif kind == 'audio':
+        info.channels = _int(stream.get('channels'))
+        info.channel_layout = stream.get('channel_layout')
+        info.sample_rate = _int(stream.get('sample_rate'))
+    return info
+
+
+def probe_media(path):
+    """Probe a file once and return a MediaInfo.
+
+    A missing container duration is not an error: it falls back to the
+    longest stream duration and is left as None when nothing reports one.
+    """
+    probe = probe_json(path)
+    fmt = probe.get('format', {})
+    streams = [_stream_info(s) for s in probe.get('streams', [])]
+    duration = _float(fmt.get('duration'))
+    if duration is None:
+        durations = [s.duration for s in streams if s.duration]
+        duration = max(durations) if durations else None
+    return MediaInfo(
+        path=path,
+        duration=duration,
+        bitrate=_int(fmt.get('bit_rate')),
+        format_name=fmt.get('format_name'),
+        streams=streams,
+    )
+
+
+def _keyframe_times(path, read_interval=None):
+    args = ['-select_streams', 'v:0']
+    if read_interval:
+        args.extend(['-read_intervals', read_interval])
+    output = run_ffprobe([*args, '-show_entries', 'packet=pts_time,flags', '-of', 'csv=p=0', path])
+    times = []
+    for line in output.splitlines():
+        parts = line.strip().split(',')
+        if len(parts) < 2 or 'K' not in parts[1]:
+            continue
+        try:
+            times.append(float(parts[0]))
+        except ValueError:
+            continue
+    return times
+
+
+def cached_keyframes(path):
+    cache = get_probe_cache()
+    try:
+        return cache.get_keyframes(path) if cache else None
+    except OSError as e:
+        raise _unreadable(path, e)
+
+
+def find_keyframe_before(path, timestamp):
+    """Return the pts of the video keyframe a stream copy starting at `timestamp` begins on.
+
+    Uses the cached keyframe index when there is one; otherwise reads only a
+    handful of packets around the seek point (no decoding), so it is cheap
+    even on multi-hour files. Returns None for audio-only input.
+    """
+    index = cached_keyframes(path)
+    if index is None:
+        index = _keyframe_times(path, f'{timestamp}%+#8')
+    times = [t for t in index if t <= timestamp + 1e-3]
+    return max(times) if times else None
+
+
+def find_keyframe_after(path, timestamp, window=60):
+    # First video keyframe at or after `timestamp`, searching up to `window` seconds ahead
+    index = cached_keyframes(path)
+    if index is None:
+        index = _keyframe_times(path, f'{timestamp}%+{window}')
+    times = [t for t in index if t >= timestamp - 1e-3]
+    return min(times) if times else None
+
+
+def probe_keyframes(path, start=None, end=None):
+    # Every video keyframe in [start, end]. Building the index demuxes the file
+    # once (no decoding); after that it comes from the cache.
+    times = cached_keyframes(path)
+    if times is None:
+        times = sorted(_keyframe_times(path))
+        cache = get_probe_cache()
+        if cache:
+            try:
+                cache.put_keyframes(path, times)
+            except OSError as e:
+                raise _unreadable(path, e)
+    return sorted(t for t in times
+                  if (start is None or t >= start - 1e-3) and (end is None or t <= end + 1e-3))
@@ -0,0 +1,100 @@
+import os
+
+from ffmpeg_caps import get_capabilities
+from ffmpeg_plan import (JobPlan, PlanStep, COPY_WEIGHT, CAPABILITIES_TIMEOUT, compile_operations,
+                         plan_job, concat_entry)
+from media_probe import probe_media, probe_keyframes
+
+# Threads given to each chunk encoder. Pinning this (instead of deriving it
+# from the machine) keeps x264/x265 output identical for the same chunk count.
+CHUNK_THREADS = 2
+
+# Chunks shorter than this cost more in process start-up than they save
+MIN_CHUNK_SECONDS = 10
+
+
+def default_workers():
+    return max(1, (os.cpu_count() or 1) // CHUNK_THREADS)
+
+
+def split_at_keyframes(keyframes, start, end, chunks):
+    """Choose chunk boundaries on the keyframes closest to equal-length splits.
+
+    Depends only on the keyframe list and the chunk count, so the same N
+    always produces the same segments. May return fewer chunks than asked
+    for when the source has too few keyframes.
+    """
+    boundaries = [start]
+    candidates = [k for k in keyframes if start < k < end]
+    for i in range(1, chunks):
+        target = start + (end - start) * i / chunks
+        later = [k for k in candidates if k > boundaries[-1]]
+        if not later:
+            break
+        boundaries.append(min(later, key=lambda k: abs(k - target)))
+    boundaries.append(end)
+    return [(a, b) for a, b in zip(boundaries, boundaries[1:]) if b - a > 1e-3]
+
+
+def plan_parallel_job(input_file, output_file, operations, chunks=None, workers=None, media=None):
+    """Encode keyframe-aligned segments of the input side by side, then join them.
+
+    Each chunk is its own ffmpeg process (so the pool is a pool of processes
+    fed from threads), audio is encoded once over the whole range to avoid
+    gaps at the seams, and the pieces are concatenated losslessly with the
+    concat demuxer. Falls back to the regular plan when no video is encoded.
+    """
+    workers = workers or default_workers()
+    chunks = chunks or workers
+    media = media or probe_media(input_file)
+    chain = compile_operations(operations, media, output_file, get_capabilities(CAPABILITIES_TIMEOUT))
+    if (chunks < 2 or media.duration is None
+            or chain.video_encoder in (None, 'copy') or chain.audio_encoder is None):
+        return plan_job(input_file, output_file, operations, media)
+    if chain.target_size:
+        # Two passes over the whole range spend the size budget where it is needed; chunks could not
+        plan = plan_job(input_file, output_file, operations, media)
+        plan.notes.append("Target size is encoded in two passes; parallel chunks are not used")
+        return plan
+
+    start = chain.start
+    end = min(start + chain.duration, media.duration) if chain.duration else media.duration
+    chunks = max(1, min(chunks, int((end - start) // MIN_CHUNK_SECONDS)))
+    segments = split_at_keyframes(probe_keyframes(input_file, start, end), start, end, chunks)
+    if len(segments) < 2:
+        return plan_job(input_file, output_file, operations, media)
+
+    output_dir, output_name = os.path.split(os.path.abspath(output_file))
+    workdir = os.path.join(output_dir, f'.{output_name}.chunks')
+    video_args = ['-c:v', chain.video_encoder, *chain.video_args, '-threads', str(CHUNK_THREADS),
+                  '-fflags', '+bitexact', '-flags:v', '+bitexact']
+    if chain.filters:
+        video_args[:0] = ['-vf', ','.join(chain.filters)]
+
+    steps = []
+    pieces = []
+    for index, (a, b) in enumerate(segments):
+        piece = os.path.join(workdir, f'chunk{index:04d}.mkv')
+        pieces.append(piece)
+        steps.append(PlanStep(['ffmpeg', '-y', '-ss', f'{a:.6f}', '-i', input_file, '-t', f'{b - a:.6f}',
+                               '-map', '0:v:0', '-an', *video_args, piece],
+                              b - a, label=f'chunk {index + 1}/{len(segments)}', group='chunks'))
+
+    duration = end - start
+    concat_list = os.path.join(workdir, 'chunks.txt')
+    join = ['ffmpeg', '-y', '-f', 'concat', '-safe', '0', '-i', concat_list]
+    if media.audio:
+        audio_file = os.path.join(workdir, 'audio.mka')
+        steps.append(PlanStep(['ffmpeg', '-y', '-ss', f'{start:.6f}', '-i', input_file, '-t', f'{duration:.6f}',
+                               '-map', '0:a:0', '-vn', '-c:a', chain.audio_encoder, *chain.audio_args,
+                               '-flags:a', '+bitexact', audio_file],
+                              duration, duration * COPY_WEIGHT, 'audio'))
+        join.extend(['-i', audio_file, '-map', '0:v:0', '-map', '1:a:0'])
+    join.extend(['-c', 'copy', '-fflags', '+bitexact', output_file])
+    steps.append(PlanStep(join, duration, duration * COPY_WEIGHT, 'join'))
+
+    notes = list(chain.notes)
+    notes.append(f"Parallel encode: {len(segments)} chunks on {min(workers, len(segments))} workers")
+    return JobPlan('parallel', steps, duration, notes=notes, workdir=workdir,
+                   files={concat_list: ''.join(concat_entry(path) for path in pieces)},
+                   max_workers=workers)
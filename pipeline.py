@@ -0,0 +1,177 @@
+import itertools
+import os
+import queue
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, asdict
+
+from download_manager import DownloadManager, DEFAULT_CONCURRENCY, DEFAULT_PER_HOST, SKIPPED
+from job_control import JobCancelled, JobControl
+
+DEFAULT_ENCODERS = 1
+# Downloaded files allowed to wait for an encoder before downloads pause
+DEFAULT_BUFFER = 2
+
+QUEUED = 'queued'
+ENCODING = 'encoding'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+
+@dataclass
+class EncodeItem:
+    id: int
+    input: str
+    output: str
+    state: str = QUEUED
+    progress: float = None
+    error: str = None
+    started: float = None
+    finished: float = None
+
+    def as_dict(self):
+        return asdict(self)
+
+
+def _run_download(task, hook, control):
+    from job_queue import run_now
+    spec = {'url': task.url, 'output_dir': task.output_dir, 'quality': task.quality}
+    result = run_now('download', spec, hook, control=control)
+    return [] if result is None else result
+
+
+class Pipeline:
+    """Downloads feeding an FFmpeg operation chain through a bounded queue.
+
+    The download stage is a DownloadManager with its own concurrency and
+    per-host caps; every file it finishes is handed to `encoders` encode
+    workers through a queue of `buffer` slots. While the encoders are busy
+    the network stage keeps fetching the next items until the queue is
+    full, then waits, so a batch takes about as long as its slower stage
+    rather than both added up. Encodes are journaled like any other
+    processing job. `on_download(task)` and `on_encode(item)` are called
+    from the worker threads. `pause`, `resume` and `cancel` act on both
+    stages at once; a cancelled pipeline only winds down.
+    """
+
+    def __init__(self, download_dir, output_dir, extension, operations, quality, chunks=0,
+                 downloads=DEFAULT_CONCURRENCY, per_host=DEFAULT_PER_HOST, encoders=DEFAULT_ENCODERS,
+                 buffer=DEFAULT_BUFFER, on_download=None, on_encode=None, downloader=None, encoder=None,
+                 archive=None):
+        self.download_dir = download_dir
+        self.output_dir = output_dir
+        self.extension = extension.lstrip('.')
+        self.operations = operations
+        self.quality = quality
+        self.chunks = chunks
+        self.on_encode = on_encode
+        self.downloader = downloader or _run_download
+        self.encoder = encoder or self._run_encode
+        self.manager = DownloadManager(downloads, per_host, on_update=on_download, runner=self._download,
+                                       archive=archive)
+        self._queue = queue.Queue(maxsize=max(1, buffer))
+        self._ids = itertools.count(1)
+        self._counts = Counter()
+        self._lock = threading.Lock()
+        # Shared by every encode, so pausing suspends all of their ffmpeg processes
+        self.control = JobControl()
+        self._workers = [threading.Thread(target=self._encode_worker, name=f'encode-{i + 1}', daemon=True)
+                         for i in range(max(1, encoders))]
+        for worker in self._workers:
+            worker.start()
+
+    def add(self, urls):
+        return self.manager.add_many(urls, self.download_dir, self.quality)
+
+    def add_source(self, url, start=1, end=None, limit=None):
+        self.manager.add_source(url, self.download_dir, self.quality, start, end, limit)
+
+    def _download(self, task, hook, control):
+        paths = self.downloader(task, hook, control)
+        if getattr(paths, 'skipped', False):
+            # Archived already, so an earlier run encoded it too; dropped like archived playlist entries
+            return SKIPPED
+        for path in paths:
+            stem = os.path.splitext(os.path.basename(path))[0]
+            item = EncodeItem(next(self._ids), path, os.path.join(self.output_dir, f'{stem}.{self.extension}'))
+            with self._lock:
+                self._counts[QUEUED] += 1
+            self._notify(item)
+            # Blocks while the encoders are behind; that is what bounds the download stage
+            self._queue.put(item)
+
+    def _run_encode(self, item, on_progress, control):
+        from job_queue import run_now
+        spec = {'input': item.input, 'output': item.output, 'operations': self.operations, 'chunks': self.chunks}
+        run_now('process', spec, on_progress=on_progress, control=control)
+
+    def _encode_worker(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                self._queue.task_done()
+                return
+            with self._lock:
+                self._counts[QUEUED] -= 1
+                self._counts[ENCODING] += 1
+            item.state, item.started = ENCODING, time.time()
+            self._notify(item)
+
+            def report(event, item=item):
+                if event.progress is not None:
+                    item.progress = event.progress
+                    self._notify(item)
+
+            try:
+                os.makedirs(self.output_dir, exist_ok=True)
+                self.control.check()
+                self.encoder(item, report, self.control)
+            except JobCancelled:
+                item.state = CANCELLED
+            except Exception as e:
+                item.state, item.error = FAILED, str(e)
+            else:
+                item.state, item.progress = DONE, 100.0
+            item.finished = time.time()
+            with self._lock:
+                self._counts[ENCODING] -= 1
+                self._counts[item.state] += 1
+            self._notify(item)
+            self._queue.task_done()
+
+    def _notify(self, item):
+        if self.on_encode:
+            self.on_encode(item)
+
+    def wait(self):
+        # Every put happens inside a download, so once those are done the queue only drains
+        self.manager.wait()
+        self._queue.join()
+
+    def pause(self):
+        self.manager.pause()
+        self.control.pause()
+
+    def resume(self):
+        self.control.resume()
+        self.manager.resume()
+
+    def cancel(self):
+        # Downloads that were waiting for a queue slot hand their file over and end
+        self.manager.cancel()
+        self.control.cancel()
+
+    def close(self):
+        # Running downloads and queued encodes still finish; the workers exit after them
+        self.manager.close()
+        for _ in self._workers:
+            self._queue.put(None)
+
+    def stats(self):
+        with self._lock:
+            encodes = {'queued': self._counts[QUEUED], 'encoding': self._counts[ENCODING],
+                       'done': self._counts[DONE], 'failed': self._counts[FAILED],
+                       'cancelled': self._counts[CANCELLED]}
+        return {'downloads': self.manager.stats(), 'encodes': encodes}
@@ -0,0 +1,110 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from app_paths import cache_dir
+
+# Entries kept before the least recently used ones are evicted
+MAX_ENTRIES = 5000
+
+
+def file_fingerprint(path):
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    return path, stat.st_size, stat.st_mtime_ns
+
+
+class ProbeCache:
+    """ffprobe results stored in SQLite, keyed by absolute path, size and mtime.
+
+    A file that changed on disk simply misses and is probed again; its old
+    row is overwritten. The keyframe index is stored alongside the probe
+    JSON but filled in separately, since only some jobs need it.
+    """
+
+    def __init__(self, db_path=None, max_entries=MAX_ENTRIES):
+        self.db_path = db_path or os.path.join(cache_dir(), 'probe_cache.sqlite3')
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS probes (
+                    path TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    probe TEXT,
+                    keyframes TEXT,
+                    last_used REAL NOT NULL
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS probes_last_used ON probes (last_used)")
+
+    def _get(self, path, column):
+        key, size, mtime_ns = file_fingerprint(path)
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {column} FROM probes WHERE path = ? AND size = ? AND mtime_ns = ?",
+                (key, size, mtime_ns)).fetchone()
+            if row is None or row[0] is None:
+                return None
+            with self._conn:
+                self._conn.execute("UPDATE probes SET last_used = ? WHERE path = ?", (time.time(), key))
+        return json.loads(row[0])
+
+    def _put(self, path, column, value):
+        key, size, mtime_ns = file_fingerprint(path)
+        payload = json.dumps(value)
+        with self._lock, self._conn:
+            updated = self._conn.execute(
+                f"UPDATE probes SET {column} = ?, last_used = ? WHERE path = ? AND size = ? AND mtime_ns = ?",
+                (payload, time.time(), key, size, mtime_ns)).rowcount
+            if not updated:
+                # New file, or the old row describes a previous version of it
+                self._conn.execute(
+                    f"INSERT OR REPLACE INTO probes (path, size, mtime_ns, {column}, last_used) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (key, size, mtime_ns, payload, time.time()))
+                self._evict()
+
+    def _evict(self):
+        count = self._conn.execute("SELECT COUNT(*) FROM probes").fetchone()[0]
+        if count > self.max_entries:
+            self._conn.execute(
+                "DELETE FROM probes WHERE path IN "
+                "(SELECT path FROM probes ORDER BY last_used LIMIT ?)",
+                (count - self.max_entries,))
+
+    def get_probe(self, path):
+        return self._get(path, 'probe')
+
+    def put_probe(self, path, probe):
+        self._put(path, 'probe', probe)
+
+    def get_keyframes(self, path):
+        return self._get(path, 'keyframes')
+
+    def put_keyframes(self, path, keyframes):
+        self._put(path, 'keyframes', keyframes)
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM probes")
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_probe_cache():
+    # Shared instance; None when the cache directory is unusable (read-only profile, ...)
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            try:
+                _cache = ProbeCache()
+            except (OSError, sqlite3.Error):
+                _cache = False
+    return _cache or None
@@ -0,0 +1,190 @@
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, replace
+
+from ffmpeg_progress import DEFAULT_UI_RATE
+
+# Seconds of samples behind the smoothed speed and ETA
+DEFAULT_WINDOW = 5.0
+
+
+def format_rate(bytes_per_second):
+    if not bytes_per_second:
+        return ''
+    for unit in ('B/s', 'KB/s', 'MB/s'):
+        if bytes_per_second < 1024:
+            return f"{bytes_per_second:.1f} {unit}"
+        bytes_per_second /= 1024
+    return f"{bytes_per_second:.1f} GB/s"
+
+
+def format_eta(seconds):
+    if seconds is None:
+        return ''
+    seconds = int(seconds + 0.5)
+    hours, rest = divmod(seconds, 3600)
+    if hours:
+        return f"{hours}:{rest // 60:02d}:{rest % 60:02d}"
+    return f"{rest // 60}:{rest % 60:02d}"
+
+
+class RateWindow:
+    """Average rate of a growing counter over the last `window` seconds."""
+
+    def __init__(self, window=DEFAULT_WINDOW):
+        self.window = window
+        self._samples = deque()
+
+    def add(self, now, value):
+        if self._samples and value < self._samples[-1][1]:
+            # The counter went back (a retry, the next format of a merge): start over
+            self._samples.clear()
+        self._samples.append((now, value))
+        # Keep one sample at or before the start of the window
+        while len(self._samples) > 2 and now - self._samples[1][0] >= self.window:
+            self._samples.popleft()
+
+    def rate(self):
+        if len(self._samples) < 2:
+            return None
+        (start, first), (end, last) = self._samples[0], self._samples[-1]
+        return (last - first) / (end - start) if end > start else None
+
+
+@dataclass
+class JobProgress:
+    key: str
+    kind: str
+    # Consumer that shows this job's rows; None when only the aggregate is shown
+    group: str = None
+    label: str = ''
+    status: str = ''
+    detail: str = ''
+    done: float = 0.0
+    total: float = None
+    percent: float = None
+    # Smoothed units (bytes, seconds of output) per second, and seconds left
+    rate: float = None
+    eta: float = None
+    finished: bool = False
+    updated: float = None
+
+
+class _Track:
+    def __init__(self, job, window):
+        self.job = job
+        self.done = RateWindow(window)
+        self.percent = RateWindow(window)
+        self.dirty = True
+
+
+class ProgressBus:
+    """Collects progress from any number of worker threads for a UI that polls it.
+
+    `publish` only overwrites the job's latest numbers, so workers can call it
+    on every callback; the UI calls `take(group)` on a timer running at `rate`
+    per second and gets one snapshot per job that changed since the last call.
+    The UI thread's work therefore follows the poll rate, not the number of
+    jobs or how chatty they are. Speeds and ETAs are averaged over `window`
+    seconds so they do not jump with every sample.
+    """
+
+    def __init__(self, rate=DEFAULT_UI_RATE, window=DEFAULT_WINDOW, clock=time.monotonic):
+        self.rate = rate
+        self.window = window
+        self.clock = clock
+        self._tracks = {}
+        self._lock = threading.Lock()
+
+    @property
+    def interval_ms(self):
+        return int(1000 / self.rate) if self.rate else 0
+
+    def publish(self, key, kind, group=None, label=None, status=None, detail=None,
+                done=None, total=None, percent=None, finished=False):
+        now = self.clock()
+        with self._lock:
+            track = self._tracks.get(key)
+            if track is None:
+                track = self._tracks[key] = _Track(JobProgress(key, kind, group), self.window)
+            job = track.job
+            if label is not None:
+                job.label = label
+            if status is not None:
+                job.status = status
+            if detail is not None:
+                job.detail = detail
+            if total:
+                job.total = total
+            if done is not None:
+                job.done = done
+                track.done.add(now, done)
+                job.rate = track.done.rate()
+            if percent is None and job.total and done is not None:
+                percent = min(100.0, done / job.total * 100)
+            if percent is not None:
+                job.percent = percent
+                track.percent.add(now, percent)
+            job.eta = self._eta(track)
+            job.finished = finished
+            job.updated = now
+            track.dirty = True
+            if finished:
+                job.rate = job.eta = None
+                if group is None and job.group is None:
+                    del self._tracks[key]
+
+    def _eta(self, track):
+        job = track.job
+        if job.total and job.rate:
+            return max(0.0, (job.total - job.done) / job.rate)
+        percent_rate = track.percent.rate()
+        if job.percent is not None and percent_rate:
+            return max(0.0, (100.0 - job.percent) / percent_rate)
+        return None
+
+    def take(self, group):
+        """Snapshots of the group's jobs that changed since the last take; finished jobs are then dropped."""
+        changed = []
+        with self._lock:
+            for key, track in list(self._tracks.items()):
+                if track.job.group != group or not track.dirty:
+                    continue
+                track.dirty = False
+                changed.append(replace(track.job))
+                if track.job.finished:
+                    del self._tracks[key]
+        return changed
+
+    def pending(self, group):
+        # Jobs still running, or finished but not yet taken
+        with self._lock:
+            return sum(1 for track in self._tracks.values() if track.job.group == group)
+
+    def aggregate(self, kind=None):
+        """Totals over unfinished jobs (of one kind, or all): count, summed rate, overall percent and ETA."""
+        with self._lock:
+            jobs = [track.job for track in self._tracks.values()
+                    if not track.job.finished and kind in (None, track.job.kind)]
+        percents = [job.percent for job in jobs if job.percent is not None]
+        etas = [job.eta for job in jobs if job.eta is not None]
+        return {
+            'jobs': len(jobs),
+            'rate': sum(job.rate or 0 for job in jobs),
+            'percent': sum(percents) / len(percents) if percents else None,
+            # Jobs run side by side, so the batch ends with the slowest one
+            'eta': max(etas) if etas else None,
+        }
+
+
+_bus = None
+_bus_lock = threading.Lock()
+
+
+def progress_bus():
+    global _bus
+    with _bus_lock:
+        if _bus is None:
+            _bus = ProgressBus()
+    return _bus
@@ -0,0 +1,101 @@
+import math
+import os
+import shutil
+import tempfile
+from dataclasses import dataclass, replace
+
+from ffmpeg_caps import get_capabilities
+from ffmpeg_plan import CAPABILITIES_TIMEOUT, PlanError, build_command, compile_operations, container_of
+from ffmpeg_progress import run_ffmpeg
+from media_probe import probe_media
+
+SAMPLE_COUNT = 4
+SAMPLE_SECONDS = 5.0
+# x264 and x265 roughly halve the bitrate for every 6 steps of CRF
+CRF_HALVING_STEP = 6
+
+
+@dataclass
+class SizeEstimate:
+    size: int
+    low: int
+    high: int
+    duration: float
+    # Seconds actually encoded to get here; 0 when nothing had to be encoded
+    sampled: float = 0.0
+    quality: int = None
+
+    def quality_for(self, target_size):
+        """CRF that should land near `target_size` bytes, from the size predicted at `quality`."""
+        if self.quality is None or not self.size:
+            return None
+        crf = self.quality + CRF_HALVING_STEP * math.log2(self.size / target_size)
+        return min(51, max(0, round(crf)))
+
+    def as_dict(self):
+        return {'size': self.size, 'low': self.low, 'high': self.high, 'duration': self.duration,
+                'sampled': self.sampled, 'quality': self.quality}
+
+
+def sample_ranges(start, end, count=SAMPLE_COUNT, length=SAMPLE_SECONDS):
+    """(start, duration) of `count` samples spread evenly over [start, end]; the whole range if it is short."""
+    span = end - start
+    if span <= count * length * 2:
+        return [(start, span)]
+    ranges = []
+    for index in range(count):
+        center = start + (index + 0.5) * span / count
+        ranges.append((center - length / 2, length))
+    return ranges
+
+
+def estimate_size(input_file, output_file, operations, media=None, samples=SAMPLE_COUNT,
+                  sample_seconds=SAMPLE_SECONDS, on_progress=None, control=None):
+    """Predict the output size of an operation chain by encoding a few short samples of it.
+
+    The samples run the exact encoder configuration the job would use, spread
+    over the range it keeps, and their bytes per second are scaled up to the
+    full duration; `low` and `high` scale the sparsest and busiest sample.
+    Stream copies are predicted from the input's size and target-size jobs
+    return their target without encoding anything.
+    """
+    media = media or probe_media(input_file)
+    chain = compile_operations(operations, media, output_file, get_capabilities(CAPABILITIES_TIMEOUT))
+    if media.duration is None:
+        raise PlanError("Estimating the size needs an input with a known duration")
+    end = min(chain.start + chain.duration, media.duration) if chain.duration else media.duration
+    duration = max(end - chain.start, 0.0)
+    if chain.target_size:
+        return SizeEstimate(chain.target_size, chain.target_size, chain.target_size, duration)
+    if chain.stream_copy:
+        size = int(os.path.getsize(input_file) * duration / media.duration)
+        return SizeEstimate(size, size, size, duration)
+
+    ranges = sample_ranges(chain.start, end, samples, sample_seconds)
+    sampled = sum(length for _, length in ranges)
+    rates = []
+    done = 0.0
+    workdir = tempfile.mkdtemp(prefix='size-estimate-')
+    try:
+        for index, (start, length) in enumerate(ranges):
+            if control:
+                control.check()
+            sample = os.path.join(workdir, f'sample{index}.{container_of(output_file) or "mkv"}')
+
+            def report(event, done=done):
+                event.progress = (done + min(event.out_time, length)) / sampled * 100
+                if on_progress:
+                    on_progress(event)
+
+            run_ffmpeg(build_command(input_file, sample, replace(chain, start=start, duration=length)),
+                       length, report, control=control)
+            rates.append(os.path.getsize(sample) / length)
+            done += length
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    size = int(sum(rate * length for rate, (_, length) in zip(rates, ranges)) / sampled * duration)
+    quality = None
+    if chain.compress and chain.video_encoder in ('libx264', 'libx265'):
+        quality = int(chain.compress['quality'])
+    return SizeEstimate(size, int(min(rates) * duration), int(max(rates) * duration), duration, sampled, quality)
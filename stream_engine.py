@@ -0,0 +1,235 @@
+import os
+import shutil
+import subprocess
+import sys
+
+from download_engine import (DownloadError, EXTRACTOR_ARGS, FORMAT_SELECTORS, FALLBACK_FORMAT, QUALITY_CHOICES,
+                             download)
+from ffmpeg_caps import get_capabilities
+from ffmpeg_engine import process
+from ffmpeg_plan import CAPABILITIES_TIMEOUT, compile_operations, container_of, target_video_kbps
+from ffmpeg_progress import run_ffmpeg
+from job_control import register_child, unregister_child
+from media_probe import MediaInfo, StreamInfo
+
+# Protocols ffmpeg opens itself; formats on anything else are piped in from yt-dlp
+FFMPEG_PROTOCOLS = {'http', 'https', 'm3u8', 'm3u8_native'}
+
+# Output extensions that hold audio only
+AUDIO_EXTENSIONS = {'mp3', 'm4a', 'aac', 'opus', 'ogg', 'oga', 'flac', 'wav'}
+
+# yt-dlp codec strings start with these (avc1.640028, mp4a.40.2, ...)
+CODEC_NAMES = {
+    'avc1': 'h264', 'avc3': 'h264', 'h264': 'h264',
+    'hev1': 'hevc', 'hvc1': 'hevc', 'h265': 'hevc',
+    'vp09': 'vp9', 'vp9': 'vp9', 'vp8': 'vp8', 'av01': 'av1',
+    'mp4a': 'aac', 'aac': 'aac', 'opus': 'opus', 'vorbis': 'vorbis', 'mp3': 'mp3',
+    'ac-3': 'ac3', 'ec-3': 'eac3', 'flac': 'flac',
+}
+
+
+class NotStreamable(DownloadError):
+    pass
+
+
+def codec_name(value):
+    if not value or value == 'none':
+        return None
+    prefix = value.split('.', 1)[0].lower()
+    return CODEC_NAMES.get(prefix, prefix)
+
+
+def _source_media(info, formats):
+    # What the planner would learn from probing, taken from the format metadata instead
+    streams = []
+    for fmt in formats:
+        video, audio = codec_name(fmt.get('vcodec')), codec_name(fmt.get('acodec'))
+        if video:
+            streams.append(StreamInfo(len(streams), 'video', video, width=fmt.get('width'),
+                                      height=fmt.get('height'), fps=fmt.get('fps')))
+        if audio:
+            streams.append(StreamInfo(len(streams), 'audio', audio))
+    return MediaInfo(path=info.get('webpage_url'), duration=info.get('duration'), streams=streams)
+
+
+def _direct_input(ydl, fmt, start):
+    args = []
+    if fmt.get('protocol') in ('http', 'https'):
+        # Same reconnect behaviour yt-dlp uses when ffmpeg is its downloader
+        args.extend(['-reconnect', '1', '-reconnect_streamed', '1', '-reconnect_delay_max', '5'])
+    headers = dict(fmt.get('http_headers') or {})
+    cookies = ydl.cookiejar.get_cookie_header(fmt['url']) if hasattr(ydl.cookiejar, 'get_cookie_header') else None
+    if cookies:
+        headers['Cookie'] = cookies
+    if headers:
+        args.extend(['-headers', ''.join(f'{key}: {value}\r\n' for key, value in headers.items())])
+    if start:
+        args.extend(['-ss', f'{start:.6f}'])
+    return [*args, '-i', fmt['url']]
+
+
+def _yt_dlp_command():
+    # The frozen app is not a Python interpreter and ships no yt-dlp executable to pipe from
+    if getattr(sys, 'frozen', False):
+        return None
+    return [sys.executable, '-m', 'yt_dlp']
+
+
+def stream_command(ydl, url, info, output_file, chain):
+    """The ffmpeg command for a streamed job, and the yt-dlp command feeding its stdin (or None).
+
+    Raises NotStreamable when a format needs a feeder that cannot be started.
+    """
+    formats = info.get('requested_formats') or [info]
+    command = ['ffmpeg', '-y']
+    feeder = None
+    for fmt in formats:
+        if fmt.get('protocol', 'https') in FFMPEG_PROTOCOLS:
+            command.extend(_direct_input(ydl, fmt, chain.start))
+            continue
+        yt_dlp = _yt_dlp_command()
+        if yt_dlp is None:
+            raise NotStreamable(f"Format {fmt.get('format_id')} ({fmt.get('protocol')}) needs the yt-dlp "
+                                "executable to be piped into ffmpeg, and this build has none")
+        if feeder:
+            raise NotStreamable(f"Format {fmt.get('format_id')} ({fmt.get('protocol')}) would need a second "
+                                "yt-dlp pipe")
+        feeder = [*yt_dlp, '--quiet', '--no-warnings', '-f', fmt['format_id'], '-o', '-', url]
+        if chain.start:
+            command.extend(['-ss', f'{chain.start:.6f}'])
+        command.extend(['-i', 'pipe:0'])
+    if len(formats) > 1:
+        for index, fmt in enumerate(formats):
+            if codec_name(fmt.get('vcodec')):
+                command.extend(['-map', f'{index}:v:0'])
+            if codec_name(fmt.get('acodec')):
+                command.extend(['-map', f'{index}:a:0'])
+    if chain.duration:
+        command.extend(['-t', f'{chain.duration:.6f}'])
+    if container_of(output_file) in AUDIO_EXTENSIONS:
+        command.append('-vn')
+    else:
+        if chain.filters:
+            command.extend(['-vf', ','.join(chain.filters)])
+        if chain.video_encoder:
+            command.extend(['-c:v', chain.video_encoder, *chain.video_args])
+    if chain.audio_encoder:
+        command.extend(['-c:a', chain.audio_encoder, *chain.audio_args])
+    command.append(output_file)
+    return command, feeder
+
+
+def stream(url, output_dir, extension, format_choice, operations=(), on_progress=None, on_message=None,
+           control=None):
+    """Download and transcode in one pass, writing nothing but the final output.
+
+    ffmpeg reads the selected formats straight from their URLs (or, for
+    protocols it cannot open, from a yt-dlp process writing to its stdin) and
+    applies the operation chain on the way through, so a job costs one write
+    instead of download, read back and write again, and finishes in about
+    the time of the slower of the two. Traffic read by ffmpeg itself is not
+    counted against the bandwidth limit. Pausing or cancelling `control`
+    suspends or stops the yt-dlp feeder together with ffmpeg. Media that
+    cannot be piped (no yt-dlp executable in the frozen app, or two formats
+    that both need one) is downloaded first and then transcoded. Returns
+    the output path.
+    """
+    import yt_dlp
+
+    opts = {
+        'format': FORMAT_SELECTORS.get(format_choice, FORMAT_SELECTORS[QUALITY_CHOICES[0]]),
+        'outtmpl': f'{output_dir}/%(title)s.%(ext)s',
+        'quiet': True,
+        'no_warnings': True,
+        'noplaylist': True,
+        'socket_timeout': 30,
+        'extractor_retries': 5,
+        'extractor_args': EXTRACTOR_ARGS,
+    }
+    if control:
+        control.check()
+    with yt_dlp.YoutubeDL(opts) as ydl:
+        try:
+            info = ydl.extract_info(url, download=False)
+        except yt_dlp.utils.DownloadError:
+            # The selected quality is not offered
+            ydl.params['format'] = FALLBACK_FORMAT
+            info = ydl.extract_info(url, download=False)
+        if not info:
+            raise DownloadError(f"yt-dlp found nothing to stream at {url}")
+        base = os.path.splitext(ydl.prepare_filename(info))[0]
+        output_file = f'{base}.{extension}'
+        scratch = f'{base}.part.{extension}'
+        formats = info.get('requested_formats') or [info]
+        media = _source_media(info, formats)
+        chain = compile_operations(operations, media, output_file, get_capabilities(CAPABILITIES_TIMEOUT))
+        if chain.target_size:
+            # There is no second look at a stream: one pass at the average rate, capped so it cannot overshoot
+            length = chain.duration or max((info.get('duration') or 0) - chain.start, 0)
+            kbps = target_video_kbps(chain, media, length)
+            chain.video_args = [*chain.video_args, '-b:v', f'{kbps}k', '-maxrate', f'{kbps}k',
+                                '-bufsize', f'{2 * kbps}k']
+            chain.notes.append(f"Target size on a stream: single pass at {kbps} kb/s")
+        try:
+            command, feeder = stream_command(ydl, url, info, scratch, chain)
+        except NotStreamable as e:
+            if on_message:
+                on_message(f"{e}; downloading it first, then transcoding")
+            return _download_then_transcode(url, output_file, format_choice, operations, on_progress, on_message,
+                                            control)
+        for note in chain.notes:
+            if on_message:
+                on_message(note)
+
+    duration = chain.duration or info.get('duration')
+    if duration and chain.start and not chain.duration:
+        duration = max(duration - chain.start, 0.0)
+    upstream = None
+    try:
+        if feeder:
+            upstream = subprocess.Popen(feeder, stdout=subprocess.PIPE, stdin=subprocess.DEVNULL)
+            if control:
+                control.track(upstream)
+            else:
+                register_child(upstream)
+        run_ffmpeg(command, duration, on_progress, stdin=upstream.stdout if upstream else None, control=control)
+        if upstream and upstream.wait() != 0:
+            raise DownloadError(f"yt-dlp exited with code {upstream.returncode} while streaming {url}")
+    except BaseException:
+        if upstream and upstream.poll() is None:
+            upstream.kill()
+        if os.path.exists(scratch):
+            os.remove(scratch)
+        raise
+    finally:
+        if upstream:
+            upstream.stdout.close()
+            upstream.wait()
+            if control:
+                control.untrack(upstream)
+            else:
+                unregister_child(upstream)
+    os.replace(scratch, output_file)
+    return output_file
+
+
+def _download_then_transcode(url, output_file, format_choice, operations, on_progress, on_message, control):
+    output_dir, name = os.path.split(output_file)
+    # Kept when the job fails or is cancelled, so running it again resumes the download
+    workdir = os.path.join(output_dir, f'.{name}.download')
+    os.makedirs(workdir, exist_ok=True)
+    # Not archived: the download is only an intermediate file
+    paths = download(url, workdir, format_choice, archive=False, control=control)
+    if not paths:
+        raise DownloadError(f"yt-dlp downloaded nothing from {url}")
+    base, extension = os.path.splitext(output_file)
+    scratch = f'{base}.part{extension}'
+    try:
+        process(paths[0], scratch, operations, on_progress=on_progress, on_message=on_message, control=control)
+    except BaseException:
+        if os.path.exists(scratch):
+            os.remove(scratch)
+        raise
+    os.replace(scratch, output_file)
+    shutil.rmtree(workdir, ignore_errors=True)
+    return output_file
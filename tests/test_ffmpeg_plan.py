@@ -0,0 +1,84 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ffmpeg_plan  # noqa: E402
+from media_probe import MediaInfo, StreamInfo  # noqa: E402
+
+
+def smart_cut(monkeypatch, video):
+    monkeypatch.setattr(ffmpeg_plan, 'find_keyframe_after', lambda path, timestamp: 12.0)
+    monkeypatch.setattr(ffmpeg_plan, 'find_keyframe_before', lambda path, timestamp: 48.0)
+    media = MediaInfo('in.mp4', 120.0, streams=[video])
+    return ffmpeg_plan.plan_smart_cut('in.mp4', 'out.mp4', 10.0, 50.0, media)
+
+
+def test_smart_cut_matches_h264_source_and_writes_annexb_pieces(monkeypatch):
+    video = StreamInfo(0, 'video', 'h264', pix_fmt='yuv420p', profile='Main', level=31, refs=4,
+                       time_base='1/15360')
+    plan = smart_cut(monkeypatch, video)
+    steps = {step.label: step.command for step in plan.steps}
+    assert set(steps) == {'head', 'middle', 'tail', 'join'}
+    for label in ('head', 'tail'):
+        command = steps[label]
+        for option, value in (('-c:v', 'libx264'), ('-profile:v', 'main'), ('-level:v', '3.1'),
+                              ('-refs', '4'), ('-pix_fmt', 'yuv420p'), ('-enc_time_base:v', '1/15360')):
+            assert command[command.index(option) + 1] == value
+    for label in ('head', 'middle', 'tail'):
+        command = steps[label]
+        assert command[command.index('-bsf:v') + 1] == 'h264_mp4toannexb'
+        assert command[command.index('-f') + 1] == 'mpegts'
+        assert command[-1].endswith('.ts')
+    assert ''.join(plan.files.values()).count('.ts') == 3
+
+
+def test_smart_cut_matches_hevc_profile_and_level(monkeypatch):
+    video = StreamInfo(0, 'video', 'hevc', pix_fmt='yuv420p10le', profile='Main 10', level=123,
+                       time_base='1/90000')
+    plan = smart_cut(monkeypatch, video)
+    head = plan.steps[0].command
+    assert head[head.index('-c:v') + 1] == 'libx265'
+    assert head[head.index('-profile:v') + 1] == 'main10'
+    assert head[head.index('-pix_fmt') + 1] == 'yuv420p10le'
+    assert 'level-idc=4.1' in head[head.index('-x265-params') + 1]
+    assert all(step.command[step.command.index('-bsf:v') + 1] == 'hevc_mp4toannexb' for step in plan.steps[:3])
+
+
+def test_every_hardware_encoder_compiles_for_quality_and_target_size():
+    for encoder in ('h264_nvenc', 'hevc_nvenc', 'av1_nvenc', 'h264_qsv', 'hevc_qsv', 'h264_amf', 'hevc_amf',
+                    'h264_videotoolbox', 'hevc_videotoolbox'):
+        for mode in ('crf', 'size'):
+            compress = {'type': 'compress', 'mode': mode, 'quality': 23, 'preset': 'medium', 'target_mb': 50}
+            chain = ffmpeg_plan.compile_operations([{'type': 'convert', 'codec': encoder}, compress])
+            assert chain.video_encoder == encoder
+            assert chain.compress is compress
+    chain = ffmpeg_plan.compile_operations([{'type': 'convert', 'codec': 'h264_qsv'},
+                                            {'type': 'compress', 'quality': 23, 'preset': 'ultrafast'}])
+    assert chain.video_args == ['-preset', 'veryfast', '-global_quality', '23']
+
+
+def test_smart_cut_ends_keep_source_quality_for_other_codecs(monkeypatch):
+    for codec, expected in (('vp9', ['-crf', '18', '-b:v', '0', '-deadline', 'good']), ('av1', ['-crf', '18']),
+                            ('mpeg4', ['-q:v', '2']), ('mpeg2video', ['-q:v', '2'])):
+        plan = smart_cut(monkeypatch, StreamInfo(0, 'video', codec, pix_fmt='yuv420p'))
+        head = plan.steps[0].command
+        index = head.index(expected[0])
+        assert head[index:index + len(expected)] == expected
+
+
+def test_smart_cut_fallback_fits_the_output_container(monkeypatch):
+    monkeypatch.setattr(ffmpeg_plan, 'find_keyframe_after', lambda path, timestamp: None)
+    monkeypatch.setattr(ffmpeg_plan, 'find_keyframe_before', lambda path, timestamp: None)
+    media = MediaInfo('in.webm', 60.0, streams=[StreamInfo(0, 'video', 'vp8', pix_fmt='yuv420p'),
+                                                StreamInfo(1, 'audio', 'vorbis')])
+    command = ffmpeg_plan.plan_smart_cut('in.webm', 'out.webm', 10.0, 11.0, media).command
+    assert command[command.index('-c:v') + 1:command.index('-c:v') + 2] == ['libvpx-vp9']
+    assert command[command.index('-crf') + 1] == '18'
+    assert command[command.index('-c:a') + 1] == 'copy'
+
+    media = MediaInfo('in.mp4', 60.0, streams=[StreamInfo(0, 'video', 'h264', pix_fmt='yuv420p', profile='High'),
+                                               StreamInfo(1, 'audio', 'aac')])
+    command = ffmpeg_plan.plan_smart_cut('in.mp4', 'out.mp4', 10.0, 11.0, media).command
+    assert command[command.index('-c:v') + 1] == 'libx264'
+    assert command[command.index('-profile:v') + 1] == 'high'
@@ -0,0 +1,341 @@
+from string import Template
+
+from PyQt6.QtWidgets import QApplication, QPushButton
+from PyQt6.QtCore import QObject, pyqtSignal
+
+DARK = {
+    'bg': '#181818',
+    'fg': '#E0E0E0',
+    'surface': '#232323',
+    'border': '#333',
+    'input_bg': '#232323',
+    'selection': '#333',
+    'progress_bg': '#232323',
+    'group_title': '#42A5F5',
+    'button_bg': '#232323',
+    'button_hover': '#333',
+    'button_pressed': '#444',
+    'button_disabled_bg': '#232323',
+    'button_disabled_fg': '#757575',
+    'secondary_bg': '#424242',
+    'secondary_fg': '#E0E0E0',
+    'secondary_hover': '#616161',
+    'secondary_pressed': '#757575',
+    'secondary_disabled_bg': '#2D2D2D',
+    'secondary_disabled_fg': '#757575',
+    'primary_disabled_bg': '#424242',
+    'op_bg': '#2D2D2D',
+    'op_border': '#424242',
+    'op_label': '#E0E0E0',
+    'op_input_bg': '#2D2D2D',
+    'idle': '#E0E0E0',
+}
+
+LIGHT = {
+    'bg': '#F5F5F5',
+    'fg': '#212121',
+    'surface': '#FFFFFF',
+    'border': '#E0E0E0',
+    'input_bg': 'white',
+    'selection': '#E0E0E0',
+    'progress_bg': '#F5F5F5',
+    'group_title': '#2196F3',
+    'button_bg': '#E0E0E0',
+    'button_hover': '#BDBDBD',
+    'button_pressed': '#9E9E9E',
+    'button_disabled_bg': '#F5F5F5',
+    'button_disabled_fg': '#BDBDBD',
+    'secondary_bg': '#E0E0E0',
+    'secondary_fg': '#212121',
+    'secondary_hover': '#BDBDBD',
+    'secondary_pressed': '#9E9E9E',
+    'secondary_disabled_bg': '#F5F5F5',
+    'secondary_disabled_fg': '#BDBDBD',
+    'primary_disabled_bg': '#BDBDBD',
+    'op_bg': '#FFFFFF',
+    'op_border': '#E0E0E0',
+    'op_label': '#424242',
+    'op_input_bg': 'white',
+    'idle': '#757575',
+}
+
+# One stylesheet for the whole application. Widgets opt into variants through
+# object names (#title, #operationGroup) and dynamic properties (variant,
+# state) instead of carrying their own sheets.
+STYLE_TEMPLATE = Template("""
+QWidget {
+    background-color: $bg;
+    color: $fg;
+    font-family: 'Segoe UI', Arial, sans-serif;
+}
+QLabel {
+    color: $fg;
+}
+QLineEdit, QComboBox, QProgressBar, QGroupBox, QTabWidget, QTabBar, QCheckBox {
+    font-family: 'Segoe UI', Arial, sans-serif;
+}
+QLineEdit {
+    padding: 8px;
+    border: 1px solid $border;
+    border-radius: 4px;
+    background-color: $input_bg;
+    color: $fg;
+    min-height: 25px;
+}
+QPlainTextEdit {
+    padding: 4px;
+    border: 1px solid $border;
+    border-radius: 4px;
+    background-color: $input_bg;
+    color: $fg;
+}
+QTableWidget {
+    border: 1px solid $border;
+    background-color: $input_bg;
+    color: $fg;
+    gridline-color: $border;
+}
+QHeaderView::section {
+    background-color: $surface;
+    color: $fg;
+    border: none;
+    border-bottom: 1px solid $border;
+    padding: 4px;
+}
+QComboBox {
+    padding: 8px;
+    border: 1px solid $border;
+    border-radius: 4px;
+    background-color: $input_bg;
+    color: $fg;
+    min-height: 25px;
+}
+QComboBox QAbstractItemView {
+    background-color: $input_bg;
+    color: $fg;
+    selection-background-color: $selection;
+    selection-color: $fg;
+    border: 1px solid $border;
+}
+QProgressBar {
+    border: 1px solid $border;
+    border-radius: 4px;
+    text-align: center;
+    background-color: $progress_bg;
+    color: $fg;
+}
+QProgressBar::chunk {
+    background-color: #2196F3;
+    border-radius: 3px;
+}
+QGroupBox {
+    background-color: $surface;
+    border: 1px solid $border;
+    border-radius: 6px;
+    margin-top: 12px;
+    padding: 12px;
+    color: $fg;
+}
+QGroupBox::title {
+    subcontrol-origin: margin;
+    left: 10px;
+    padding: 0 5px;
+    color: $group_title;
+    font-weight: bold;
+    background: transparent;
+}
+QTabWidget::pane {
+    border: 1px solid $border;
+    background: $bg;
+}
+QTabBar::tab {
+    background: $surface;
+    color: $fg;
+    border: 1px solid $border;
+    border-bottom: none;
+    padding: 8px 16px;
+    min-width: 100px;
+}
+QTabBar::tab:selected {
+    background: $bg;
+    color: $group_title;
+    border-bottom: 2px solid #2196F3;
+}
+QTabBar::tab:!selected {
+    margin-top: 2px;
+}
+QCheckBox {
+    color: $fg;
+    spacing: 8px;
+}
+QCheckBox::indicator {
+    width: 18px;
+    height: 18px;
+    border: 2px solid $border;
+    border-radius: 3px;
+    background-color: $input_bg;
+}
+QCheckBox::indicator:checked {
+    background-color: #2196F3;
+    border-color: #2196F3;
+}
+QPushButton {
+    background-color: $button_bg;
+    color: $fg;
+    border: none;
+    border-radius: 4px;
+    padding: 8px 16px;
+}
+QPushButton:hover {
+    background-color: $button_hover;
+}
+QPushButton:pressed {
+    background-color: $button_pressed;
+}
+QPushButton:disabled {
+    background-color: $button_disabled_bg;
+    color: $button_disabled_fg;
+}
+QPushButton[variant="secondary"] {
+    background-color: $secondary_bg;
+    color: $secondary_fg;
+}
+QPushButton[variant="secondary"]:hover {
+    background-color: $secondary_hover;
+}
+QPushButton[variant="secondary"]:pressed {
+    background-color: $secondary_pressed;
+}
+QPushButton[variant="secondary"]:disabled {
+    background-color: $secondary_disabled_bg;
+    color: $secondary_disabled_fg;
+}
+QPushButton[variant="primary"] {
+    background-color: #2196F3;
+    color: white;
+    font-weight: bold;
+}
+QPushButton[variant="primary"]:hover {
+    background-color: #1976D2;
+}
+QPushButton[variant="primary"]:pressed {
+    background-color: #1565C0;
+}
+QPushButton[variant="primary"]:disabled {
+    background-color: $primary_disabled_bg;
+    color: #757575;
+}
+QGroupBox#operationGroup {
+    background-color: $op_bg;
+    border: 1px solid $op_border;
+}
+QGroupBox#operationGroup::title {
+    color: #2196F3;
+}
+QGroupBox#operationGroup QLabel {
+    color: $op_label;
+}
+QGroupBox#operationGroup QComboBox, QGroupBox#operationGroup QSpinBox, QGroupBox#operationGroup QDoubleSpinBox {
+    padding: 5px;
+    border: 1px solid $op_border;
+    border-radius: 4px;
+    background-color: $op_input_bg;
+    color: $fg;
+    min-height: 25px;
+}
+QGroupBox#operationGroup QComboBox::drop-down {
+    border: none;
+}
+QGroupBox#operationGroup QComboBox::down-arrow {
+    image: none;
+    border: none;
+}
+QGroupBox#operationGroup QComboBox QAbstractItemView {
+    background-color: $op_input_bg;
+    color: $fg;
+    selection-background-color: $op_border;
+    selection-color: $fg;
+    border: 1px solid $op_border;
+}
+QLabel#title {
+    font-size: 24px;
+    font-weight: bold;
+    color: #2196F3;
+    margin-bottom: 10px;
+}
+QLabel[state="idle"] {
+    color: $idle;
+}
+QLabel[state="muted"] {
+    color: #757575;
+}
+QLabel[state="busy"], QLabel[state="accent"] {
+    color: #2196F3;
+}
+QLabel[state="success"] {
+    color: #4CAF50;
+}
+QLabel[state="error"] {
+    color: #F44336;
+}
+QMessageBox {
+    background-color: $bg;
+}
+QMessageBox QLabel {
+    color: $fg;
+}
+""")
+
+# Compiled once at import; switching theme is a single setStyleSheet call
+THEMES = {
+    'dark': STYLE_TEMPLATE.substitute(DARK),
+    'light': STYLE_TEMPLATE.substitute(LIGHT),
+}
+
+
+class ThemeManager(QObject):
+    changed = pyqtSignal(str)
+
+    def __init__(self):
+        super().__init__()
+        self.current = 'dark'
+
+    def apply(self, name=None):
+        name = name or self.current
+        app = QApplication.instance()
+        if app:
+            app.setStyleSheet(THEMES[name])
+        if name != self.current:
+            self.current = name
+            self.changed.emit(name)
+
+    @property
+    def is_dark(self):
+        return self.current == 'dark'
+
+
+_manager = None
+
+
+def theme_manager():
+    global _manager
+    if _manager is None:
+        _manager = ThemeManager()
+    return _manager
+
+
+def set_state(widget, state):
+    # Dynamic properties only take effect after the widget is re-polished
+    if widget.property('state') == state:
+        return
+    widget.setProperty('state', state)
+    widget.style().unpolish(widget)
+    widget.style().polish(widget)
+
+
+class StyledButton(QPushButton):
+    def __init__(self, text, primary=False):
+        super().__init__(text)
+        self.setMinimumHeight(35)
+        self.primary = primary
+        self.setProperty('variant', 'primary' if primary else 'secondary')
@@ -0,0 +1,220 @@
+from collections import OrderedDict
+
+from PyQt6.QtWidgets import QWidget, QScrollArea, QVBoxLayout, QLabel
+from PyQt6.QtCore import Qt, QRect, pyqtSignal
+from PyQt6.QtGui import QColor, QPainter, QPixmap
+
+from probe_cache import file_fingerprint
+from progress_bus import format_eta
+from thumbnails import INTERVALS, THUMB_WIDTH, default_interval, get_thumbnailer
+
+STRIP_HEIGHT = 96
+# Decoded pixmaps kept per strip; the disk cache has the rest
+MEMORY_PIXMAPS = 512
+
+
+class StripCanvas(QWidget):
+    def __init__(self, strip):
+        super().__init__()
+        self.strip = strip
+        self.setFixedHeight(STRIP_HEIGHT)
+
+    def paintEvent(self, event):
+        # Only the exposed slots are drawn, and only those are asked for
+        self.strip.paint(QPainter(self), event.rect())
+
+    def mousePressEvent(self, event):
+        self.strip.pick(event.position().x(), event.modifiers() & Qt.KeyboardModifier.ShiftModifier)
+
+    def wheelEvent(self, event):
+        if event.modifiers() & Qt.KeyboardModifier.ControlModifier:
+            self.strip.zoom(-1 if event.angleDelta().y() > 0 else 1, event.position().x())
+            event.accept()
+        else:
+            event.ignore()
+
+
+class ThumbnailStrip(QWidget):
+    """Keyframe thumbnails along the timeline of the input file, for picking trim points.
+
+    Thumbnails sit on a fixed grid of `interval` seconds and are fetched only
+    for the part of the strip that is on screen: from memory, from the disk
+    cache, or else extracted in the background (see thumbnails.Thumbnailer).
+    Click sets the start, Shift+click the end; Ctrl+wheel zooms.
+    """
+    startPicked = pyqtSignal(float)
+    endPicked = pyqtSignal(float)
+    # Emitted from pool threads; the connection queues it onto the GUI thread
+    thumbnailReady = pyqtSignal(object, float, object)
+
+    def __init__(self, thumbnailer=None):
+        super().__init__()
+        self.thumbnailer = thumbnailer or get_thumbnailer()
+        self.path = None
+        self.fingerprint = None
+        self.duration = 0.0
+        self.interval = INTERVALS[0]
+        self.start = 0.0
+        self.end = None
+        self._pixmaps = OrderedDict()
+        self._failed = set()
+        self._requests = {}
+        self.thumbnailReady.connect(self.thumbnail_ready)
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        self.scroll = QScrollArea()
+        self.scroll.setVerticalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
+        self.scroll.setFixedHeight(STRIP_HEIGHT + self.scroll.horizontalScrollBar().sizeHint().height() + 4)
+        self.canvas = StripCanvas(self)
+        self.scroll.setWidget(self.canvas)
+        self.scroll.horizontalScrollBar().valueChanged.connect(self.drop_hidden)
+        layout.addWidget(self.scroll)
+        self.hint = QLabel("Select an input file to see its timeline")
+        layout.addWidget(self.hint)
+
+    def set_media(self, path, duration):
+        self.cancel_requests()
+        self._pixmaps.clear()
+        self._failed.clear()
+        try:
+            self.fingerprint = file_fingerprint(path) if path and duration else None
+        except OSError:
+            self.fingerprint = None
+        self.path = path if self.fingerprint else None
+        self.duration = duration or 0.0
+        if not self.path:
+            self.hint.setText("No video timeline for this input")
+            self.canvas.setFixedWidth(0)
+            return
+        self.hint.setText("Click: start, Shift+click: end, Ctrl+wheel: zoom")
+        self.set_interval(default_interval(self.duration))
+
+    def set_range(self, start, duration):
+        self.start = start
+        self.end = start + duration if duration else None
+        self.canvas.update()
+
+    def set_interval(self, interval, anchor_x=None):
+        bar = self.scroll.horizontalScrollBar()
+        anchor_x = bar.value() if anchor_x is None else anchor_x
+        anchor_time = self.time_at(anchor_x)
+        offset = anchor_x - bar.value()
+        self.interval = interval
+        self.cancel_requests()
+        self.canvas.setFixedWidth(max(1, self.slot_count() * THUMB_WIDTH))
+        # Keep the time under the cursor where it was
+        bar.setValue(int(self.x_of(anchor_time) - offset))
+        self.canvas.update()
+
+    def zoom(self, step, anchor_x):
+        index = INTERVALS.index(self.interval) + step
+        if 0 <= index < len(INTERVALS) and self.path:
+            self.set_interval(INTERVALS[index], anchor_x)
+
+    def slot_count(self):
+        return int(self.duration // self.interval) + 1 if self.path else 0
+
+    def x_of(self, seconds):
+        return seconds / self.interval * THUMB_WIDTH
+
+    def time_at(self, x):
+        return min(max(x / THUMB_WIDTH * self.interval, 0.0), self.duration)
+
+    def visible_slots(self):
+        left = self.scroll.horizontalScrollBar().value()
+        first = max(0, left // THUMB_WIDTH)
+        last = min(self.slot_count() - 1, (left + self.scroll.viewport().width()) // THUMB_WIDTH)
+        return range(first, last + 1)
+
+    def paint(self, painter, rect):
+        painter.fillRect(rect, QColor('#101010'))
+        if not self.path:
+            painter.end()
+            return
+        first = max(0, rect.left() // THUMB_WIDTH)
+        last = min(self.slot_count() - 1, rect.right() // THUMB_WIDTH)
+        painter.setPen(QColor('#E0E0E0'))
+        for slot in range(first, last + 1):
+            seconds = float(slot * self.interval)
+            cell = QRect(slot * THUMB_WIDTH, 0, THUMB_WIDTH - 2, STRIP_HEIGHT)
+            pixmap = self.pixmap(seconds)
+            if pixmap is not None:
+                scaled = pixmap.scaled(cell.size(), Qt.AspectRatioMode.KeepAspectRatio,
+                                       Qt.TransformationMode.SmoothTransformation)
+                painter.drawPixmap(cell.left() + (cell.width() - scaled.width()) // 2,
+                                   (cell.height() - scaled.height()) // 2, scaled)
+            else:
+                painter.fillRect(cell, QColor('#2D2D2D'))
+            painter.drawText(cell.adjusted(4, 2, 0, 0), Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignTop,
+                             format_eta(seconds))
+        # Shade what the trim leaves out
+        shade = QColor(0, 0, 0, 150)
+        start_x = int(self.x_of(self.start))
+        end_x = int(self.x_of(self.end)) if self.end is not None else self.canvas.width()
+        if start_x > rect.left():
+            painter.fillRect(QRect(rect.left(), 0, start_x - rect.left(), STRIP_HEIGHT), shade)
+        if end_x < rect.right():
+            painter.fillRect(QRect(end_x, 0, rect.right() - end_x + 1, STRIP_HEIGHT), shade)
+        painter.fillRect(QRect(start_x, 0, 2, STRIP_HEIGHT), QColor('#42A5F5'))
+        if self.end is not None:
+            painter.fillRect(QRect(end_x - 2, 0, 2, STRIP_HEIGHT), QColor('#42A5F5'))
+        painter.end()
+
+    def pixmap(self, seconds):
+        pixmap = self._pixmaps.get(seconds)
+        if pixmap is not None:
+            self._pixmaps.move_to_end(seconds)
+            return pixmap
+        if seconds in self._failed or seconds in self._requests:
+            return None
+        image = self.thumbnailer.cached(self.fingerprint, seconds)
+        if image is not None:
+            return self.remember(seconds, image)
+        fingerprint = self.fingerprint
+        self._requests[seconds] = self.thumbnailer.request(
+            self.path, fingerprint, seconds,
+            lambda seconds, image: self.thumbnailReady.emit(fingerprint, seconds, image))
+        return None
+
+    def remember(self, seconds, image):
+        pixmap = QPixmap()
+        if not pixmap.loadFromData(image):
+            self._failed.add(seconds)
+            return None
+        self._pixmaps[seconds] = pixmap
+        while len(self._pixmaps) > MEMORY_PIXMAPS:
+            self._pixmaps.popitem(last=False)
+        return pixmap
+
+    def thumbnail_ready(self, fingerprint, seconds, image):
+        if fingerprint != self.fingerprint:
+            return
+        self._requests.pop(seconds, None)
+        if image is None:
+            self._failed.add(seconds)
+        elif self.remember(seconds, image) is None:
+            return
+        self.canvas.update(QRect(int(self.x_of(seconds)), 0, THUMB_WIDTH, STRIP_HEIGHT))
+
+    def drop_hidden(self):
+        # Extractions queued for slots scrolled out of view would only delay the visible ones
+        visible = {float(slot * self.interval) for slot in self.visible_slots()}
+        for seconds, request in list(self._requests.items()):
+            if seconds not in visible and request.cancel():
+                del self._requests[seconds]
+
+    def cancel_requests(self):
+        # Only withdraws this strip's interest; another strip waiting on the same frame still gets it
+        for request in self._requests.values():
+            request.cancel()
+        self._requests.clear()
+
+    def pick(self, x, end):
+        if not self.path:
+            return
+        seconds = round(self.time_at(x), 3)
+        if end:
+            self.endPicked.emit(seconds)
+        else:
+            self.startPicked.emit(seconds)
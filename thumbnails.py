@@ -0,0 +1,240 @@
+import os
+import sqlite3
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app_paths import cache_dir
+
+THUMB_WIDTH = 160
+# Oldest thumbnails are evicted once the cache holds more than this
+MAX_CACHE_BYTES = 256 * 1024 * 1024
+# Each extraction decodes a single frame, so a few run side by side without starving the UI
+DEFAULT_WORKERS = min(4, os.cpu_count() or 1)
+EXTRACT_TIMEOUT = 30
+# Seconds per thumbnail at each zoom level; the grid is fixed so cached frames line up again
+INTERVALS = (1, 2, 5, 10, 15, 30, 60, 120, 300, 600, 1200)
+# The starting zoom shows at most this many thumbnails for the whole file
+DEFAULT_SLOTS = 60
+
+
+class ThumbnailError(Exception):
+    pass
+
+
+def thumbnail_command(path, timestamp, width=THUMB_WIDTH):
+    return [
+        'ffmpeg', '-hide_banner', '-loglevel', 'error', '-nostdin',
+        # Input seek lands on the keyframe before `timestamp`; decode only that one frame
+        '-skip_frame', 'nokey', '-noaccurate_seek', '-ss', f'{timestamp:.3f}', '-i', path,
+        '-map', '0:v:0', '-an', '-sn', '-frames:v', '1', '-vf', f'scale={width}:-2',
+        '-f', 'image2pipe', '-c:v', 'mjpeg', '-q:v', '5', 'pipe:1',
+    ]
+
+
+def extract_thumbnail(path, timestamp, width=THUMB_WIDTH):
+    """JPEG bytes of the keyframe at or before `timestamp`."""
+    try:
+        result = subprocess.run(thumbnail_command(path, timestamp, width), stdout=subprocess.PIPE,
+                                stderr=subprocess.PIPE, stdin=subprocess.DEVNULL, timeout=EXTRACT_TIMEOUT)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        raise ThumbnailError(f"Could not run ffmpeg: {e}")
+    if result.returncode != 0 or not result.stdout:
+        message = result.stderr.decode('utf-8', 'replace').strip() or "no frame at that time"
+        raise ThumbnailError(f"No thumbnail at {timestamp:.1f}s: {message}")
+    return result.stdout
+
+
+def default_interval(duration):
+    for interval in INTERVALS:
+        if duration / interval <= DEFAULT_SLOTS:
+            return interval
+    return INTERVALS[-1]
+
+
+class ThumbnailCache:
+    """JPEG thumbnails in SQLite, keyed by file fingerprint and timestamp.
+
+    Like the probe cache, a file that changed on disk simply misses. Reads
+    refresh an entry's last use; once the stored images grow past `max_bytes`
+    the least recently used ones are evicted until a tenth is free again.
+    """
+
+    def __init__(self, db_path=None, max_bytes=MAX_CACHE_BYTES):
+        self.db_path = db_path or os.path.join(cache_dir(), 'thumbnails.sqlite3')
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS thumbnails (
+                    path TEXT NOT NULL,
+                    time_ms INTEGER NOT NULL,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    image BLOB NOT NULL,
+                    last_used REAL NOT NULL,
+                    PRIMARY KEY (path, time_ms)
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS thumbnails_last_used ON thumbnails (last_used)")
+        self._total = self._conn.execute("SELECT COALESCE(SUM(LENGTH(image)), 0) FROM thumbnails").fetchone()[0]
+
+    def get(self, fingerprint, timestamp):
+        path, size, mtime_ns = fingerprint
+        time_ms = int(round(timestamp * 1000))
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT image FROM thumbnails WHERE path = ? AND time_ms = ? AND size = ? AND mtime_ns = ?",
+                (path, time_ms, size, mtime_ns)).fetchone()
+            if row is None:
+                return None
+            with self._conn:
+                self._conn.execute("UPDATE thumbnails SET last_used = ? WHERE path = ? AND time_ms = ?",
+                                   (time.time(), path, time_ms))
+        return bytes(row[0])
+
+    def put(self, fingerprint, timestamp, image):
+        path, size, mtime_ns = fingerprint
+        time_ms = int(round(timestamp * 1000))
+        with self._lock, self._conn:
+            old = self._conn.execute("SELECT LENGTH(image) FROM thumbnails WHERE path = ? AND time_ms = ?",
+                                     (path, time_ms)).fetchone()
+            # Replaces the thumbnail of a previous version of the file
+            self._conn.execute(
+                "INSERT OR REPLACE INTO thumbnails (path, time_ms, size, mtime_ns, image, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (path, time_ms, size, mtime_ns, sqlite3.Binary(image), time.time()))
+            self._total += len(image) - (old[0] if old else 0)
+            if self._total > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        # Called with the lock held
+        target = self.max_bytes * 0.9
+        doomed = []
+        for rowid, length in self._conn.execute(
+                "SELECT rowid, LENGTH(image) FROM thumbnails ORDER BY last_used"):
+            if self._total <= target:
+                break
+            doomed.append((rowid,))
+            self._total -= length
+        self._conn.executemany("DELETE FROM thumbnails WHERE rowid = ?", doomed)
+
+    @property
+    def total_bytes(self):
+        with self._lock:
+            return self._total
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM thumbnails")
+            self._total = 0
+
+
+class ThumbnailRequest:
+    """One caller's interest in a (possibly shared) extraction; see Thumbnailer.request."""
+
+    def __init__(self, thumbnailer, key, timestamp, callback):
+        self.thumbnailer = thumbnailer
+        self.key = key
+        self.timestamp = timestamp
+        self.callback = callback
+        self.cancelled = False
+
+    def cancel(self):
+        """Withdraw this request; False once its extraction is running and the callback will still come."""
+        return self.thumbnailer._release(self)
+
+    def _deliver(self, future):
+        if not self.cancelled and not future.cancelled():
+            self.callback(self.timestamp, future.result())
+
+
+class Thumbnailer:
+    """Thumbnails from the disk cache, or extracted on a small background pool.
+
+    `request` returns at once: the callback gets (timestamp, jpeg bytes), or
+    (timestamp, None) when the frame could not be extracted, on a pool
+    thread. Requests for the same frame share one extraction, which is only
+    cancelled once every request sharing it has been cancelled (scrolled out
+    of view) while it is still queued.
+    """
+
+    def __init__(self, cache=None, workers=DEFAULT_WORKERS, extractor=extract_thumbnail):
+        self.cache = cache
+        self.extractor = extractor
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='thumbnail')
+        # key -> [future, requests still waiting on it]
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def cached(self, fingerprint, timestamp):
+        return self.cache.get(fingerprint, timestamp) if self.cache else None
+
+    def request(self, path, fingerprint, timestamp, callback):
+        key = (fingerprint, timestamp)
+        request = ThumbnailRequest(self, key, timestamp, callback)
+        with self._lock:
+            entry = self._pending.get(key)
+            if entry is None:
+                future = self._pool.submit(self._make, path, fingerprint, timestamp)
+                entry = self._pending[key] = [future, 0]
+                future.add_done_callback(lambda f, key=key: self._done(key, f))
+            entry[1] += 1
+        entry[0].add_done_callback(request._deliver)
+        return request
+
+    def _release(self, request):
+        with self._lock:
+            if request.cancelled:
+                return True
+            entry = self._pending.get(request.key)
+            if entry is None or entry[0].running() or entry[0].done():
+                return False
+            request.cancelled = True
+            entry[1] -= 1
+            last = entry[1] == 0
+        if last:
+            # Outside the lock: cancelling runs the done callbacks, and _done takes it again
+            entry[0].cancel()
+        return True
+
+    def _done(self, key, future):
+        with self._lock:
+            entry = self._pending.get(key)
+            if entry is not None and entry[0] is future:
+                del self._pending[key]
+
+    def _make(self, path, fingerprint, timestamp):
+        image = self.cached(fingerprint, timestamp)
+        if image is not None:
+            return image
+        try:
+            image = self.extractor(path, timestamp)
+        except ThumbnailError:
+            return None
+        if self.cache:
+            self.cache.put(fingerprint, timestamp, image)
+        return image
+
+    def close(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+_thumbnailer = None
+_thumbnailer_lock = threading.Lock()
+
+
+def get_thumbnailer():
+    # Shared instance; without a usable cache directory thumbnails are only kept in memory by the strip
+    global _thumbnailer
+    with _thumbnailer_lock:
+        if _thumbnailer is None:
+            try:
+                cache = ThumbnailCache()
+            except (OSError, sqlite3.Error):
+                cache = None
+            _thumbnailer = Thumbnailer(cache)
+    return _thumbnailer
@@ -1,505 +1,43 @@
-import yt_dlp
-import subprocess
+import os
+import threading
 from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLineEdit,
                             QPushButton, QComboBox, QProgressBar, QLabel,
-                            QFileDialog, QMessageBox, QGroupBox, QCheckBox, QApplication, QTabWidget)
-from PyQt6.QtCore import QThread, pyqtSignal, Qt
+                            QFileDialog, QMessageBox, QGroupBox, QCheckBox, QApplication, QTabWidget,
+                            QPlainTextEdit, QSpinBox, QDoubleSpinBox, QTableWidget, QTableWidgetItem, QHeaderView)
+from PyQt6.QtCore import QTimer, Qt
 from PyQt6.QtGui import QFont, QIcon, QPalette, QColor
+from download_engine import QUALITY_CHOICES
+from download_manager import (DownloadManager, parse_url_list, load_url_file,
+                              DEFAULT_CONCURRENCY, DEFAULT_PER_HOST, DONE, FAILED, CANCELLED, SKIPPED)
+from progress_bus import progress_bus, format_eta, format_rate
+from bandwidth import get_bandwidth_scheduler
+from theme import StyledButton, theme_manager, set_state
 
-def check_gpu_availability():
-    try:
-        # Check if nvidia-smi is available
-        result = subprocess.run(['nvidia-smi'], capture_output=True, text=True)
-        return result.returncode == 0
-    except:
-        return False
-
-class StyledButton(QPushButton):
-    def __init__(self, text, primary=False, is_dark_mode=True):
-        super().__init__(text)
-        self.setMinimumHeight(35)
-        self.is_dark_mode = is_dark_mode
-        self.primary = primary
-        self.apply_theme()
-
-    def apply_theme(self):
-        if self.is_dark_mode:
-            if self.primary:
-                self.setStyleSheet("""
-                    QPushButton {
-                        background-color: #2196F3;
-                        color: white;
-                        border: none;
-                        border-radius: 4px;
-                        padding: 8px 16px;
-                        font-weight: bold;
-                    }
-                    QPushButton:hover {
-                        background-color: #1976D2;
-                    }
-                    QPushButton:pressed {
-                        background-color: #1565C0;
-                    }
-                    QPushButton:disabled {
-                        background-color: #424242;
-                        color: #757575;
-                    }
-                """)
-            else:
-                self.setStyleSheet("""
-                    QPushButton {
-                        background-color: #424242;
-                        color: #E0E0E0;
-                        border: none;
-                        border-radius: 4px;
-                        padding: 8px 16px;
-                    }
-                    QPushButton:hover {
-                        background-color: #616161;
-                    }
-                    QPushButton:pressed {
-                        background-color: #757575;
-                    }
-                    QPushButton:disabled {
-                        background-color: #2D2D2D;
-                        color: #757575;
-                    }
-                """)
-        else:
-            if self.primary:
-                self.setStyleSheet("""
-                    QPushButton {
-                        background-color: #2196F3;
-                        color: white;
-                        border: none;
-                        border-radius: 4px;
-                        padding: 8px 16px;
-                        font-weight: bold;
-                    }
-                    QPushButton:hover {
-                        background-color: #1976D2;
-                    }
-                    QPushButton:pressed {
-                        background-color: #1565C0;
-                    }
-                    QPushButton:disabled {
-                        background-color: #BDBDBD;
-                        color: #757575;
-                    }
-                """)
-            else:
-                self.setStyleSheet("""
-                    QPushButton {
-                        background-color: #E0E0E0;
-                        color: #212121;
-                        border: none;
-                        border-radius: 4px;
-                        padding: 8px 16px;
-                    }
-                    QPushButton:hover {
-                        background-color: #BDBDBD;
-                    }
-                    QPushButton:pressed {
-                        background-color: #9E9E9E;
-                    }
-                    QPushButton:disabled {
-                        background-color: #F5F5F5;
-                        color: #BDBDBD;
-                    }
-                """)
-
-class DownloadWorker(QThread):
-    progress = pyqtSignal(dict)
-    finished = pyqtSignal()
-    error = pyqtSignal(str)
-
-    def __init__(self, url, output_path, format_choice):
-        super().__init__()
-        self.url = url
-        self.output_path = output_path
-        self.format_choice = format_choice
-        self.has_gpu = check_gpu_availability()
-
-    def get_ffmpeg_args(self):
-        if self.has_gpu:
-            # GPU encoding settings using NVENC
-            return [
-                '-c:v', 'h264_nvenc',  # Use NVIDIA GPU encoder
-                '-preset', 'p4',       # Balanced preset
-                '-tune', 'hq',         # High quality tuning
-                '-rc', 'vbr',          # Variable bitrate
-                '-cq', '19',           # Quality level (lower is better, 19 is visually lossless)
-                '-b:v', '0',           # Let the quality parameter control the bitrate
-                '-c:a', 'aac',
-                '-b:a', '192k'
-            ]
-        else:
-            # CPU encoding settings
-            return [
-                '-c:v', 'libx264',
-                '-preset', 'medium',   # Balanced preset
-                '-crf', '18',          # Quality level (lower is better, 18 is visually lossless)
-                '-c:a', 'aac',
-                '-b:a', '192k'
-            ]
-
-    def run(self):
-        try:
-            # Base options
-            ydl_opts = {
-                'format': 'bestvideo[height>=2160][ext=mp4]+bestaudio[ext=m4a]/bestvideo[height>=1440][ext=mp4]+bestaudio[ext=m4a]/bestvideo[height>=1080][ext=mp4]+bestaudio[ext=m4a]/bestvideo[height>=720][ext=mp4]+bestaudio[ext=m4a]/bestvideo[ext=mp4]+bestaudio[ext=m4a]/bestvideo+bestaudio/best',
-                'outtmpl': f'{self.output_path}/%(title)s.%(ext)s',
-                'progress_hooks': [self.progress_hook],
-                'nocheckcertificate': True,
-                'ignoreerrors': True,
-                'no_warnings': True,
-                'quiet': True,
-                'extract_flat': False,
-                'force_generic_extractor': False,
-                'socket_timeout': 30,
-                'retries': 10,
-                'fragment_retries': 10,
-                'skip_download_archive': True,
-                'extractor_args': {
-                    'youtube': {
-                        'player_client': ['android', 'web', 'mweb', 'tv_embedded'],
-                        'player_skip': ['webpage', 'configs'],
-                    }
-                },
-                'postprocessors': [{
-                    'key': 'FFmpegVideoConvertor',
-                    'preferedformat': 'mp4',
-                }],
-                'merge_output_format': 'mp4',
-                'prefer_ffmpeg': True,
-                'keepvideo': False,
-                'writethumbnail': False,
-                'writesubtitles': False,
-                'writeautomaticsub': False,
-                'postprocessor_args': self.get_ffmpeg_args(),
-                'geo_bypass': True,
-                'geo_verification_proxy': None,
-                'geo_bypass_country': None,
-                'geo_bypass_ip_block': None,
-                'extractor_retries': 5,
-                'http_headers': {
-                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-                    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-                    'Accept-Language': 'en-us,en;q=0.5',
-                    'Sec-Fetch-Mode': 'navigate',
-                }
-            }
-
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                try:
-                    # First try to extract video info
-                    info = ydl.extract_info(self.url, download=False)
-                    if info:
-                        # Check available formats
-                        formats = info.get('formats', [])
-                        if formats:
-                            # Log available formats for debugging
-                            print("\nAvailable formats:")
-                            for f in formats:
-                                if f.get('height'):
-                                    print(f"Format: {f.get('format_id')} - Resolution: {f.get('height')}p - Ext: {f.get('ext')} - Filesize: {f.get('filesize', 'N/A')}")
-                            
-                            # Find the best format based on user selection
-                            format_choice = self.format_choice
-                            if "Full Resolution" in format_choice:
-                                # Already using best format
-                                pass
-                            elif "1080p" in format_choice:
-                                ydl_opts['format'] = 'bestvideo[height<=1080][ext=mp4]+bestaudio[ext=m4a]/best[height<=1080]'
-                            elif "720p" in format_choice:
-                                ydl_opts['format'] = 'bestvideo[height<=720][ext=mp4]+bestaudio[ext=m4a]/best[height<=720]'
-                            elif "480p" in format_choice:
-                                ydl_opts['format'] = 'bestvideo[height<=480][ext=mp4]+bestaudio[ext=m4a]/best[height<=480]'
-                            elif "Audio Only" in format_choice:
-                                ydl_opts['format'] = 'bestaudio[ext=m4a]/bestaudio'
-                        
-                        # If info extraction succeeds, proceed with download
-                        ydl.download([self.url])
-                        self.finished.emit()
-                        return
-                except Exception as e:
-                    # If info extraction fails, try direct download with different format
-                    try:
-                        # Try with a more specific format string
-                        ydl_opts['format'] = 'bestvideo[height>=720]+bestaudio/best[height>=720]/best'
-                        with yt_dlp.YoutubeDL(ydl_opts) as ydl2:
-                            ydl2.download([self.url])
-                        self.finished.emit()
-                        return
-                    except Exception as e2:
-                        raise e2
-
-        except Exception as e:
-            self.error.emit(str(e))
-
-    def progress_hook(self, d):
-        if d['status'] == 'downloading':
-            self.progress.emit(d)
-
-DARK_STYLE = """
-QWidget {
-    background-color: #181818;
-    color: #E0E0E0;
-    font-family: 'Segoe UI', Arial, sans-serif;
-}
-QLabel {
-    color: #E0E0E0;
-}
-QLineEdit, QComboBox, QProgressBar, QGroupBox, QTabWidget, QTabBar, QCheckBox {
-    font-family: 'Segoe UI', Arial, sans-serif;
-}
-QLineEdit {
-    padding: 8px;
-    border: 1px solid #333;
-    border-radius: 4px;
-    background-color: #232323;
-    color: #E0E0E0;
-    min-height: 25px;
-}
-QComboBox {
-    padding: 8px;
-    border: 1px solid #333;
-    border-radius: 4px;
-    background-color: #232323;
-    color: #E0E0E0;
-    min-height: 25px;
-}
-QComboBox QAbstractItemView {
-    background-color: #232323;
-    color: #E0E0E0;
-    selection-background-color: #333;
-    selection-color: #E0E0E0;
-    border: 1px solid #333;
-}
-QProgressBar {
-    border: 1px solid #333;
-    border-radius: 4px;
-    text-align: center;
-    background-color: #232323;
-    color: #E0E0E0;
-}
-QProgressBar::chunk {
-    background-color: #2196F3;
-    border-radius: 3px;
-}
-QGroupBox {
-    background-color: #232323;
-    border: 1px solid #333;
-    border-radius: 6px;
-    margin-top: 12px;
-    padding: 12px;
-    color: #E0E0E0;
-}
-QGroupBox::title {
-    subcontrol-origin: margin;
-    left: 10px;
-    padding: 0 5px;
-    color: #42A5F5;
-    font-weight: bold;
-    background: transparent;
-}
-QTabWidget::pane {
-    border: 1px solid #333;
-    background: #181818;
-}
-QTabBar::tab {
-    background: #232323;
-    color: #E0E0E0;
-    border: 1px solid #333;
-    border-bottom: none;
-    padding: 8px 16px;
-    min-width: 100px;
-}
-QTabBar::tab:selected {
-    background: #181818;
-    color: #42A5F5;
-    border-bottom: 2px solid #2196F3;
-}
-QTabBar::tab:!selected {
-    margin-top: 2px;
-}
-QCheckBox {
-    color: #E0E0E0;
-    spacing: 8px;
-}
-QCheckBox::indicator {
-    width: 18px;
-    height: 18px;
-    border: 2px solid #333;
-    border-radius: 3px;
-    background-color: #232323;
-}
-QCheckBox::indicator:checked {
-    background-color: #2196F3;
-    border-color: #2196F3;
-}
-QPushButton {
-    background-color: #232323;
-    color: #E0E0E0;
-    border: none;
-    border-radius: 4px;
-    padding: 8px 16px;
-}
-QPushButton:hover {
-    background-color: #333;
-}
-QPushButton:pressed {
-    background-color: #444;
-}
-QPushButton:disabled {
-    background-color: #232323;
-    color: #757575;
-}
-QMessageBox {
-    background-color: #181818;
-}
-QMessageBox QLabel {
-    color: #E0E0E0;
-}
-"""
-
-LIGHT_STYLE = """
-QWidget {
-    background-color: #F5F5F5;
-    color: #212121;
-    font-family: 'Segoe UI', Arial, sans-serif;
-}
-QLabel {
-    color: #212121;
-}
-QLineEdit, QComboBox, QProgressBar, QGroupBox, QTabWidget, QTabBar, QCheckBox {
-    font-family: 'Segoe UI', Arial, sans-serif;
-}
-QLineEdit {
-    padding: 8px;
-    border: 1px solid #E0E0E0;
-    border-radius: 4px;
-    background-color: white;
-    color: #212121;
-    min-height: 25px;
-}
-QComboBox {
-    padding: 8px;
-    border: 1px solid #E0E0E0;
-    border-radius: 4px;
-    background-color: white;
-    color: #212121;
-    min-height: 25px;
-}
-QComboBox QAbstractItemView {
-    background-color: white;
-    color: #212121;
-    selection-background-color: #E0E0E0;
-    selection-color: #212121;
-    border: 1px solid #E0E0E0;
-}
-QProgressBar {
-    border: 1px solid #E0E0E0;
-    border-radius: 4px;
-    text-align: center;
-    background-color: #F5F5F5;
-    color: #212121;
-}
-QProgressBar::chunk {
-    background-color: #2196F3;
-    border-radius: 3px;
-}
-QGroupBox {
-    background-color: #FFFFFF;
-    border: 1px solid #E0E0E0;
-    border-radius: 6px;
-    margin-top: 12px;
-    padding: 12px;
-    color: #212121;
-}
-QGroupBox::title {
-    subcontrol-origin: margin;
-    left: 10px;
-    padding: 0 5px;
-    color: #2196F3;
-    font-weight: bold;
-    background: transparent;
-}
-QTabWidget::pane {
-    border: 1px solid #E0E0E0;
-    background: #F5F5F5;
-}
-QTabBar::tab {
-    background: #FFFFFF;
-    color: #212121;
-    border: 1px solid #E0E0E0;
-    border-bottom: none;
-    padding: 8px 16px;
-    min-width: 100px;
-}
-QTabBar::tab:selected {
-    background: #F5F5F5;
-    color: #2196F3;
-    border-bottom: 2px solid #2196F3;
-}
-QTabBar::tab:!selected {
-    margin-top: 2px;
-}
-QCheckBox {
-    color: #212121;
-    spacing: 8px;
-}
-QCheckBox::indicator {
-    width: 18px;
-    height: 18px;
-    border: 2px solid #E0E0E0;
-    border-radius: 3px;
-    background-color: white;
-}
-QCheckBox::indicator:checked {
-    background-color: #2196F3;
-    border-color: #2196F3;
-}
-QPushButton {
-    background-color: #E0E0E0;
-    color: #212121;
-    border: none;
-    border-radius: 4px;
-    padding: 8px 16px;
-}
-QPushButton:hover {
-    background-color: #BDBDBD;
-}
-QPushButton:pressed {
-    background-color: #9E9E9E;
-}
-QPushButton:disabled {
-    background-color: #F5F5F5;
-    color: #BDBDBD;
-}
-QMessageBox {
-    background-color: #F5F5F5;
-}
-QMessageBox QLabel {
-    color: #212121;
-}
-"""
+def publish_task(task):
+    # Called from the manager's worker threads; the bus only keeps the latest numbers
+    if task is None:
+        return
+    status = task.state if task.attempts <= 1 or task.state == DONE else f"{task.state} (try {task.attempts})"
+    if task.state == FAILED and task.error:
+        status = f"failed: {task.error}"
+    progress_bus().publish(f'download-{task.id}', 'download', 'downloads', label=task.title or task.url,
+                           status=status, done=task.downloaded_bytes, total=task.total_bytes,
+                           finished=task.state in (DONE, FAILED, CANCELLED, SKIPPED))
 
 class YouTubeDownloader(QWidget):
     def __init__(self):
         super().__init__()
-        self.is_dark_mode = True
+        # The application stylesheet is applied once at startup, not per tab
+        self.theme = theme_manager()
+        self.manager = None
+        self.rows = {}
+        self.bus = progress_bus()
+        # The table is refreshed at the bus rate however many downloads report progress
+        self.poll_timer = QTimer(self)
+        self.poll_timer.setInterval(self.bus.interval_ms)
+        self.poll_timer.timeout.connect(self.update_progress)
         self.init_ui()
-        self.apply_theme()
-
-    def apply_theme(self):
-        app = QApplication.instance()
-        if self.is_dark_mode:
-            if app:
-                app.setStyleSheet(DARK_STYLE)
-        else:
-            if app:
-                app.setStyleSheet(LIGHT_STYLE)
+        self.theme.changed.connect(self.sync_theme_switch)
 
     def init_ui(self):
         layout = QVBoxLayout(self)
@@ -509,27 +47,26 @@ class YouTubeDownloader(QWidget):
         # Title and theme switcher
         title_layout = QHBoxLayout()
         title = QLabel("YouTube Video Downloader")
-        title.setStyleSheet("""
-            font-size: 24px;
-            font-weight: bold;
-            color: #2196F3;
-            margin-bottom: 10px;
-        """)
+        title.setObjectName('title')
         title_layout.addWidget(title)
         
         # Theme switcher
         self.theme_switch = QCheckBox("Light Mode")
-        self.theme_switch.setChecked(not self.is_dark_mode)
+        self.theme_switch.setChecked(not self.theme.is_dark)
         self.theme_switch.stateChanged.connect(self.toggle_theme)
         title_layout.addWidget(self.theme_switch, alignment=Qt.AlignmentFlag.AlignRight)
         layout.addLayout(title_layout)
 
         # URL input group
-        url_group = QGroupBox("Video URL")
+        url_group = QGroupBox("Video URLs")
         url_layout = QVBoxLayout()
-        self.url_input = QLineEdit()
-        self.url_input.setPlaceholderText("Enter YouTube URL")
+        self.url_input = QPlainTextEdit()
+        self.url_input.setPlaceholderText("Enter one or more YouTube URLs (one per line)")
+        self.url_input.setFixedHeight(80)
         url_layout.addWidget(self.url_input)
+        self.load_button = StyledButton("Load URL List...")
+        self.load_button.clicked.connect(self.load_url_list)
+        url_layout.addWidget(self.load_button)
         url_group.setLayout(url_layout)
         layout.addWidget(url_group)
 
@@ -537,42 +74,97 @@ class YouTubeDownloader(QWidget):
         quality_group = QGroupBox("Quality Settings")
         quality_layout = QVBoxLayout()
         self.format_combo = QComboBox()
-        self.format_combo.addItems([
-            "Best Quality (Full Resolution)",
-            "High Quality (up to 1080p)",
-            "Medium Quality (up to 720p)",
-            "Low Quality (up to 480p)",
-            "Audio Only"
-        ])
+        self.format_combo.addItems(QUALITY_CHOICES)
         quality_layout.addWidget(self.format_combo)
+        self.normalize_check = QCheckBox("Re-encode to H.264/AAC (slow; by default streams are only remuxed)")
+        quality_layout.addWidget(self.normalize_check)
+        limits_layout = QHBoxLayout()
+        limits_layout.addWidget(QLabel("Parallel downloads:"))
+        self.concurrency_spin = QSpinBox()
+        self.concurrency_spin.setRange(1, 16)
+        self.concurrency_spin.setValue(DEFAULT_CONCURRENCY)
+        self.concurrency_spin.valueChanged.connect(self.update_limits)
+        limits_layout.addWidget(self.concurrency_spin)
+        limits_layout.addWidget(QLabel("Per site:"))
+        self.per_host_spin = QSpinBox()
+        self.per_host_spin.setRange(1, 8)
+        self.per_host_spin.setValue(DEFAULT_PER_HOST)
+        self.per_host_spin.valueChanged.connect(self.update_limits)
+        limits_layout.addWidget(self.per_host_spin)
+        limits_layout.addWidget(QLabel("Max total speed:"))
+        self.limit_spin = QDoubleSpinBox()
+        self.limit_spin.setRange(0, 1000)
+        self.limit_spin.setSingleStep(0.5)
+        self.limit_spin.setSuffix(" MB/s")
+        self.limit_spin.setSpecialValueText("unlimited")
+        # Applies to downloads already running as well
+        self.limit_spin.valueChanged.connect(lambda value: get_bandwidth_scheduler().set_limit(value * 1024 * 1024))
+        limits_layout.addWidget(self.limit_spin)
+        quality_layout.addLayout(limits_layout)
+        playlist_layout = QHBoxLayout()
+        self.playlist_check = QCheckBox("Expand playlists and channels")
+        self.playlist_check.setChecked(True)
+        playlist_layout.addWidget(self.playlist_check)
+        playlist_layout.addWidget(QLabel("Items:"))
+        self.playlist_start = QSpinBox()
+        self.playlist_start.setRange(1, 1000000)
+        playlist_layout.addWidget(self.playlist_start)
+        playlist_layout.addWidget(QLabel("to"))
+        self.playlist_end = QSpinBox()
+        self.playlist_end.setRange(0, 1000000)
+        self.playlist_end.setSpecialValueText("last")
+        playlist_layout.addWidget(self.playlist_end)
+        playlist_layout.addWidget(QLabel("Limit:"))
+        self.playlist_limit = QSpinBox()
+        self.playlist_limit.setRange(0, 1000000)
+        self.playlist_limit.setSpecialValueText("none")
+        playlist_layout.addWidget(self.playlist_limit)
+        quality_layout.addLayout(playlist_layout)
         quality_group.setLayout(quality_layout)
         layout.addWidget(quality_group)
 
         # Output directory group
         dir_group = QGroupBox("Output Settings")
         dir_layout = QVBoxLayout()
-        self.dir_button = StyledButton("Select Output Directory", is_dark_mode=self.is_dark_mode)
+        self.dir_button = StyledButton("Select Output Directory")
         self.dir_button.clicked.connect(self.select_directory)
         self.dir_label = QLabel("No directory selected")
-        self.dir_label.setStyleSheet("color: #757575;" if not self.is_dark_mode else "color: #E0E0E0;")
+        set_state(self.dir_label, 'idle')
         dir_layout.addWidget(self.dir_button)
         dir_layout.addWidget(self.dir_label)
         dir_group.setLayout(dir_layout)
         layout.addWidget(dir_group)
 
         # Download button
-        self.download_button = StyledButton("Download", primary=True, is_dark_mode=self.is_dark_mode)
+        self.download_button = StyledButton("Download", primary=True)
         self.download_button.clicked.connect(self.start_download)
         layout.addWidget(self.download_button)
 
+        control_layout = QHBoxLayout()
+        self.pause_button = StyledButton("Pause")
+        self.pause_button.setCheckable(True)
+        self.pause_button.toggled.connect(self.toggle_pause)
+        control_layout.addWidget(self.pause_button)
+        self.cancel_button = StyledButton("Cancel All")
+        self.cancel_button.clicked.connect(self.cancel_downloads)
+        control_layout.addWidget(self.cancel_button)
+        self.set_controls_enabled(False)
+        layout.addLayout(control_layout)
+
         # Progress group
         progress_group = QGroupBox("Progress")
         progress_layout = QVBoxLayout()
         self.progress_bar = QProgressBar()
         self.progress_bar.setMinimumHeight(25)
         progress_layout.addWidget(self.progress_bar)
+        self.jobs_table = QTableWidget(0, 4)
+        self.jobs_table.setHorizontalHeaderLabels(["URL", "Status", "Progress", "Speed"])
+        self.jobs_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
+        self.jobs_table.verticalHeader().setVisible(False)
+        self.jobs_table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        progress_layout.addWidget(self.jobs_table)
         self.status_label = QLabel("Ready")
-        self.status_label.setStyleSheet("color: #757575;" if not self.is_dark_mode else "color: #E0E0E0;")
+        set_state(self.status_label, 'idle')
         progress_layout.addWidget(self.status_label)
         progress_group.setLayout(progress_layout)
         layout.addWidget(progress_group)
@@ -580,34 +172,82 @@ class YouTubeDownloader(QWidget):
         self.output_directory = None
 
     def toggle_theme(self, state):
-        self.is_dark_mode = not state
-        self.apply_theme()
-        
-        # Update buttons
-        self.dir_button.is_dark_mode = self.is_dark_mode
-        self.dir_button.apply_theme()
-        self.download_button.is_dark_mode = self.is_dark_mode
-        self.download_button.apply_theme()
-        
-        # Update status label colors
-        if self.status_label.text() == "Ready":
-            self.status_label.setStyleSheet("color: #757575;" if not self.is_dark_mode else "color: #E0E0E0;")
-        elif "Downloading" in self.status_label.text():
-            self.status_label.setStyleSheet("color: #2196F3;")
-        elif "completed" in self.status_label.text().lower():
-            self.status_label.setStyleSheet("color: #4CAF50;")
-        elif "Error" in self.status_label.text():
-            self.status_label.setStyleSheet("color: #F44336;")
+        self.theme.apply('light' if state else 'dark')
+
+    def sync_theme_switch(self, name):
+        self.theme_switch.blockSignals(True)
+        self.theme_switch.setChecked(name == 'light')
+        self.theme_switch.blockSignals(False)
 
     def select_directory(self):
         directory = QFileDialog.getExistingDirectory(self, "Select Output Directory")
         if directory:
             self.output_directory = directory
             self.dir_label.setText(directory)
-            self.dir_label.setStyleSheet("color: #2196F3;")
+            set_state(self.dir_label, 'accent')
+
+    def load_url_list(self):
+        path, _ = QFileDialog.getOpenFileName(self, "Load URL List", "", "Text Files (*.txt);;All Files (*)")
+        if not path:
+            return
+        try:
+            urls = load_url_file(path)
+        except (OSError, UnicodeDecodeError) as e:
+            QMessageBox.warning(self, "Error", f"Could not read {path}: {e}")
+            return
+        existing = self.url_input.toPlainText().strip()
+        self.url_input.setPlainText('\n'.join(filter(None, [existing, *urls])))
+
+    def update_limits(self):
+        if self.manager:
+            self.manager.set_limits(self.concurrency_spin.value(), self.per_host_spin.value())
+
+    def set_controls_enabled(self, enabled):
+        if not enabled:
+            self.pause_button.setChecked(False)
+        self.pause_button.setEnabled(enabled)
+        self.cancel_button.setEnabled(enabled)
+
+    def toggle_pause(self, paused):
+        if not self.manager:
+            return
+        # Paused downloads hold their connection; paused merges and conversions are suspended
+        if paused:
+            self.manager.pause()
+        else:
+            self.manager.resume()
+        self.pause_button.setText("Resume" if paused else "Pause")
+
+    def cancel_downloads(self):
+        if self.manager:
+            self.status_label.setText("Cancelling...")
+            set_state(self.status_label, 'busy')
+            # .part files stay behind, so adding the same URLs again resumes them; stopping
+            # conversions can take a few seconds, so not on the GUI thread
+            threading.Thread(target=self._cancel_all, args=(self.manager,), daemon=True).start()
+            self.pause_button.blockSignals(True)
+            self.pause_button.setChecked(False)
+            self.pause_button.setText("Pause")
+            self.pause_button.blockSignals(False)
+
+    @staticmethod
+    def _cancel_all(manager):
+        manager.cancel()
+        # Otherwise the next batch would wait behind the pause
+        manager.resume()
+
+    def shutdown(self, timeout=10.0):
+        """Stop every download and give them `timeout` seconds to wind down; for closing the window."""
+        self.poll_timer.stop()
+        if self.manager:
+            # Interrupted rather than cancelled: the next start offers to resume them
+            self.manager.cancel(interrupt=True)
+            self.manager.wait(timeout)
+            self.manager.close()
 
     def start_download(self):
-        if not self.url_input.text():
+        urls = parse_url_list(self.url_input.toPlainText())
+        if not urls:
             QMessageBox.warning(self, "Error", "Please enter a YouTube URL")
             return
         
@@ -615,33 +255,78 @@ class YouTubeDownloader(QWidget):
             QMessageBox.warning(self, "Error", "Please select an output directory")
             return
 
-        self.download_button.setEnabled(False)
-        self.worker = DownloadWorker(
-            self.url_input.text(),
-            self.output_directory,
-            self.format_combo.currentText()
-        )
-        self.worker.progress.connect(self.update_progress)
-        self.worker.finished.connect(self.download_finished)
-        self.worker.error.connect(self.download_error)
-        self.worker.start()
+        if self.manager is None:
+            self.manager = DownloadManager(self.concurrency_spin.value(), self.per_host_spin.value(),
+                                           on_update=publish_task)
+        # The button stays enabled: more URLs can be queued while others download
+        self.url_input.clear()
+        self.set_controls_enabled(True)
+        self.poll_timer.start()
+        output_dir = os.path.abspath(self.output_directory)
+        quality = self.format_combo.currentText()
+        normalize = self.normalize_check.isChecked()
+        if not self.playlist_check.isChecked():
+            self.manager.add_many(urls, output_dir, quality, normalize)
+            return
+        # Playlists are listed in the background; their first videos start while the rest is still listing
+        for url in urls:
+            self.manager.add_source(url, output_dir, quality, self.playlist_start.value(),
+                                    self.playlist_end.value() or None, self.playlist_limit.value() or None,
+                                    normalize)
+        self.status_label.setText("Listing videos...")
+        set_state(self.status_label, 'busy')
+
+    def update_progress(self):
+        for job in self.bus.take('downloads'):
+            self.update_row(job)
+        stats = self.manager.stats()
+        finished = stats['done'] + stats['failed'] + stats['cancelled'] + stats['skipped']
+        self.progress_bar.setValue(int(finished / stats['total'] * 100) if stats['total'] else 0)
+        # A task's final state reaches the bus just after the manager counts it
+        if self.manager.idle and not self.bus.pending('downloads'):
+            self.poll_timer.stop()
+            self.set_controls_enabled(False)
+            self.download_finished(stats)
+            return
+        if self.manager.paused:
+            self.status_label.setText(f"Paused: {finished}/{stats['total']} finished, {stats['active']} held")
+            set_state(self.status_label, 'idle')
+            return
+        totals = self.bus.aggregate('download')
+        listing = ", still listing" if stats['listing'] else ""
+        skipped = f", {stats['skipped']} already downloaded" if stats['skipped'] else ""
+        eta = f", {format_eta(totals['eta'])} left" if totals['eta'] is not None and not stats['listing'] else ""
+        self.status_label.setText(f"Downloading: {finished}/{stats['total']} finished{skipped}{listing}, "
+                                  f"{stats['active']} active, {format_rate(totals['rate']) or '0 B/s'} total{eta}")
+        set_state(self.status_label, 'busy')
 
-    def update_progress(self, d):
-        if 'downloaded_bytes' in d and 'total_bytes' in d:
-            progress = (d['downloaded_bytes'] / d['total_bytes']) * 100
-            self.progress_bar.setValue(int(progress))
-            self.status_label.setText(f"Downloading: {d.get('filename', '')}")
-            self.status_label.setStyleSheet("color: #2196F3;")
+    def update_row(self, job):
+        row = self.rows.get(job.key)
+        if row is None:
+            row = self.rows[job.key] = self.jobs_table.rowCount()
+            self.jobs_table.insertRow(row)
+            self.jobs_table.setItem(row, 0, QTableWidgetItem(job.label))
+        progress = f"{job.percent:.0f}%" if job.percent is not None else ''
+        if job.eta is not None:
+            progress += f" ({format_eta(job.eta)})"
+        for column, text in ((1, job.status), (2, progress), (3, format_rate(job.rate))):
+            self.jobs_table.setItem(row, column, QTableWidgetItem(text))
 
-    def download_finished(self):
-        self.download_button.setEnabled(True)
+    def download_finished(self, stats):
         self.progress_bar.setValue(100)
+        if stats['cancelled'] and not stats['failed']:
+            self.status_label.setText(f"Downloads cancelled: {stats['done']} done, {stats['cancelled']} cancelled")
+            set_state(self.status_label, 'idle')
+            return
+        if stats['failed']:
+            self.status_label.setText(f"Downloads completed: {stats['done']} done, {stats['failed']} failed, "
+                                      f"{stats['skipped']} already downloaded")
+            set_state(self.status_label, 'error')
+            QMessageBox.critical(self, "Error", f"{stats['failed']} of {stats['total']} downloads failed after "
+                                 "retrying.\n\nTry selecting a different quality or check if the videos are "
+                                 "available in your region.")
+            return
         self.status_label.setText("Download completed!")
-        self.status_label.setStyleSheet("color: #4CAF50;")
-        QMessageBox.information(self, "Success", "Download completed successfully!")
-
-    def download_error(self, error_msg):
-        self.download_button.setEnabled(True)
-        self.status_label.setText("Error occurred during download")
-        self.status_label.setStyleSheet("color: #F44336;")
-        QMessageBox.critical(self, "Error", f"Download failed: {error_msg}\n\nTry selecting a different quality or check if the video is available in your region.") 
\ No newline at end of file
+        set_state(self.status_label, 'success')
+        skipped = f" ({stats['skipped']} were already downloaded)" if stats['skipped'] else ""
+        QMessageBox.information(self, "Success", f"{stats['done']} downloads completed successfully!{skipped}")